@@ -0,0 +1,86 @@
+import asyncio
+import hmac
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from app.core.config import settings
+from app.services.history_analytics import BUCKETS, history_analytics
+from app.services.rag_service import rag_service
+from app.services.telemetry import recent_traces
+
+
+def require_admin(x_admin_token: str = Header(default="")):
+    if settings.ADMIN_TOKEN and not hmac.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.get("/kb")
+async def kb_status():
+    """
+    Loaded knowledge base version, generation and the result of the last reload.
+    """
+    return rag_service.knowledge.status()
+
+
+@router.post("/kb/reload")
+async def kb_reload(force: bool = False):
+    """
+    Re-parse the dataset in the background and swap it in without a restart.
+    Only cached answers that depended on changed sections are invalidated.
+    """
+    return await rag_service.knowledge.reload(reason="admin", force=force)
+
+
+@router.get("/facts")
+async def facts():
+    """
+    Course records compiled from the dataset for direct lookups (fees, duration, eligibility, institute).
+    """
+    store = rag_service.knowledge.current.facts
+    if not store:
+        return {"enabled": False}
+    return {"enabled": True, "answers": store.size, "courses": store.records()}
+
+
+@router.get("/traces")
+async def traces(limit: int = 20, slowest: bool = False):
+    """
+    Latency breakdown of recent chat requests (one span per stage and provider attempt).
+    """
+    items = list(recent_traces)
+    items = sorted(items, key=lambda t: t.duration, reverse=True) if slowest else items[::-1]
+    return [t.as_dict() for t in items[:max(1, limit)]]
+
+
+@router.get("/history/top")
+async def top_questions(since: Optional[datetime] = None, until: Optional[datetime] = None,
+                        language: Optional[str] = None, limit: int = Query(20, ge=1, le=500)):
+    """
+    Most asked questions (rephrasings grouped) in a time window, default the last 7 days (UTC).
+    """
+    return await asyncio.to_thread(history_analytics.top_questions, since, until, language, limit)
+
+
+@router.get("/history/volume")
+async def question_volume(bucket: str = Query("day", pattern="^(" + "|".join(BUCKETS) + ")$"),
+                          since: Optional[datetime] = None, until: Optional[datetime] = None,
+                          language: Optional[str] = None):
+    """
+    Question count and average latency per hour / day / month.
+    """
+    return await asyncio.to_thread(history_analytics.volume, bucket, since, until, language)
+
+
+@router.get("/history/search")
+async def search_history(q: Optional[str] = None, language: Optional[str] = None, provider: Optional[str] = None,
+                         outcome: Optional[str] = None, min_latency_ms: Optional[float] = None,
+                         since: Optional[datetime] = None, until: Optional[datetime] = None,
+                         before_id: Optional[int] = None, limit: int = Query(50, ge=1, le=500)):
+    """
+    Chat history, newest first, filtered by keywords (full-text), language, provider,
+    outcome, latency or time. Pass next_cursor back as before_id for the next page.
+    """
+    return await asyncio.to_thread(history_analytics.search, q, language, provider, outcome,
+                                   min_latency_ms, since, until, before_id, limit)
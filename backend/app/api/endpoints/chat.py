@@ -1,35 +1,205 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.schemas.chat import ChatRequest, ChatResponse
+import asyncio
+import json
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
+from app.schemas.chat import ChatBatchRequest, ChatRequest, ChatResponse
+from app.services.admission import AdmissionRejected
+from app.services.batch import batch_runner
 from app.services.rag_service import rag_service
-from sqlalchemy.orm import Session
-from app.db.database import get_db
-from app.db.models import ChatHistory
+from app.services.history_writer import history_writer
+from app.services.telemetry import set_outcome, span, start_trace
 
 
 
 router = APIRouter()
 
+SHED_MESSAGES = {
+    429: "Too many questions in a short time. Please wait a moment and try again.",
+    503: "The assistant is handling too many questions right now. Please try again shortly.",
+}
+
+
+def client_ip(http: Request) -> Optional[str]:
+    return http.client.host if http.client else None
+
+
+def shed(e: AdmissionRejected) -> HTTPException:
+    """429 / 503 with Retry-After for a request turned away by admission control."""
+    set_outcome("rate_limited" if e.status_code == 429 else "shed")
+    return HTTPException(status_code=e.status_code, detail={"message": SHED_MESSAGES[e.status_code], "reason": e.reason},
+                         headers={"Retry-After": str(e.retry_after)})
+
+
 @router.post("/", response_model=ChatResponse)
-async def chat(request: ChatRequest, db: Session = Depends(get_db)):
+async def chat(request: ChatRequest, http: Request):
     """
     Multilingual Chat Endpoint with History Logging.
+    Answers 429 / 503 with Retry-After when admission control sheds the question.
     """
+    trace = start_trace("chat")
     try:
         # Generate response
-        response_data = await rag_service.generate_response(request)
+        response_data = await rag_service.generate_response(request, client_ip(http))
         
-        # Save Interaction to Database
-        try:
-            db_log = ChatHistory(
-                query=request.query,
-                response=response_data.response
-            )
-            db.add(db_log)
-            db.commit()
-        except Exception as db_err:
-            print(f"Database Error: {db_err}")
-            # Continue even if logging fails
+        # Save Interaction to Database (write-behind: batched off the request path)
+        with span("db_write"):
+            history_writer.enqueue(request.query, response_data.response,
+                                   detected_language=response_data.detected_language, **trace.history_fields())
         
         return response_data
+    except AdmissionRejected as e:
+        raise shed(e)
     except Exception as e:
+        set_outcome("error")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        trace.finish()
+
+
+@router.post("/stream")
+async def chat_stream(request: ChatRequest, http: Request):
+    """
+    Streaming Chat Endpoint (Server-Sent Events).
+    Emits `token` events as the answer is generated and a final `done` event
+    with detected_language, sources and session_id. A shed question gets a plain
+    429 / 503 with Retry-After before the stream starts.
+    """
+    trace = start_trace("stream")
+    events = rag_service.stream_response(request, client_ip(http))
+    try:
+        # Admission is decided before the first event, so pull it before committing to a 200
+        first = await events.__anext__()
+    except AdmissionRejected as e:
+        error = shed(e)
+        trace.finish()
+        raise error
+    except BaseException:
+        trace.finish()
+        raise
+
+    async def event_stream():
+        parts = []
+        language = None
+        try:
+            event = first
+            while True:
+                if event["type"] == "token":
+                    parts.append(event["content"])
+                elif event["type"] == "done":
+                    language = event.get("detected_language")
+                yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+                try:
+                    event = await events.__anext__()
+                except StopAsyncIteration:
+                    break
+
+            # Save Interaction to Database
+            with span("db_write"):
+                history_writer.enqueue(request.query, "".join(parts),
+                                       detected_language=language, **trace.history_fields())
+        finally:
+            await events.aclose()
+            trace.finish()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/batch")
+async def chat_batch(batch: ChatBatchRequest, http: Request):
+    """
+    Many questions in one request, answered as NDJSON lines in completion order.
+    Each line has the request `index`, its completion `seq` and either `response`
+    or `error` (with `status`, e.g. 429 / 503 + `retry_after`); duplicates of an
+    earlier question carry `duplicate_of`. The last line is a `done` summary.
+    """
+    if not batch.items:
+        raise HTTPException(status_code=422, detail="items must not be empty")
+    if len(batch.items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {settings.BATCH_MAX_ITEMS} items per batch")
+
+    async def lines():
+        async for line in batch_runner.run(batch.items, client_ip(http)):
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """
+    Response cache hit/miss counters (how many LLM calls the cache saved).
+    """
+    if not rag_service.cache:
+        return {"enabled": False}
+    # The shared cache counts its SQLite rows: not on the event loop
+    return {"enabled": True, **await asyncio.to_thread(rag_service.cache.stats)}
+
+
+@router.get("/coalescing/stats")
+async def coalescing_stats():
+    """
+    Single-flight deduplication: LLM calls started vs identical requests that shared one.
+    """
+    if not rag_service.inflight:
+        return {"enabled": False}
+    return {"enabled": True, "normalization": rag_service.coalesce_mode, **rag_service.inflight.stats()}
+
+
+@router.get("/admission/stats")
+async def admission_stats():
+    """
+    Admission control: LLM slots in use, queue depth, per-client limits and shed counts by reason.
+    """
+    if not rag_service.admission:
+        return {"enabled": False}
+    return {"enabled": True, **rag_service.admission.stats()}
+
+
+@router.get("/sessions/stats")
+async def session_stats():
+    """
+    Conversation memory: live sessions, memory use, evictions and SQLite spill counts.
+    """
+    return rag_service.sessions.stats()
+
+
+@router.delete("/sessions/{session_id}")
+async def clear_session(session_id: str):
+    """
+    Forget a conversation (e.g. when the user starts a new chat).
+    """
+    if not await rag_service.sessions.clear(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"session_id": session_id, "cleared": True}
+
+
+@router.get("/tokens/stats")
+async def token_stats():
+    """
+    Prompt tokens sent per provider against its budget (and how often context was trimmed).
+    """
+    return rag_service.budget.stats()
+
+
+@router.get("/providers")
+async def provider_status():
+    """
+    Health of each LLM provider (closed / cooldown / open / half-open) and its
+    rate-limit utilization (requests/tokens in the last minute, queue depth).
+    """
+    return rag_service.registry.status()
+
+
+@router.get("/history/stats")
+async def history_stats():
+    """
+    Write-behind history queue: depth, written rows, drops and failures.
+    """
+    return history_writer.stats()
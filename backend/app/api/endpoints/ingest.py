@@ -1,16 +1,43 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from app.services.ingestion_service import ingestion_service
+from fastapi import APIRouter, HTTPException
+from app.services.ingest_jobs import ingest_jobs
 
 router = APIRouter()
 
-@router.post("/")
-async def ingest_data(background_tasks: BackgroundTasks):
+@router.post("/", status_code=202)
+async def ingest_data():
     """
-    Triggers the document ingestion process in the background.
+    Starts a document ingestion job. Jobs run one at a time in the background;
+    poll GET /ingest/{job_id} for progress.
     """
-    try:
-        # Run in background to avoid timeout
-        background_tasks.add_task(ingestion_service.ingest_documents)
-        return {"status": "accepted", "message": "Ingestion started in background. Check server logs for progress."}
-    except Exception as e:
-         raise HTTPException(status_code=500, detail=str(e))
+    job = ingest_jobs.submit()
+    return {"status": "accepted", "job_id": job.id, "message": "Ingestion job queued."}
+
+
+@router.get("/")
+async def list_jobs():
+    """
+    Recent ingestion jobs, newest first.
+    """
+    return [job.to_dict() for job in reversed(list(ingest_jobs.jobs.values()))]
+
+
+@router.get("/{job_id}")
+async def job_status(job_id: str):
+    """
+    Status of one ingestion job: files/chunks processed, throughput and errors.
+    """
+    job = ingest_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@router.post("/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """
+    Cancels a queued or running ingestion job.
+    """
+    job = ingest_jobs.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
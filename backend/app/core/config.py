@@ -1,5 +1,5 @@
 
-from typing import List, Union
+from typing import Dict, List, Union
 from pydantic import AnyHttpUrl, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -25,6 +25,143 @@ class Settings(BaseSettings):
     GROQ_API_KEY: str = "gsk-placeholder"
     CHROMA_DB_DIR: str = "./chroma_db"
 
+    # Embeddings & Vector Store
+    EMBEDDING_BACKEND: str = "auto"     # auto | openai | gemini | local (offline hashed n-grams)
+    LOCAL_EMBEDDING_DIM: int = 2048
+    VECTOR_STORE: str = "chroma"        # chroma | numpy (memory-mapped float16 matrix)
+    VECTOR_INDEX_DIR: str = "./vector_index"
+
+    # Ingestion pipeline
+    INGEST_WORKERS: int = 2             # parser processes (0 = parse in-process)
+    INGEST_QUEUE_SIZE: int = 8          # parsed files waiting to be split
+    INGEST_EMBED_BATCH_SIZE: int = 64   # chunks per embedding call
+    INGEST_EMBED_CONCURRENCY: int = 2   # embedding calls in flight
+    INGEST_EMBED_RETRIES: int = 4
+
+    # Cold start: the parsed KB + BM25 index is cached here and memory-mapped on the next
+    # start (single-process mode; workers use SHARED_STATE_DIR instead, "" = parse every start)
+    KB_SNAPSHOT_DIR: str = "./kb_snapshot"
+    # Background warmup after start: import langchain / provider SDKs, compile prompts and
+    # open a keep-alive connection to each provider. /readyz waits for it only if asked to.
+    WARMUP_ON_START: bool = True
+    READY_AFTER_WARMUP: bool = False
+    WARMUP_TIMEOUT_SECONDS: float = 10.0
+
+    # Knowledge base hot reload (dataset, intents and fact files are polled; 0 = only via POST /admin/kb/reload)
+    KB_WATCH_SECONDS: float = 2.0
+    # Admin endpoints require this value in the X-Admin-Token header ("" = no check, development only)
+    ADMIN_TOKEN: str = ""
+
+    # Fast-path intents (greetings, thanks, top FAQs answered without an LLM call)
+    INTENTS_FILE: str = "data/intents.json"
+
+    # Fact store: course fees / duration / eligibility / institute compiled from the dataset
+    # and answered from templates without an LLM call ("" = off)
+    FACTS_FILE: str = "data/facts.json"
+    FACT_SHEETS: List[str] = ["data/kpgu_info.txt"]  # extra plain-text sources; the master dataset wins
+    FACT_MAX_OTHER_WORDS: int = 1                    # unrelated words allowed in a direct lookup
+
+    # Retrieval (number of KB sections sent to the LLM per question)
+    RETRIEVAL_TOP_K: int = 4
+
+    # Prompt token budget (max prompt tokens per request, keyed by provider name prefix)
+    PROMPT_TOKEN_BUDGETS: Dict[str, int] = {"Groq": 4000, "Gemini": 16000}
+    PROMPT_TOKEN_BUDGET_DEFAULT: int = 4000
+    PROMPT_HISTORY_SHARE: float = 0.25  # max share of the non-fixed budget for chat history
+    TOKEN_COUNTER: str = "estimate"     # estimate | tiktoken (needs the cl100k_base file)
+
+    # LLM Providers (shared clients, cooldown & circuit breaker)
+    PROVIDER_TIMEOUT_SECONDS: float = 30.0
+    PROVIDER_MAX_RETRIES: int = 1
+    PROVIDER_MAX_CONNECTIONS: int = 20
+    CIRCUIT_FAILURE_THRESHOLD: int = 3
+    CIRCUIT_OPEN_SECONDS: float = 60.0
+    # Hedging: "off" (sequential failover), "hedge" (start next provider after the
+    # latency budget) or "race" (start all providers at once, first answer wins)
+    PROVIDER_HEDGE_MODE: str = "off"
+    HEDGE_DELAY_SECONDS: float = 4.0
+    HEDGE_MIN_DELAY_SECONDS: float = 0.5
+    HEDGE_MIN_SAMPLES: int = 20
+    # Per-key rate limits (token buckets). Defaults are the free tiers; override single
+    # keys by provider name, e.g. {"Gemini-2": {"rpm": 1000, "tpm": 4000000}}. 0 = unlimited
+    GROQ_RPM: int = 30
+    GROQ_TPM: int = 6000
+    GEMINI_RPM: int = 15
+    GEMINI_TPM: int = 1_000_000
+    PROVIDER_RATE_LIMITS: Dict[str, Dict[str, int]] = {}
+
+    @field_validator("GROQ_RPM", "GROQ_TPM", "GEMINI_RPM", "GEMINI_TPM")
+    def check_rate(cls, v: int) -> int:
+        if v < 0:
+            raise ValueError("rate limits must be >= 0 (0 = unlimited)")
+        return v
+
+    @field_validator("PROVIDER_RATE_LIMITS")
+    def check_provider_rates(cls, v: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, int]]:
+        for name, limits in v.items():
+            unknown = set(limits) - {"rpm", "tpm"}
+            if unknown:
+                raise ValueError(f"{name}: unknown rate limit {sorted(unknown)} (use rpm / tpm)")
+            if any(value < 0 for value in limits.values()):
+                raise ValueError(f"{name}: rate limits must be >= 0 (0 = unlimited)")
+        return v
+    RATE_LIMIT_OUTPUT_TOKENS: int = 400     # answer tokens reserved per call on top of the prompt
+    RATE_LIMIT_MAX_WAIT_SECONDS: float = 8.0  # wait this long for capacity before failing over
+    RATE_LIMIT_QUEUE_MAX: int = 50          # callers waiting per key before failing over at once
+
+    # Conversation memory (server-side, keyed by session_id)
+    SESSION_WINDOW_TURNS: int = 6        # recent question/answer turns kept verbatim
+    SESSION_SUMMARY_MAX_CHARS: int = 600 # rolling summary of older turns
+    SESSION_MAX_SESSIONS: int = 5000
+    SESSION_MAX_CHARS: int = 8_000_000   # approximate memory cap across all sessions
+    SESSION_TTL_SECONDS: int = 3600
+    SESSION_SPILL_PATH: str = ""         # SQLite file for sessions evicted from memory ("" = off)
+
+    # Multi-worker mode (python run_workers.py): KB snapshot, BM25 index and response
+    # cache are shared through files in this directory ("" = single process, private copies).
+    # Session memory is not shared: send ChatRequest.history unless workers are sticky.
+    SHARED_STATE_DIR: str = ""
+    SHARED_POLL_SECONDS: float = 1.0     # how often a worker checks for a newly published KB
+    WORKERS: int = 2
+
+    # Request coalescing: identical questions already waiting on an LLM share that one call
+    COALESCE_ENABLED: bool = True
+    COALESCE_NORMALIZATION: str = "tokens"  # exact | text (case/punctuation-insensitive) | tokens (response cache key)
+
+    # Admission control: questions that need an LLM (fast path, facts and cache hits are
+    # never limited). Beyond MAX_CONCURRENT calls they queue; a full queue or an expected
+    # wait over MAX_WAIT_SECONDS is answered at once with 503 + Retry-After.
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_CONCURRENT: int = 16
+    ADMISSION_QUEUE_MAX: int = 64
+    ADMISSION_MAX_WAIT_SECONDS: float = 10.0
+    ADMISSION_MAX_PER_CLIENT: int = 8       # LLM calls running + queued per client IP (0 = no limit)
+    # Fair share per client (sliding window, 429 + Retry-After beyond it; 0 = no limit).
+    # The IP limit is generous: a campus or kiosk network shares one address.
+    CLIENT_RATE_LIMIT_PER_IP: int = 120
+    CLIENT_RATE_LIMIT_PER_SESSION: int = 20
+    CLIENT_RATE_WINDOW_SECONDS: float = 60.0
+
+    # Batch endpoint (POST /api/v1/chat/batch, NDJSON results as they complete)
+    BATCH_MAX_ITEMS: int = 200
+    BATCH_CONCURRENCY_PER_PROVIDER: int = 2  # a batch's LLM calls in flight per configured provider
+
+    # Observability (GET /metrics, request traces, queued stdout logging)
+    TRACE_LOG: bool = False      # log one latency-breakdown line per request
+    TRACE_BUFFER: int = 200      # recent traces kept for GET /admin/traces
+    LOG_QUEUE_MAX: int = 10000   # log lines waiting for stdout (dropped beyond this)
+
+    # Chat History (write-behind batching)
+    HISTORY_QUEUE_MAX: int = 10000
+    HISTORY_BATCH_SIZE: int = 100
+    HISTORY_FLUSH_INTERVAL: float = 1.0
+
+    # Response Cache (exact + fuzzy match on normalized query & language)
+    CACHE_ENABLED: bool = True
+    CACHE_MAX_ENTRIES: int = 1000
+    CACHE_TTL_SECONDS: int = 3600
+    CACHE_FUZZY_THRESHOLD: float = 0.8
+
     model_config = SettingsConfigDict(case_sensitive=True, env_file=[".env", "../.env"])
 
 settings = Settings()
@@ -0,0 +1,176 @@
+"""
+Schema migrations for the SQLite history database.
+
+The applied version is kept in PRAGMA user_version. Every step is idempotent
+(IF NOT EXISTS, column checks, INSERT OR IGNORE), so a start that dies halfway
+through a step simply runs it again next time.
+"""
+from typing import TYPE_CHECKING, Callable, List, Optional, Tuple
+
+from app.services.intents import normalize_text
+from app.services.response_cache import normalize_query
+from app.services.telemetry import log
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Connection, Engine
+
+BACKFILL_BATCH = 5000
+# Devanagari / Gujarati vowel signs are category M; without it FTS5 splits words at every matra
+FTS_TOKENIZER = "unicode61 categories 'L* N* Co M*'"
+
+
+def question_key(query: str) -> str:
+    """Rows asking the same question share a key ("B.Tech CSE fees?" == "fees for btech cse")."""
+    return " ".join(normalize_query(query)) or normalize_text(query)
+
+
+def hour_bucket(timestamp) -> str:
+    return timestamp.strftime("%Y-%m-%d %H:00")
+
+
+def _columns(conn: "Connection", table: str) -> List[str]:
+    return [row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")]
+
+
+def _create_history(conn: "Connection"):
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS chat_history ("
+        " id INTEGER NOT NULL PRIMARY KEY,"
+        ' "query" TEXT NOT NULL,'
+        " response TEXT NOT NULL,"
+        " timestamp DATETIME)"
+    )
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_chat_history_id ON chat_history (id)")
+
+
+def _add_analytics_columns(conn: "Connection"):
+    existing = set(_columns(conn, "chat_history"))
+    for name, type_ in (("detected_language", "VARCHAR(8)"), ("provider", "VARCHAR(40)"),
+                        ("outcome", "VARCHAR(16)"), ("latency_ms", "FLOAT"), ("query_key", "TEXT")):
+        if name not in existing:
+            conn.exec_driver_sql(f"ALTER TABLE chat_history ADD COLUMN {name} {type_}")
+    for name, columns in (("ix_chat_history_timestamp", "timestamp"),
+                          ("ix_chat_history_language_timestamp", "detected_language, timestamp"),
+                          ("ix_chat_history_provider_timestamp", "provider, timestamp"),
+                          ("ix_chat_history_latency_ms", "latency_ms")):
+        conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON chat_history ({columns})")
+
+    # Existing rows get their question key in id order, a batch at a time
+    last = 0
+    while True:
+        rows = conn.exec_driver_sql(
+            'SELECT id, "query" FROM chat_history WHERE id > ? AND query_key IS NULL ORDER BY id LIMIT ?',
+            (last, BACKFILL_BATCH)).fetchall()
+        if not rows:
+            break
+        conn.exec_driver_sql("UPDATE chat_history SET query_key = ? WHERE id = ?",
+                             [(question_key(q), i) for i, q in rows])
+        last = rows[-1][0]
+
+
+def _create_hourly_rollup(conn: "Connection"):
+    # One row per (hour, question, language): top-question and volume queries read
+    # this instead of grouping millions of history rows
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS chat_question_hourly ("
+        " hour TEXT NOT NULL,"
+        " query_key TEXT NOT NULL,"
+        " detected_language TEXT NOT NULL DEFAULT '',"
+        " count INTEGER NOT NULL DEFAULT 0,"
+        " timed INTEGER NOT NULL DEFAULT 0,"
+        " latency_ms_sum FLOAT NOT NULL DEFAULT 0,"
+        " sample_query TEXT NOT NULL,"
+        " PRIMARY KEY (hour, query_key, detected_language))"
+    )
+    # Volume per hour and language: a few rows per hour whatever the number of distinct questions
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS chat_hourly_totals ("
+        " hour TEXT NOT NULL,"
+        " detected_language TEXT NOT NULL DEFAULT '',"
+        " count INTEGER NOT NULL DEFAULT 0,"
+        " timed INTEGER NOT NULL DEFAULT 0,"
+        " latency_ms_sum FLOAT NOT NULL DEFAULT 0,"
+        " PRIMARY KEY (hour, detected_language))"
+    )
+    conn.exec_driver_sql(
+        "INSERT OR IGNORE INTO chat_question_hourly"
+        " (hour, query_key, detected_language, count, timed, latency_ms_sum, sample_query)"
+        " SELECT strftime('%Y-%m-%d %H:00', timestamp), query_key, COALESCE(detected_language, ''),"
+        ' COUNT(*), COUNT(latency_ms), COALESCE(SUM(latency_ms), 0), MIN("query")'
+        " FROM chat_history WHERE timestamp IS NOT NULL"
+        " GROUP BY 1, 2, 3"
+    )
+    conn.exec_driver_sql(
+        "INSERT OR IGNORE INTO chat_hourly_totals (hour, detected_language, count, timed, latency_ms_sum)"
+        " SELECT hour, detected_language, SUM(count), SUM(timed), SUM(latency_ms_sum)"
+        " FROM chat_question_hourly GROUP BY 1, 2"
+    )
+
+
+def _create_fts(conn: "Connection"):
+    # External-content FTS5 index: the text lives once in chat_history, triggers keep the index in step
+    conn.exec_driver_sql(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS chat_history_fts USING fts5("
+        f' "query", response, content=\'chat_history\', content_rowid=\'id\', tokenize="{FTS_TOKENIZER}")'
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS chat_history_fts_insert AFTER INSERT ON chat_history BEGIN"
+        ' INSERT INTO chat_history_fts (rowid, "query", response) VALUES (new.id, new."query", new.response); END'
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS chat_history_fts_delete AFTER DELETE ON chat_history BEGIN"
+        ' INSERT INTO chat_history_fts (chat_history_fts, rowid, "query", response)'
+        ' VALUES (\'delete\', old.id, old."query", old.response); END'
+    )
+    conn.exec_driver_sql(
+        'CREATE TRIGGER IF NOT EXISTS chat_history_fts_update AFTER UPDATE OF "query", response ON chat_history BEGIN'
+        ' INSERT INTO chat_history_fts (chat_history_fts, rowid, "query", response)'
+        ' VALUES (\'delete\', old.id, old."query", old.response);'
+        ' INSERT INTO chat_history_fts (rowid, "query", response) VALUES (new.id, new."query", new.response); END'
+    )
+    conn.exec_driver_sql("INSERT INTO chat_history_fts (chat_history_fts) VALUES ('rebuild')")
+
+
+MIGRATIONS: List[Tuple[str, Callable[["Connection"], None]]] = [
+    ("create chat_history", _create_history),
+    ("analytics columns and indexes", _add_analytics_columns),
+    ("hourly rollups", _create_hourly_rollup),
+    ("full-text index", _create_fts),
+]
+
+
+def fts_available(conn: "Connection") -> bool:
+    try:
+        conn.exec_driver_sql("CREATE VIRTUAL TABLE temp._fts_probe USING fts5(x)")
+        conn.exec_driver_sql("DROP TABLE temp._fts_probe")
+        return True
+    except Exception:
+        return False
+
+
+def has_fts(engine: "Engine") -> bool:
+    with engine.connect() as conn:
+        return conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE name = 'chat_history_fts'").first() is not None
+
+
+def migrate(engine: Optional["Engine"] = None) -> int:
+    """Apply pending migrations; returns the schema version the database is at afterwards."""
+    if engine is None:
+        from app.db.database import engine
+    with engine.connect() as conn:
+        version = conn.exec_driver_sql("PRAGMA user_version").scalar()
+        fts = fts_available(conn)
+    for number, (name, step) in enumerate(MIGRATIONS, start=1):
+        if number <= version:
+            continue
+        if step is _create_fts and not fts:
+            # Retried on every start, so the index appears once SQLite has FTS5
+            log("DB Migration: SQLite was built without FTS5, keyword search falls back to LIKE")
+            break
+        with engine.begin() as conn:
+            step(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {number}")
+        version = number
+        log(f"DB Migration {number}: {name}")
+    return version
@@ -1,11 +1,23 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import Column, Float, Index, Integer, String, Text, DateTime
 from datetime import datetime
 from .database import Base
 
 class ChatHistory(Base):
     __tablename__ = "chat_history"
+    # The schema is owned by app/db/migrations.py; indexes are listed here so the model matches it
+    __table_args__ = (
+        Index("ix_chat_history_timestamp", "timestamp"),
+        Index("ix_chat_history_language_timestamp", "detected_language", "timestamp"),
+        Index("ix_chat_history_provider_timestamp", "provider", "timestamp"),
+        Index("ix_chat_history_latency_ms", "latency_ms"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     query = Column(Text, nullable=False)
     response = Column(Text, nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow)
+    detected_language = Column(String(8))  # en / hi / gu
+    provider = Column(String(40))          # LLM that answered (NULL for fast path, facts, cache)
+    outcome = Column(String(16))           # llm / fast_path / fact / cache / coalesced / busy ...
+    latency_ms = Column(Float)
+    query_key = Column(Text)               # normalized question, groups rephrasings for analytics
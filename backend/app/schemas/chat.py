@@ -5,8 +5,13 @@ class ChatRequest(BaseModel):
     query: str
     history: Optional[List[dict]] = []  # List of {"role": "user", "content": "..."}
     language: Optional[str] = "en"  # Optional override
+    session_id: Optional[str] = None  # Server-side memory, keyed by a client-chosen id; omitted = stateless
 
 class ChatResponse(BaseModel):
     response: str
     sources: List[str] = []
     detected_language: str
+    session_id: Optional[str] = None
+
+class ChatBatchRequest(BaseModel):
+    items: List[ChatRequest]  # answered independently; items sharing a session_id run in order
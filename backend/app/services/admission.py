@@ -0,0 +1,241 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+from app.services.telemetry import metrics, span
+
+
+class AdmissionRejected(Exception):
+    """A request shed before it reached a provider: 429 (this client is over its share) or 503 (server full)."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f"Request rejected ({reason}), retry in {self.retry_after}s")
+
+
+class SlidingWindowLimiter:
+    """
+    At most `limit` requests per client key in any `window` seconds (exact sliding
+    window over the request timestamps). Only the `max_clients` most recently seen
+    keys are tracked, so a flood of new session ids can't grow it without bound.
+    """
+
+    def __init__(self, limit: int, window: float, max_clients: int = 10000):
+        self.limit = limit
+        self.window = window
+        self.max_clients = max_clients
+        self._hits: "OrderedDict[str, Deque[float]]" = OrderedDict()
+
+    def hit(self, key: str, now: float) -> Optional[float]:
+        """Record a request; returns None if allowed, else the seconds until the window has room."""
+        if self.limit <= 0:
+            return None
+        hits = self._hits.get(key)
+        if hits is None:
+            hits = self._hits[key] = deque()
+            if len(self._hits) > self.max_clients:
+                self._hits.popitem(last=False)
+        else:
+            self._hits.move_to_end(key)
+        while hits and now - hits[0] >= self.window:
+            hits.popleft()
+        if len(hits) >= self.limit:
+            return hits[0] + self.window - now
+        hits.append(now)
+        return None
+
+    def __len__(self):
+        return len(self._hits)
+
+
+class AdmissionGate:
+    """
+    Bounds how many questions are waiting on an LLM at once.
+
+    Up to `limit` requests hold a slot; the rest wait in a bounded queue for at most
+    max_wait seconds. Waiters are queued per client and a freed slot goes to the
+    clients in turn (round robin), so one client's burst can't starve the others,
+    and no client may hold more than `per_client` slots + queue places. A request
+    is turned away at once, with an estimated Retry-After, when the queue is full
+    or its expected wait (average slot time x queue position) is over max_wait.
+    """
+
+    def __init__(self, limit: int, max_queue: int, max_wait: float, per_client: int = 0):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.per_client = per_client
+        self.active = 0
+        self.queued = 0
+        self._waiters: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._clients: Dict[str, int] = {}  # slots + queue places per client
+        self.avg_hold = 0.0                 # moving average of seconds a slot is held
+        self.admitted = 0
+        self.waited = 0
+        self.rejected: Dict[str, int] = {}
+
+    def estimated_wait(self, position: int) -> float:
+        return self.avg_hold * position / max(self.limit, 1)
+
+    def _reject(self, status_code: int, reason: str, retry_after: float):
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        raise AdmissionRejected(status_code, reason, retry_after)
+
+    def _take(self, client: str):
+        self._clients[client] = self._clients.get(client, 0) + 1
+
+    def _drop(self, client: str):
+        left = self._clients.get(client, 0) - 1
+        if left > 0:
+            self._clients[client] = left
+        else:
+            self._clients.pop(client, None)
+
+    def _dequeue(self, client: str, future: asyncio.Future):
+        waiters = self._waiters.get(client)
+        if waiters is not None and future in waiters:
+            waiters.remove(future)
+            self.queued -= 1
+            if not waiters:
+                del self._waiters[client]
+
+    def check_client(self, client: str):
+        """429 when this client already holds its share of slots + queue places."""
+        if self.per_client and self._clients.get(client, 0) >= self.per_client:
+            self._reject(429, "client_concurrency", self.estimated_wait(1) or 1)
+
+    async def acquire(self, client: str) -> float:
+        """Wait for a slot; returns the seconds spent queued. Raises AdmissionRejected."""
+        self.check_client(client)
+        if self.active < self.limit and not self.queued:
+            self.active += 1
+            self.admitted += 1
+            self._take(client)
+            return 0.0
+        expected = self.estimated_wait(self.queued + 1)
+        if self.queued >= self.max_queue:
+            self._reject(503, "queue_full", expected or self.max_wait)
+        if expected > self.max_wait:
+            self._reject(503, "overloaded", expected)
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(client, deque()).append(future)
+        self.queued += 1
+        self.waited += 1
+        self._take(client)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+        except asyncio.TimeoutError:
+            if not future.done():
+                self._dequeue(client, future)
+                future.cancel()
+                self._drop(client)
+                self._reject(503, "queue_timeout", self.estimated_wait(self.queued + 1) or self.max_wait)
+        except asyncio.CancelledError:
+            # Client went away while queued: give back the place, or the slot if it was just handed over
+            if future.done() and not future.cancelled():
+                self.release(client, 0.0)
+            else:
+                self._dequeue(client, future)
+                future.cancel()
+                self._drop(client)
+            raise
+        self.admitted += 1
+        return time.monotonic() - started
+
+    def release(self, client: str, held: float):
+        self._drop(client)
+        if held:
+            self.avg_hold = held if not self.avg_hold else 0.8 * self.avg_hold + 0.2 * held
+        # Hand the slot straight to the next client in turn (the slot count stays the same)
+        while self._waiters:
+            waiter_client, waiters = next(iter(self._waiters.items()))
+            future = waiters.popleft()
+            self.queued -= 1
+            if waiters:
+                self._waiters.move_to_end(waiter_client)
+            else:
+                del self._waiters[waiter_client]
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queue_depth": self.queued,
+            "queue_max": self.max_queue,
+            "clients": len(self._clients),
+            "avg_slot_seconds": round(self.avg_hold, 3),
+            "admitted": self.admitted,
+            "waited": self.waited,
+            "rejected": dict(self.rejected),
+        }
+
+
+class AdmissionController:
+    """
+    Load shedding in front of the LLM providers. Fast-path, fact and cache answers
+    never come here, so they keep flowing at full speed under any load. A question
+    that needs a provider is first counted against the per-IP and per-session
+    sliding windows and its client's share of the gate (429), before it leads or
+    joins a coalesced call; then the call answering it takes a slot in the
+    AdmissionGate (429 / 503). Identical questions sharing that call need no slot.
+    """
+
+    def __init__(self, gate: AdmissionGate, per_ip: SlidingWindowLimiter, per_session: SlidingWindowLimiter):
+        self.gate = gate
+        self.per_ip = per_ip
+        self.per_session = per_session
+
+    def _rejected(self, e: AdmissionRejected):
+        metrics.admission_rejected.inc(reason=e.reason)
+        return e
+
+    def check_rate(self, ip: Optional[str], session_id: Optional[str]):
+        now = time.monotonic()
+        for limiter, key, reason in ((self.per_ip, ip, "ip_rate"), (self.per_session, session_id, "session_rate")):
+            retry = limiter.hit(key, now) if key else None
+            if retry is not None:
+                self.gate.rejected[reason] = self.gate.rejected.get(reason, 0) + 1
+                raise self._rejected(AdmissionRejected(429, reason, retry))
+
+    def check_client(self, client: Optional[str]):
+        try:
+            self.gate.check_client(client or "")
+        except AdmissionRejected as e:
+            raise self._rejected(e)
+
+    @asynccontextmanager
+    async def slot(self, client: Optional[str]):
+        client = client or ""
+        with span("admission") as s:
+            try:
+                waited = await self.gate.acquire(client)
+            except AdmissionRejected as e:
+                s["rejected"] = e.reason
+                raise self._rejected(e)
+            s["waited_ms"] = round(waited * 1000, 1)
+        metrics.admission_wait_seconds.observe(waited)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.gate.release(client, time.monotonic() - started)
+
+    def stats(self) -> dict:
+        return {
+            **self.gate.stats(),
+            "ip_limit": {"requests": self.per_ip.limit, "window_seconds": self.per_ip.window,
+                         "tracked": len(self.per_ip)},
+            "session_limit": {"requests": self.per_session.limit, "window_seconds": self.per_session.window,
+                              "tracked": len(self.per_session)},
+        }
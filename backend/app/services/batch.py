@@ -0,0 +1,127 @@
+import asyncio
+import time
+from typing import AsyncIterator, Dict, Hashable, List, Optional
+
+from app.core.config import settings
+from app.schemas.chat import ChatRequest
+from app.services.admission import AdmissionRejected
+from app.services.history_writer import history_writer
+from app.services.intents import normalize_text
+from app.services.rag_service import rag_service
+from app.services.telemetry import log, set_outcome, start_trace
+
+
+def batch_key(request: ChatRequest) -> Optional[Hashable]:
+    """
+    Items of one batch that get a single answer: same question (case / punctuation
+    insensitive) and language override, no session and no client history. Anything
+    with conversation context is answered on its own.
+    """
+    if request.session_id or request.history:
+        return None
+    return normalize_text(request.query), request.language
+
+
+class BatchRunner:
+    """
+    Answers many chat requests in one call (evaluation runs, kiosk prefetching).
+
+    Every distinct question runs as its own task through RAGService, so fast-path,
+    fact and cache answers come back within the first loop pass while the rest wait
+    for a provider. Only provider-bound questions hold one of the batch's slots
+    (BATCH_CONCURRENCY_PER_PROVIDER x configured providers), and those still go
+    through admission control like single requests. Items sharing a session_id run
+    in order in one task, so follow-ups see the earlier turns. Results are yielded
+    in completion order; each carries its request index and completion sequence.
+    """
+
+    def __init__(self, rag):
+        self.rag = rag
+
+    def concurrency(self) -> int:
+        return max(1, len(self.rag.registry.providers)) * max(1, settings.BATCH_CONCURRENCY_PER_PROVIDER)
+
+    async def _answer(self, request: ChatRequest, client: Optional[str], limit: asyncio.Semaphore) -> dict:
+        """One item, traced and written to history like a single /chat request. Never raises."""
+        trace = start_trace("batch")
+        try:
+            response = await self.rag.generate_response(request, client, limit)
+            history_writer.enqueue(request.query, response.response,
+                                   detected_language=response.detected_language, **trace.history_fields())
+            return {"status": 200, "outcome": trace.outcome, "response": response.model_dump()}
+        except AdmissionRejected as e:
+            set_outcome("rate_limited" if e.status_code == 429 else "shed")
+            return {"status": e.status_code, "outcome": trace.outcome, "error": e.reason,
+                    "retry_after": e.retry_after}
+        except Exception as e:
+            set_outcome("error")
+            log(f"Batch item failed: {e}")
+            return {"status": 500, "outcome": trace.outcome, "error": str(e)}
+        finally:
+            trace.finish()
+
+    async def run(self, requests: List[ChatRequest], client: Optional[str] = None) -> AsyncIterator[dict]:
+        """
+        Yields {"index", "seq", "elapsed_ms", "status", "outcome", "response" | "error"}
+        per request ("duplicate_of": the index whose answer it shares), then one
+        {"done": true, ...} summary.
+        """
+        started = time.perf_counter()
+        concurrency = self.concurrency()
+        limit = asyncio.Semaphore(concurrency)
+        leaders: Dict[Hashable, int] = {}
+        duplicates: Dict[int, List[int]] = {}
+        chains: Dict[str, List[int]] = {}
+        jobs: List[List[int]] = []  # indices answered in order by one task
+        for i, request in enumerate(requests):
+            key = batch_key(request)
+            if key is not None and key in leaders:
+                duplicates[leaders[key]].append(i)
+                continue
+            if key is not None:
+                leaders[key] = i
+            if request.session_id:
+                if request.session_id not in chains:
+                    chains[request.session_id] = []
+                    jobs.append(chains[request.session_id])
+                chains[request.session_id].append(i)
+            else:
+                jobs.append([i])
+            duplicates[i] = []
+
+        finished: asyncio.Queue = asyncio.Queue()
+
+        async def work(indices: List[int]):
+            for i in indices:
+                finished.put_nowait((i, await self._answer(requests[i], client, limit)))
+
+        tasks = [asyncio.create_task(work(job)) for job in jobs]
+        seq = 0
+        statuses: Dict[int, int] = {}
+        try:
+            for _ in range(len(duplicates)):
+                i, result = await finished.get()
+                elapsed = round((time.perf_counter() - started) * 1000, 1)
+                for index in [i] + duplicates[i]:
+                    line = {"index": index, "seq": seq, "elapsed_ms": elapsed, **result}
+                    if index != i:
+                        line["duplicate_of"] = i
+                    statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+                    seq += 1
+                    yield line
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        yield {
+            "done": True,
+            "items": len(requests),
+            "unique": len(duplicates),
+            "deduplicated": len(requests) - len(duplicates),
+            "statuses": {str(code): n for code, n in sorted(statuses.items())},
+            "concurrency": concurrency,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+
+batch_runner = BatchRunner(rag_service)
@@ -0,0 +1,80 @@
+import re
+import zlib
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import settings
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Offline embedding backend: character n-grams hashed into a fixed number of
+    buckets (signed hashing trick), sublinear TF, L2-normalized. No model files
+    and no network, so it works in air-gapped test environments. IDF weighting is
+    applied at query time by NumpyVectorIndex, which tracks bucket document
+    frequencies as chunks are added and removed.
+    """
+
+    def __init__(self, dim: int = 2048, ngram_min: int = 3, ngram_max: int = 5):
+        self.dim = dim
+        self.ngram_min = ngram_min
+        self.ngram_max = ngram_max
+
+    def _embed(self, text: str) -> np.ndarray:
+        text = " " + _SPACE_RE.sub(" ", text.lower().replace(".", "")).strip() + " "
+        counts = {}
+        for n in range(self.ngram_min, self.ngram_max + 1):
+            for i in range(len(text) - n + 1):
+                h = zlib.crc32(text[i:i + n].encode("utf-8"))
+                counts[h] = counts.get(h, 0) + 1
+        vec = np.zeros(self.dim, dtype=np.float32)
+        if not counts:
+            return vec
+        hashes = np.fromiter(counts.keys(), dtype=np.uint32, count=len(counts))
+        tf = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        signs = np.where((hashes >> 31) & 1, -1.0, 1.0).astype(np.float32)
+        np.add.at(vec, hashes % self.dim, signs * (1.0 + np.log(tf)))
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(t).tolist() for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text).tolist()
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """Same as embed_documents but returns an (n, dim) float32 matrix."""
+        return np.stack([self._embed(t) for t in texts]) if texts else np.zeros((0, self.dim), dtype=np.float32)
+
+
+def resolve_embedding_backend() -> str:
+    """
+    EMBEDDING_BACKEND="auto" keeps the old behaviour (OpenAI if a key is set,
+    else Gemini) and falls back to the local backend when neither is configured.
+    """
+    backend = settings.EMBEDDING_BACKEND
+    if backend != "auto":
+        return backend
+    if settings.OPENAI_API_KEY and "placeholder" not in settings.OPENAI_API_KEY:
+        return "openai"
+    if settings.GOOGLE_API_KEY and "placeholder" not in settings.GOOGLE_API_KEY:
+        return "gemini"
+    return "local"
+
+
+def get_embeddings(backend: str) -> Embeddings:
+    if backend == "local":
+        return HashingEmbeddings(dim=settings.LOCAL_EMBEDDING_DIM)
+    if backend == "gemini":
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        google_key = settings.GOOGLE_API_KEY.split(",")[0].strip()
+        return GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001", google_api_key=google_key)
+    if backend == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(api_key=settings.OPENAI_API_KEY)
+    raise ValueError(f"Unknown embedding backend: {backend}")
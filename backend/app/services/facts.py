@@ -0,0 +1,427 @@
+import json
+import os
+import re
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from app.services.intents import LANG_CODES
+from app.services.retrieval import tokenize
+
+_BOLD_RE = re.compile(r"\*\*([^*]+)\*\*")
+_YEARS_RE = re.compile(r"(\d+(?:\.\d+)?)\s*Years?\s*(\([^)]*\))?", re.IGNORECASE)
+_PAREN_RE = re.compile(r"^(.+?)\s*\(([^)]*)\)\s*$")
+_DEPARTMENT_RE = re.compile(r"^\d+\.\s*\*\*(.+?)\*\*\s*:\s*(.*)$")
+_BULLET_RE = re.compile(r"^(\s*)-\s*(?:\*\*(.+?)\*\*|([^:*]+?))\s*:\s*(.*)$")
+_SHEET_SECTION_RE = re.compile(r"^\d+\.\s+(.+)$")
+_SHEET_TOTAL_RE = re.compile(r"\s*\(Total[^)]*\)", re.IGNORECASE)
+
+ATTRIBUTES = ("fee", "duration", "eligibility", "institute")
+MAX_PHRASE = 3
+# Endings a one-word blocker may carry and still block ("refundable", "cancellation", "withdrawal")
+BLOCKER_SUFFIXES = ("s", "es", "ed", "ing", "able", "ible", "al", "ation", "lation", "ment", "ments", "er", "ers", "ship", "ships")
+
+
+class FeeRow(NamedTuple):
+    branches: FrozenSet[str]   # empty = whole course
+    other: bool                # the "B.Tech (Other)" row: every branch not listed elsewhere
+    annual: str
+    total: str
+    source: str
+
+
+class Course:
+    """Everything the dataset states about one programme, with the section each fact came from."""
+
+    def __init__(self, key: str, name: str, level: str):
+        self.key = key
+        self.name = name
+        self.level = level
+        self.years = ""
+        self.duration_note = ""
+        self.fees: List[FeeRow] = []
+        self.entrance = ""
+        self.criteria = ""
+        self.process = ""
+        self.department = ""
+        self.institute = ""
+        self.sources: Dict[str, List[str]] = {attr: [] for attr in ATTRIBUTES}
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "level": self.level,
+            "years": self.years,
+            "fees": [{"branches": sorted(r.branches), "other": r.other, "annual": r.annual, "total": r.total}
+                     for r in self.fees],
+            "entrance": self.entrance,
+            "eligibility": self.criteria,
+            "admission": self.process,
+            "department": self.department,
+            "institute": self.institute,
+        }
+
+
+def _phrase(text: str) -> Tuple[str, ...]:
+    return tuple(tokenize(text))
+
+
+def _clean(value: str) -> str:
+    return _BOLD_RE.sub(r"\1", value).strip().rstrip(".").strip()
+
+
+class FactStore:
+    """
+    Direct answers for "B.Tech CSE fees" / "BPT duration" style questions.
+
+    The master dataset (and the separate fact sheet) are compiled into one Course
+    record per programme: duration from the catalog, fee rows from the fee table,
+    entrance exam / eligibility from the admission section and the institute from
+    the department list. Every (course, attribute, branch) answer is rendered in
+    en/hi/gu when the store is built, so a lookup is a tokenize plus a few dict
+    gets. Vocabulary (aliases, attribute words) and templates live in data/facts.json.
+
+    A question is only answered when it names exactly one course (or branch) and
+    one attribute and has at most max_other unrelated words; everything else, and
+    any fact the dataset doesn't state, is left to the LLM.
+    """
+
+    def __init__(self, config: dict, kb_sections: List[Tuple[str, str]],
+                 sheets: Optional[List[Tuple[str, str]]] = None, max_other: int = 1):
+        self.max_other = max_other
+        self.templates = config.get("templates", {})
+        self.phrases: Dict[Tuple[str, ...], Tuple[str, str]] = {}
+        self.branch_course: Dict[str, str] = {}
+        self.levels: Dict[str, str] = {}
+        self.courses: Dict[str, Course] = {}
+
+        stems = set()
+        for word in config.get("blockers", []):
+            self._add_phrase(word, "blocker", word)
+            if len(_phrase(word)) == 1:
+                stems.update(_phrase(word))
+        self.blocker_re = re.compile("(?:%s)(?:%s)?$" % (
+            "|".join(sorted(map(re.escape, stems), key=len, reverse=True)),
+            "|".join(sorted(BLOCKER_SUFFIXES, key=len, reverse=True)))) if stems else None
+        for attr, words in config.get("attributes", {}).items():
+            for word in words:
+                self._add_phrase(word, "attribute", attr)
+        for name, spec in config.get("courses", {}).items():
+            key = " ".join(_phrase(name))
+            self.levels[key] = spec.get("level", "UG")
+            for alias in [name] + spec.get("aliases", []):
+                self._add_phrase(alias, "course", key)
+        for branch, spec in config.get("branches", {}).items():
+            self.branch_course[branch] = " ".join(_phrase(spec["course"]))
+            for alias in [branch] + spec.get("aliases", []):
+                self._add_phrase(alias, "branch", branch)
+        for word in config.get("ignore_words", []):
+            self._add_phrase(word, "ignore", word)
+
+        departments: Dict[str, List[str]] = config.get("departments", {})
+        self._compile_master(kb_sections, departments)
+        for title, text in sheets or []:
+            self._compile_sheet(title, text)
+
+        self.answers: Dict[Tuple[str, str, Optional[str]], Tuple[Dict[str, str], List[str]]] = {}
+        for course in self.courses.values():
+            self._render(course)
+        self.size = len(self.answers)
+
+    @classmethod
+    def from_files(cls, path: str, kb_sections: List[Tuple[str, str]], sheet_paths: List[str],
+                   max_other: int = 1) -> "FactStore":
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        sheets = []
+        for sheet in sheet_paths:
+            if os.path.exists(sheet):
+                with open(sheet, "r", encoding="utf-8") as f:
+                    sheets.append((os.path.basename(sheet), f.read()))
+        return cls(config, kb_sections, sheets, max_other)
+
+    # --- vocabulary ---
+    def _add_phrase(self, text: str, kind: str, value: str):
+        phrase = _phrase(text)
+        if phrase and len(phrase) <= MAX_PHRASE:
+            self.phrases.setdefault(phrase, (kind, value))
+
+    def _scan(self, query: str) -> List[Tuple[str, str]]:
+        """Query as (kind, value) items, longest known phrase first; unknown words are ("other", word)."""
+        tokens = tokenize(query)
+        items, i = [], 0
+        while i < len(tokens):
+            for n in range(min(MAX_PHRASE, len(tokens) - i), 0, -1):
+                hit = self.phrases.get(tuple(tokens[i:i + n]))
+                if hit is not None:
+                    items.append(hit)
+                    i += n
+                    break
+            else:
+                items.append(("other", tokens[i]))
+                i += 1
+        return items
+
+    def _resolve(self, label: str) -> Tuple[Optional[str], Optional[str]]:
+        """(course key, branch) when the whole label is one course or branch name, else (None, None)."""
+        items = self._scan(label)
+        if len(items) != 1:
+            return None, None
+        kind, value = items[0]
+        if kind == "course":
+            return value, None
+        if kind == "branch":
+            return self.branch_course[value], value
+        return None, None
+
+    def _course(self, key: str, name: str) -> Course:
+        course = self.courses.get(key)
+        if course is None:
+            course = self.courses[key] = Course(key, name, self.levels.get(key, "UG"))
+        return course
+
+    # --- compiler ---
+    def _compile_master(self, sections: List[Tuple[str, str]], departments: Dict[str, List[str]]):
+        institutes: Dict[str, Tuple[str, str]] = {}
+        criteria: Dict[str, Tuple[str, str]] = {}
+        for title, body in sections:
+            lines = body.splitlines()
+            self._parse_fee_table(title, lines)
+            parent = ""
+            for line in lines:
+                m = _DEPARTMENT_RE.match(line.strip())
+                if m:
+                    value = m.group(2).strip()
+                    if value.startswith("(") and value.endswith(")"):
+                        institutes[m.group(1).strip()] = (value[1:-1].strip(), title)
+                    continue
+                if line.startswith("- **"):
+                    self._parse_catalog_line(title, line)
+                m = _BULLET_RE.match(line)
+                if not m:
+                    continue
+                indent, label, value = m.group(1), (m.group(2) or m.group(3)).strip(), m.group(4)
+                if not indent:
+                    parent = label.lower()
+                    if m.group(2) and value and not _YEARS_RE.search(line):
+                        self._parse_admission_note(title, label, value, departments)
+                    continue
+                if "entrance" in parent:
+                    key, _ = self._resolve(label)
+                    if key and key in self.courses:
+                        self.courses[key].entrance = _clean(value)
+                        self.courses[key].sources["eligibility"].append(title)
+                elif "eligibility" in parent:
+                    criteria[label.upper()] = (_clean(value), title)
+
+        for department, names in departments.items():
+            for name in names:
+                course = self.courses.get(" ".join(_phrase(name)))
+                if course is None:
+                    continue
+                course.department = department
+                if department in institutes:
+                    course.institute, source = institutes[department]
+                    course.sources["institute"].append(source)
+        for course in self.courses.values():
+            if course.level in criteria:
+                course.criteria, source = criteria[course.level]
+                course.sources["eligibility"].append(source)
+
+    def _parse_catalog_line(self, title: str, line: str):
+        """"- **B.Tech (4 Years)**: CSE, IT" / "- **B.Pharma (4 Years)** / **M.Pharma (2 Years)**" / "- **B.A.M.S. (...)**: 5.5 Years"."""
+        segments = _BOLD_RE.findall(line)
+        tail = line.split("**:", 1)[1] if "**:" in line else ""
+        for segment in segments:
+            name = segment.split("(", 1)[0].strip()
+            key, _ = self._resolve(name)
+            years = _YEARS_RE.search(segment) or (_YEARS_RE.search(tail) if len(segments) == 1 else None)
+            if key is None or (years is None and key not in self.levels):
+                continue
+            course = self._course(key, name)
+            if years and not course.years:
+                course.years = years.group(1)
+                course.duration_note = f" {years.group(2)}" if years.group(2) else ""
+                course.sources["duration"].append(title)
+
+    def _parse_admission_note(self, title: str, label: str, value: str, departments: Dict[str, List[str]]):
+        """"- **Engineering/Pharmacy**: Admissions via ACPC" applies to every course of those departments."""
+        for part in label.split("/"):
+            words = set(_phrase(part))
+            for department, names in departments.items():
+                if words and words <= set(_phrase(department)):
+                    for name in names:
+                        course = self.courses.get(" ".join(_phrase(name)))
+                        if course is not None and not course.process:
+                            course.process = _clean(value)
+                            course.sources["eligibility"].append(title)
+
+    def _parse_fee_table(self, title: str, lines: List[str]):
+        rows = [[c.strip() for c in l.strip().strip("|").split("|")] for l in lines if l.strip().startswith("|")]
+        if len(rows) < 2:
+            return
+        header = [c.lower() for c in rows[0]]
+        annual = next((i for i, c in enumerate(header) if "annual" in c), None)
+        total = next((i for i, c in enumerate(header) if "total" in c), None)
+        if annual is None and total is None:
+            return
+        for cells in rows[1:]:
+            if not cells or set(cells[0]) <= set("-: "):
+                continue
+            label = cells[0]
+            branches, other = frozenset(), False
+            m = _PAREN_RE.match(label)
+            if m:
+                parts = [p.strip() for p in m.group(2).split("/")]
+                if all(p.lower() == "other" or p.upper() in self.branch_course for p in parts):
+                    label = m.group(1)
+                    other = any(p.lower() == "other" for p in parts)
+                    branches = frozenset(p.upper() for p in parts if p.lower() != "other")
+            row_annual = cells[annual] if annual is not None and annual < len(cells) else ""
+            row_total = cells[total] if total is not None and total < len(cells) else ""
+            for name in label.split(" / "):
+                key, _ = self._resolve(name.strip())
+                if key is None:
+                    key, _ = self._resolve(name.split("(", 1)[0].strip())
+                if key is None:
+                    continue
+                course = self._course(key, name.strip())
+                course.fees.append(FeeRow(branches, other, row_annual, row_total, title))
+                course.sources["fee"].append(title)
+
+    def _compile_sheet(self, name: str, text: str):
+        """
+        Plain "- Label: value" fact sheet (kpgu_info.txt). Only fills gaps: a course whose
+        fees the master dataset already states keeps them.
+        """
+        section = ""
+        for line in text.splitlines():
+            m = _SHEET_SECTION_RE.match(line.strip())
+            if m:
+                section = m.group(1).strip()
+                continue
+            m = _BULLET_RE.match(line)
+            if not m or m.group(1) or "fee" not in section.lower():
+                continue
+            label, value = (m.group(2) or m.group(3)).strip(), m.group(4)
+            pm = _PAREN_RE.match(label)
+            candidates = [label] + ([pm.group(1), pm.group(2)] if pm else [])
+            for candidate in candidates:
+                key, branch = self._resolve(candidate)
+                if key is None and "/" in candidate:
+                    key, branch = self._resolve(candidate.split("/", 1)[0])
+                if key is not None:
+                    break
+            if key is None or branch is not None or (key in self.courses and self.courses[key].fees):
+                continue
+            value = _SHEET_TOTAL_RE.sub("", value).strip().rstrip(".")
+            source = f"{name} > {section}"
+            course = self._course(key, label.split("(", 1)[0].strip())
+            if "per year" in value.lower():
+                row = FeeRow(frozenset(), False, re.sub(r"\s*per year", "", value, flags=re.IGNORECASE), "", source)
+            else:
+                row = FeeRow(frozenset(), False, "", value, source)
+            course.fees.append(row)
+            course.sources["fee"].append(source)
+
+    # --- answers ---
+    def _render(self, course: Course):
+        if course.years and "duration" in self.templates:
+            self._store(course, "duration", None, {
+                lang: t["answer"].format(course=course.name, years=course.years, note=course.duration_note)
+                for lang, t in self.templates["duration"].items()})
+
+        if course.fees and "fee" in self.templates:
+            branches = sorted({b for row in course.fees for b in row.branches})
+            for branch in [None] + branches:
+                rows = course.fees
+                if branch is not None:
+                    rows = [r for r in course.fees if branch in r.branches] or [r for r in course.fees if r.other]
+                self._store(course, "fee", branch, {
+                    lang: self._fee_text(course, rows, branch, t) for lang, t in self.templates["fee"].items()})
+            # Branches of the course that only the "Other" row covers
+            other = [r for r in course.fees if r.other]
+            if other:
+                for branch, key in self.branch_course.items():
+                    if key == course.key and branch not in branches:
+                        self._store(course, "fee", branch, {
+                            lang: self._fee_text(course, other, branch, t) for lang, t in self.templates["fee"].items()})
+
+        if (course.entrance or course.criteria) and "eligibility" in self.templates:
+            texts = {}
+            for lang, t in self.templates["eligibility"].items():
+                lines = [t["header"].format(course=course.name)]
+                for field, value in (("exam", course.entrance), ("criteria", course.criteria), ("process", course.process)):
+                    if value:
+                        lines.append("- " + t[field].format(value=value))
+                texts[lang] = "\n".join(lines)
+            self._store(course, "eligibility", None, texts)
+
+        if course.institute and "institute" in self.templates:
+            self._store(course, "institute", None, {
+                lang: t["answer"].format(course=course.name, institute=course.institute, department=course.department)
+                for lang, t in self.templates["institute"].items()})
+
+    @staticmethod
+    def _fee_text(course: Course, rows: List[FeeRow], branch: Optional[str], t: Dict[str, str]) -> str:
+        name = f"{course.name} ({branch})" if branch else course.name
+        lines = [t["header"].format(course=name)]
+        for row in rows:
+            parts = [t[field].format(value=value) for field, value in (("annual", row.annual), ("total", row.total)) if value]
+            if len(rows) > 1:
+                label = "/".join(sorted(row.branches)) or (t["other"] if row.other else course.name)
+                lines.append(f"- **{label}**: " + " | ".join(parts))
+            else:
+                lines.extend("- " + p for p in parts)
+        lines.append("")
+        lines.append(t["footer"])
+        return "\n".join(lines)
+
+    def _store(self, course: Course, attr: str, branch: Optional[str], texts: Dict[str, str]):
+        self.answers[(course.key, attr, branch)] = (texts, list(dict.fromkeys(course.sources[attr])))
+
+    # --- lookup ---
+    def _blocked(self, word: str) -> bool:
+        return self.blocker_re is not None and self.blocker_re.match(word) is not None
+
+    def _subject(self, items: List[Tuple[str, str]]) -> Tuple[Optional[str], Optional[str], bool]:
+        """(course key, branch, ambiguous) named by the scanned query."""
+        courses = {v for k, v in items if k == "course"}
+        branches = {v for k, v in items if k == "branch"}
+        if len(courses) > 1 or len(branches) > 1:
+            return None, None, True
+        branch = next(iter(branches), None)
+        course = next(iter(courses), None) or (self.branch_course.get(branch) if branch else None)
+        return course, branch, False
+
+    def match(self, query: str, target_lang: str, previous: Optional[str] = None) -> Optional[Tuple[str, str, List[str]]]:
+        """
+        Returns (response, language code, sources) for a direct factual lookup, else None.
+        previous is the last question of a follow-up ("and the duration?" after "BPT fees").
+        """
+        items = self._scan(query)
+        if any(kind == "blocker" or (kind == "other" and self._blocked(value)) for kind, value in items):
+            return None
+        attrs = {v for k, v in items if k == "attribute"}
+        if len(attrs) != 1 or sum(1 for k, _ in items if k == "other") > self.max_other:
+            return None
+        course, branch, ambiguous = self._subject(items)
+        if ambiguous:
+            return None
+        if course is None and previous:
+            course, branch, ambiguous = self._subject(self._scan(previous))
+            if ambiguous:
+                return None
+        if course is None:
+            return None
+
+        attr = attrs.pop()
+        hit = self.answers.get((course, attr, branch)) or self.answers.get((course, attr, None))
+        if hit is None:
+            return None
+        texts, sources = hit
+        lang = LANG_CODES.get(target_lang, "en")
+        if lang not in texts:
+            lang = "en"
+        return texts[lang], lang, sources
+
+    def records(self) -> Dict[str, dict]:
+        return {course.name: course.as_dict() for course in self.courses.values()}
@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from app.db.migrations import has_fts
+
+DEFAULT_WINDOW = timedelta(days=7)
+BUCKETS = {"hour": 13, "day": 10, "month": 7}  # prefix length of the "YYYY-MM-DD HH:00" rollup key
+_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _fts_query(keywords: str) -> str:
+    """Every word must occur; words are quoted so FTS5 operators in user input are plain text. "fee*" keeps its prefix star."""
+    terms = []
+    for word in keywords.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*").replace('"', '""')
+        if word:
+            terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+class HistoryAnalytics:
+    """
+    Read side of the chat history. Top questions and volume come from the hourly
+    rollup tables (rows per hour and question / language, not per request); listing
+    and keyword search walk chat_history / its FTS5 index backwards by id with a
+    keyset cursor, so page N costs the same as page 1 at any table size.
+    """
+
+    def __init__(self):
+        self._fts: Optional[bool] = None
+
+    @property
+    def engine(self):
+        from app.db.database import engine
+        return engine
+
+    @property
+    def fts(self) -> bool:
+        if self._fts is None:
+            self._fts = has_fts(self.engine)
+        return self._fts
+
+    @staticmethod
+    def _window(since: Optional[datetime], until: Optional[datetime]):
+        until = until or datetime.utcnow()
+        since = since or until - DEFAULT_WINDOW
+        return since, until
+
+    def top_questions(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                      language: Optional[str] = None, limit: int = 20) -> dict:
+        since, until = self._window(since, until)
+        sql = ("SELECT query_key, SUM(count) AS n, SUM(timed), SUM(latency_ms_sum), MIN(sample_query)"
+               " FROM chat_question_hourly WHERE hour >= ? AND hour <= ?")
+        params: list = [since.strftime("%Y-%m-%d %H:00"), until.strftime("%Y-%m-%d %H:00")]
+        if language:
+            sql += " AND detected_language = ?"
+            params.append(language)
+        sql += " GROUP BY query_key ORDER BY n DESC LIMIT ?"
+        params.append(limit)
+        with self.engine.connect() as conn:
+            rows = conn.exec_driver_sql(sql, tuple(params)).fetchall()
+        return {
+            "since": since.isoformat(),
+            "until": until.isoformat(),
+            "questions": [
+                {"question": sample, "key": key, "count": n,
+                 "avg_latency_ms": round(total / timed, 1) if timed else None}
+                for key, n, timed, total, sample in rows
+            ],
+        }
+
+    def volume(self, bucket: str = "day", since: Optional[datetime] = None, until: Optional[datetime] = None,
+               language: Optional[str] = None) -> dict:
+        width = BUCKETS.get(bucket)
+        if width is None:
+            raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+        since, until = self._window(since, until)
+        sql = (f"SELECT substr(hour, 1, {width}) AS b, SUM(count), SUM(timed), SUM(latency_ms_sum)"
+               " FROM chat_hourly_totals WHERE hour >= ? AND hour <= ?")
+        params: list = [since.strftime("%Y-%m-%d %H:00"), until.strftime("%Y-%m-%d %H:00")]
+        if language:
+            sql += " AND detected_language = ?"
+            params.append(language)
+        sql += " GROUP BY b ORDER BY b"
+        with self.engine.connect() as conn:
+            rows = conn.exec_driver_sql(sql, tuple(params)).fetchall()
+        return {
+            "bucket": bucket,
+            "since": since.isoformat(),
+            "until": until.isoformat(),
+            "series": [
+                {"start": b, "count": n, "avg_latency_ms": round(total / timed, 1) if timed else None}
+                for b, n, timed, total in rows
+            ],
+        }
+
+    def search(self, keywords: Optional[str] = None, language: Optional[str] = None,
+               provider: Optional[str] = None, outcome: Optional[str] = None,
+               min_latency_ms: Optional[float] = None, since: Optional[datetime] = None,
+               until: Optional[datetime] = None, before_id: Optional[int] = None, limit: int = 50) -> dict:
+        """Newest first. Pass the returned next_cursor as before_id to get the next page."""
+        columns = 'h.id, h."query", h.response, h.timestamp, h.detected_language, h.provider, h.outcome, h.latency_ms'
+        where: List[str] = []
+        params: list = []
+        match = _fts_query(keywords) if keywords else ""
+        if match and self.fts:
+            sql = f"SELECT {columns} FROM chat_history_fts f JOIN chat_history h ON h.id = f.rowid"
+            where.append("chat_history_fts MATCH ?")
+            params.append(match)
+            id_column = "f.rowid"
+        else:
+            sql = f"SELECT {columns} FROM chat_history h"
+            id_column = "h.id"
+            for word in (keywords or "").split():
+                # No FTS5 in this SQLite build: a (slow) substring scan still works
+                where.append('(h."query" LIKE ? OR h.response LIKE ?)')
+                params.extend([f"%{word.rstrip('*')}%"] * 2)
+        if before_id is not None:
+            where.append(f"{id_column} < ?")
+            params.append(before_id)
+        for column, value in (("detected_language", language), ("provider", provider), ("outcome", outcome)):
+            if value:
+                where.append(f"h.{column} = ?")
+                params.append(value)
+        if min_latency_ms is not None:
+            where.append("h.latency_ms >= ?")
+            params.append(min_latency_ms)
+        if since is not None:
+            where.append("h.timestamp >= ?")
+            params.append(since.strftime(_TIME_FORMAT))
+        if until is not None:
+            where.append("h.timestamp < ?")
+            params.append(until.strftime(_TIME_FORMAT))
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {id_column} DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with self.engine.connect() as conn:
+            rows = conn.exec_driver_sql(sql, tuple(params)).fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            "items": [
+                {"id": i, "query": q, "response": r, "timestamp": ts, "detected_language": lang,
+                 "provider": prov, "outcome": out, "latency_ms": lat}
+                for i, q, r, ts, lang, prov, out, lat in rows
+            ],
+            "next_cursor": rows[-1][0] if more else None,
+            "full_text": bool(match) and self.fts,
+        }
+
+
+history_analytics = HistoryAnalytics()
@@ -0,0 +1,181 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from app.core.config import settings
+from app.db.migrations import hour_bucket, question_key
+from app.services.telemetry import log, metrics
+
+_STOP = object()
+
+_ROLLUP_UPSERT = (
+    "INSERT INTO chat_question_hourly"
+    " (hour, query_key, detected_language, count, timed, latency_ms_sum, sample_query)"
+    " VALUES (:hour, :query_key, :detected_language, :count, :timed, :latency_ms_sum, :sample_query)"
+    " ON CONFLICT (hour, query_key, detected_language) DO UPDATE SET"
+    " count = count + excluded.count, timed = timed + excluded.timed,"
+    " latency_ms_sum = latency_ms_sum + excluded.latency_ms_sum"
+)
+_TOTALS_UPSERT = (
+    "INSERT INTO chat_hourly_totals (hour, detected_language, count, timed, latency_ms_sum)"
+    " VALUES (:hour, :detected_language, :count, :timed, :latency_ms_sum)"
+    " ON CONFLICT (hour, detected_language) DO UPDATE SET"
+    " count = count + excluded.count, timed = timed + excluded.timed,"
+    " latency_ms_sum = latency_ms_sum + excluded.latency_ms_sum"
+)
+
+
+class HistoryWriter:
+    """
+    Write-behind logger for ChatHistory rows.
+    Requests only enqueue a row; a background task inserts them in batches
+    (every HISTORY_BATCH_SIZE rows or HISTORY_FLUSH_INTERVAL seconds) in a worker
+    thread, so the event loop never waits on SQLite. When the queue is full new
+    rows are dropped and counted instead of slowing requests down.
+
+    The hourly rollups (chat_question_hourly, chat_hourly_totals) are updated in
+    the same transaction as the insert, so analytics never scan the history table.
+    """
+
+    def __init__(self, max_queue: int, batch_size: int, flush_interval: float):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def start(self, after: Optional[asyncio.Future] = None):
+        """
+        Start the background writer. With `after` (e.g. the schema migration task)
+        rows are queued right away but nothing is written until it has finished.
+        """
+        if self._task is None or self._task.done():
+            if self._queue is None:
+                self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = asyncio.create_task(self._run(after))
+
+    async def stop(self):
+        """Flush everything still queued, then stop the background task."""
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        self._queue = None
+
+    def enqueue(self, query: str, response: str, **fields):
+        """Queue one chat interaction for persistence (never blocks)."""
+        self.start()
+        row = {"query": query, "response": response, "timestamp": datetime.utcnow(),
+               "query_key": question_key(query), **fields}
+        try:
+            self._queue.put_nowait(row)
+            self.enqueued += 1
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _run(self, after: Optional[asyncio.Future] = None):
+        if after is not None:
+            try:
+                await after
+            except Exception as err:
+                log(f"History writer: startup step failed, writing anyway: {err}")
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            row = await self._queue.get()
+            if row is _STOP:
+                break
+            rows = [row]
+            deadline = loop.time() + self.flush_interval
+            while len(rows) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is _STOP:
+                    stopping = True
+                    break
+                rows.append(row)
+            await self._flush(rows)
+
+    async def _flush(self, rows: List[dict]):
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self._write, rows)
+            self.written += len(rows)
+            self.batches += 1
+        except Exception as db_err:
+            self.failed += len(rows)
+            log(f"Database Error: {db_err}")
+        metrics.history_write_seconds.observe(time.perf_counter() - started)
+
+    @staticmethod
+    def _rollup(rows: List[dict]) -> List[dict]:
+        groups = {}
+        for row in rows:
+            key = (hour_bucket(row["timestamp"]), row["query_key"], row.get("detected_language") or "")
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = {"hour": key[0], "query_key": key[1], "detected_language": key[2],
+                                       "count": 0, "timed": 0, "latency_ms_sum": 0.0, "sample_query": row["query"]}
+            group["count"] += 1
+            if row.get("latency_ms") is not None:
+                group["timed"] += 1
+                group["latency_ms_sum"] += row["latency_ms"]
+        return list(groups.values())
+
+    @staticmethod
+    def _totals(questions: List[dict]) -> List[dict]:
+        totals = {}
+        for q in questions:
+            key = (q["hour"], q["detected_language"])
+            total = totals.setdefault(key, {"hour": key[0], "detected_language": key[1],
+                                            "count": 0, "timed": 0, "latency_ms_sum": 0.0})
+            for field in ("count", "timed", "latency_ms_sum"):
+                total[field] += q[field]
+        return list(totals.values())
+
+    def _write(self, rows: List[dict]):
+        # SQLAlchemy is first imported here, in the writer thread, not when the app starts
+        from sqlalchemy import insert, text
+        from app.db.database import SessionLocal
+        from app.db.models import ChatHistory
+
+        db = SessionLocal()
+        try:
+            db.execute(insert(ChatHistory), rows)
+            questions = self._rollup(rows)
+            db.execute(text(_ROLLUP_UPSERT), questions)
+            db.execute(text(_TOTALS_UPSERT), self._totals(questions))
+            db.commit()
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_max": self.max_queue,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+
+history_writer = HistoryWriter(
+    max_queue=settings.HISTORY_QUEUE_MAX,
+    batch_size=settings.HISTORY_BATCH_SIZE,
+    flush_interval=settings.HISTORY_FLUSH_INTERVAL,
+)
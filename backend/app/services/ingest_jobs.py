@@ -0,0 +1,121 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from app.services.telemetry import log
+
+
+class IngestJob:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"  # queued | running | succeeded | failed | cancelled
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.progress: dict = {}
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.cancel_event = threading.Event()
+
+    def to_dict(self) -> dict:
+        end = self.finished_at or time.time()
+        elapsed = (end - self.started_at) if self.started_at else 0.0
+        chunks = self.progress.get("chunks_embedded", 0)
+        files = self.progress.get("files_done", 0)
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "files_total": self.progress.get("files_total"),
+            "files_processed": files,
+            "chunks_embedded": chunks,
+            "chunks_unchanged": self.progress.get("chunks_unchanged", 0),
+            "chunks_removed": self.progress.get("chunks_removed", 0),
+            "elapsed_s": round(elapsed, 2),
+            "throughput": {
+                "files_per_s": round(files / elapsed, 2) if elapsed else 0.0,
+                "chunks_per_s": round(chunks / elapsed, 2) if elapsed else 0.0,
+            },
+            "errors": self.progress.get("errors", []) + ([self.error] if self.error else []),
+            "message": (self.result or {}).get("message"),
+        }
+
+
+class IngestJobManager:
+    """
+    Runs ingestion jobs one at a time on a dedicated worker thread.
+    The single worker serializes all vector store writers (queued jobs wait their
+    turn) and keeps parsing/embedding off the event loop, so live chat traffic is
+    unaffected. Finished jobs are kept for inspection up to max_history.
+    """
+
+    def __init__(self, max_history: int = 50):
+        self.max_history = max_history
+        self.jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest")
+        self._lock = threading.Lock()
+
+    def submit(self) -> IngestJob:
+        job = IngestJob()
+        with self._lock:
+            self.jobs[job.id] = job
+            self._trim()
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[IngestJob]:
+        job = self.jobs.get(job_id)
+        if job and job.status in ("queued", "running"):
+            job.cancel_event.set()
+            if job.status == "queued":
+                job.status = "cancelled"
+                job.finished_at = time.time()
+        return job
+
+    def _trim(self):
+        finished = [jid for jid, j in self.jobs.items() if j.status not in ("queued", "running")]
+        while len(self.jobs) > self.max_history and finished:
+            self.jobs.pop(finished.pop(0))
+
+    def _run(self, job: IngestJob):
+        if job.cancel_event.is_set():
+            return
+        # Imported here so the heavy loaders / vector store only load when a job actually runs
+        from app.services.ingestion_service import ingestion_service
+
+        job.status = "running"
+        job.started_at = time.time()
+
+        def on_progress(p):
+            job.progress = p
+
+        try:
+            result = ingestion_service.ingest_documents(on_progress=on_progress, should_cancel=job.cancel_event.is_set)
+            job.result = result
+            if "progress" in result:
+                job.progress = result["progress"]
+            job.status = {"success": "succeeded", "warning": "succeeded", "cancelled": "cancelled"}.get(result.get("status"), "failed")
+            if job.status == "failed":
+                job.error = result.get("message")
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            log(f"INFO: Ingest job {job.id} {job.status}")
+
+    def shutdown(self):
+        for job in list(self.jobs.values()):
+            job.cancel_event.set()
+        self._executor.shutdown(wait=True)
+
+
+ingest_jobs = IngestJobManager()
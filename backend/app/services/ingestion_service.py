@@ -1,84 +1,358 @@
+import hashlib
+import json
 import os
-from typing import List
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
 from langchain_community.document_loaders import PyPDFLoader, TextLoader, Docx2txtLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
+from tenacity import retry, stop_after_attempt, wait_exponential
 from app.core.config import settings
+from app.services.embeddings import get_embeddings, resolve_embedding_backend
+from app.services.telemetry import log
+from app.services.vector_index import NumpyVectorIndex
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".docx")
+_DONE = object()
+
+
+def sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def chunk_id(source: str, content: str) -> str:
+    """Stable vector id for a chunk: same file + same text -> same id."""
+    return hashlib.sha256(f"{source}\0{content}".encode("utf-8")).hexdigest()
+
+
+def parse_file(file_path: str) -> List[Tuple[str, dict]]:
+    """Load one document into (text, metadata) pages. Runs in a worker process (PDF parsing is CPU-bound)."""
+    if file_path.endswith(".pdf"):
+        docs = PyPDFLoader(file_path).load()
+    elif file_path.endswith(".txt"):
+        docs = TextLoader(file_path, encoding="utf-8").load()
+    elif file_path.endswith(".docx"):
+        docs = Docx2txtLoader(file_path).load()
+    else:
+        docs = []
+    return [(d.page_content, d.metadata) for d in docs]
+
+
+class IngestManifest:
+    """
+    JSON record of what is already in the vector store:
+    {file name: {"sha256": file hash, "chunks": [chunk ids]}} plus the embedding
+    backend the vectors were built with.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.exists = os.path.exists(path)
+        self.files: Dict[str, dict] = {}
+        self.embedding = None
+        if self.exists:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.files = data.get("files", {})
+            self.embedding = data.get("embedding")
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"embedding": self.embedding, "files": self.files}, f, indent=1)
+        os.replace(tmp, self.path)
+
+
+class ChromaStore:
+    """Adapter giving Chroma the same upsert/delete/reset/commit surface as NumpyVectorIndex."""
+
+    def __init__(self, directory: str, embeddings):
+        self.vector_store = Chroma(persist_directory=directory, embedding_function=embeddings)
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.vector_store._collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def delete(self, ids):
+        self.vector_store.delete(ids=ids)
+
+    def reset(self):
+        self.vector_store.reset_collection()
+
+    def commit(self):
+        pass  # Chroma persists on every write
+
+
+class NumpyStore(NumpyVectorIndex):
+    def commit(self):
+        self.compact()
+        self.save()
+
+
+def open_vector_store(kind: str, directory: str, embeddings, backend: str):
+    if kind == "numpy":
+        # IDF weighting only makes sense for the sparse hashed n-gram vectors
+        return NumpyStore(directory, use_idf=(backend == "local"))
+    return ChromaStore(directory, embeddings)
+
 
 class IngestionService:
+    """
+    Streaming ingestion pipeline:
+      hash files -> parse changed files in a process pool -> bounded queue ->
+      split + diff chunks against the manifest -> embed in batches on a bounded
+      thread pool (with retry/backoff) -> upsert into the vector store
+      (Chroma, or the local NumPy index when VECTOR_STORE="numpy").
+    Only a handful of files and INGEST_EMBED_CONCURRENCY batches are in memory at
+    any time, however large the corpus is.
+    """
+
     def __init__(self):
         self.data_dir = "data"
-        self.db_dir = settings.CHROMA_DB_DIR
-        self.api_key = settings.OPENAI_API_KEY
-        
-    def ingest_documents(self):
+        self.store_kind = settings.VECTOR_STORE
+        self.db_dir = settings.VECTOR_INDEX_DIR if self.store_kind == "numpy" else settings.CHROMA_DB_DIR
+        self.manifest_path = os.path.join(self.db_dir, "ingest_manifest.json")
+
+    def _parse_stream(self, paths: List[str], out: "queue.Queue", should_cancel: Callable[[], bool]):
+        """Producer thread: parse files (in worker processes when enabled) and feed the bounded queue."""
+        workers = settings.INGEST_WORKERS
+        try:
+            if workers <= 0:
+                for path in paths:
+                    if should_cancel():
+                        return
+                    try:
+                        out.put((path, parse_file(path), None))
+                    except Exception as e:
+                        out.put((path, None, e))
+                return
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # Keep at most 2x workers files in flight so parsed pages don't pile up
+                pending = []
+                for path in paths:
+                    if should_cancel():
+                        break
+                    pending.append((path, pool.submit(parse_file, path)))
+                    if len(pending) >= 2 * workers:
+                        self._drain_one(pending, out)
+                while pending:
+                    self._drain_one(pending, out)
+        finally:
+            out.put(_DONE)
+
+    @staticmethod
+    def _drain_one(pending, out):
+        path, future = pending.pop(0)
+        try:
+            out.put((path, future.result(), None))
+        except Exception as e:
+            out.put((path, None, e))
+
+    def ingest_documents(self, on_progress: Optional[Callable[[dict], None]] = None,
+                         should_cancel: Optional[Callable[[], bool]] = None):
         """
-        Scans data directory for supported files, processes them, and updates the Vector DB.
+        Scans data directory for supported files and incrementally updates the Vector DB.
+        Unchanged files are skipped; for new/changed files only chunks whose content hash
+        is not already stored get embedded, and chunks that disappeared (edited or
+        deleted files) are removed from the store.
+        should_cancel is polled between files and batches; a cancelled run leaves the
+        manifest untouched so the next run picks up where it stopped.
         """
-        self.openai_key = settings.OPENAI_API_KEY
-        self.google_key = settings.GOOGLE_API_KEY
-        
-        use_gemini = False
-        if (not self.openai_key or "placeholder" in self.openai_key) and (self.google_key and "placeholder" not in self.google_key):
-            use_gemini = True
-        elif not (self.openai_key and "placeholder" not in self.openai_key):
-             return {"status": "error", "message": "No valid API Key (OpenAI or Google) found."}
-
-        # 1. Load Documents
-        documents = []
+        should_cancel = should_cancel or (lambda: False)
+        backend = resolve_embedding_backend()
+
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
-            
-        files = [f for f in os.listdir(self.data_dir) if os.path.isfile(os.path.join(self.data_dir, f))]
-        
+
+        files = sorted(f for f in os.listdir(self.data_dir)
+                       if os.path.isfile(os.path.join(self.data_dir, f)) and f.endswith(SUPPORTED_EXTENSIONS))
+
         if not files:
             return {"status": "warning", "message": "No files found in 'data' directory."}
 
-        print(f"INFO: Found {len(files)} files to ingest.")
+        log(f"INFO: Found {len(files)} files to ingest.")
+        started = time.perf_counter()
+        manifest = IngestManifest(self.manifest_path)
+        if manifest.exists and manifest.embedding != backend:
+            # Vectors from another embedding model can't be mixed in: rebuild from scratch
+            manifest.files, manifest.exists = {}, False
 
+        progress = {"files_total": len(files), "files_done": 0, "chunks_embedded": 0,
+                    "chunks_removed": 0, "chunks_unchanged": 0, "errors": []}
+
+        def report():
+            progress["elapsed_s"] = round(time.perf_counter() - started, 2)
+            if on_progress:
+                on_progress(dict(progress))
+
+        # 1. Cheap pass: hash every file, only changed ones get parsed
+        new_files: Dict[str, dict] = {}
+        file_hashes: Dict[str, str] = {}
+        skipped = []
         for file in files:
-            file_path = os.path.join(self.data_dir, file)
-            try:
-                if file.endswith(".pdf"):
-                    loader = PyPDFLoader(file_path)
-                    documents.extend(loader.load())
-                elif file.endswith(".txt"):
-                    loader = TextLoader(file_path)
-                    documents.extend(loader.load())
-                elif file.endswith(".docx"):
-                    loader = Docx2txtLoader(file_path)
-                    documents.extend(loader.load())
-            except Exception as e:
-                print(f"ERROR: Failed to load {file}: {e}")
-
-        if not documents:
-            return {"status": "warning", "message": "No valid documents loaded."}
-
-        # 2. Split Text
+            file_hash = sha256_file(os.path.join(self.data_dir, file))
+            previous = manifest.files.get(file)
+            if previous and previous["sha256"] == file_hash:
+                new_files[file] = previous
+                skipped.append(file)
+                progress["files_done"] += 1
+                progress["chunks_unchanged"] += len(previous["chunks"])
+            else:
+                file_hashes[file] = file_hash
+        to_delete: List[str] = [cid for f, prev in manifest.files.items() if f not in files for cid in prev["chunks"]]
+        report()
+
+        if not file_hashes and not to_delete and manifest.exists:
+            return {"status": "success", "message": "Vector DB already up to date.", "files": files,
+                    "added": 0, "removed": 0, "skipped_files": skipped, "progress": progress}
+
+        try:
+            embeddings = get_embeddings(backend)
+            vector_store = open_vector_store(self.store_kind, self.db_dir, embeddings, backend)
+            if not manifest.exists:
+                # Vectors from before the manifest existed have random ids and would stay duplicated forever
+                vector_store.reset()
+        except Exception as e:
+            return {"status": "error", "message": f"Vector DB Error: {str(e)}"}
+
+        write_lock = threading.Lock()
+        progress_lock = threading.Lock()
+
+        @retry(stop=stop_after_attempt(settings.INGEST_EMBED_RETRIES), wait=wait_exponential(multiplier=1, min=1, max=30), reraise=True)
+        def embed(texts):
+            return embeddings.embed_documents(texts)
+
+        def embed_and_store(batch):
+            if should_cancel():
+                return 0
+            vectors = embed([doc for _, doc, _ in batch])
+            with write_lock:
+                vector_store.upsert(
+                    ids=[cid for cid, _, _ in batch],
+                    embeddings=vectors,
+                    documents=[doc for _, doc, _ in batch],
+                    metadatas=[meta for _, _, meta in batch],
+                )
+            return len(batch)
+
+        # 2. Streaming pass: parse -> split -> diff -> batched embedding
         text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        splits = text_splitter.split_documents(documents)
-        
-        # 3. Update Vector Store
+        parsed: "queue.Queue" = queue.Queue(maxsize=settings.INGEST_QUEUE_SIZE)
+        producer = threading.Thread(
+            target=self._parse_stream,
+            args=([os.path.join(self.data_dir, f) for f in file_hashes], parsed, should_cancel),
+            daemon=True,
+        )
+        producer.start()
+
+        slots = threading.Semaphore(settings.INGEST_EMBED_CONCURRENCY)
+        in_flight = []
+        batch = []
+        failed = False
+        cancelled = False
+
+        def submit(pool, items):
+            slots.acquire()  # backpressure: wait while too many batches are embedding
+            future = pool.submit(embed_and_store, items)
+
+            def done(f):
+                slots.release()
+                if f.exception() is None:
+                    with progress_lock:
+                        progress["chunks_embedded"] += f.result()
+                        report()
+
+            future.add_done_callback(done)
+            in_flight.append(future)
+
+        with ThreadPoolExecutor(max_workers=settings.INGEST_EMBED_CONCURRENCY) as pool:
+            while True:
+                item = parsed.get()
+                if item is _DONE:
+                    break
+                if cancelled or should_cancel():
+                    cancelled = True
+                    continue  # keep draining so the producer can finish
+                path, pages, err = item
+                file = os.path.basename(path)
+                previous = manifest.files.get(file)
+                if err is not None:
+                    log(f"ERROR: Failed to load {file}: {err}")
+                    progress["errors"].append(f"{file}: {err}")
+                    if previous:
+                        new_files[file] = previous
+                    progress["files_done"] += 1
+                    report()
+                    continue
+
+                old_ids = set(previous["chunks"]) if previous else set()
+                ids, seen = [], set()
+                for text, meta in pages:
+                    for chunk in text_splitter.split_text(text):
+                        cid = chunk_id(file, chunk)
+                        if cid in seen:
+                            continue  # identical chunk twice in one file
+                        seen.add(cid)
+                        ids.append(cid)
+                        if cid in old_ids:
+                            progress["chunks_unchanged"] += 1
+                            continue
+                        batch.append((cid, chunk, meta))
+                        if len(batch) >= settings.INGEST_EMBED_BATCH_SIZE:
+                            submit(pool, batch)
+                            batch = []
+                to_delete.extend(old_ids - seen)
+                new_files[file] = {"sha256": file_hashes[file], "chunks": ids}
+                progress["files_done"] += 1
+                log(f"INFO: [{progress['files_done']}/{len(files)}] {file}: {len(ids)} chunks")
+                report()
+            if batch and not cancelled:
+                submit(pool, batch)
+
+        producer.join()
+        for future in in_flight:
+            if future.exception() is not None:
+                failed = True
+                progress["errors"].append(f"embedding: {future.exception()}")
+
+        if cancelled or should_cancel():
+            report()
+            return {"status": "cancelled", "message": "Ingestion cancelled; no changes recorded in the manifest.", "progress": progress}
+
+        if failed:
+            # Don't record the new state: the next run will retry the missing chunks
+            report()
+            return {"status": "error", "message": f"Embedding failed: {progress['errors'][-1]}", "progress": progress}
+
         try:
-            if use_gemini:
-                from langchain_google_genai import GoogleGenerativeAIEmbeddings
-                embeddings = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001", google_api_key=self.google_key)
-            else:
-                embeddings = OpenAIEmbeddings(api_key=self.openai_key)
-                
-            vector_store = Chroma(
-                persist_directory=self.db_dir,
-                embedding_function=embeddings
-            )
-            vector_store.add_documents(splits)
-            
-            return {
-                "status": "success", 
-                "message": f"Successfully processed {len(files)} files into {len(splits)} chunks using {'Gemini' if use_gemini else 'OpenAI'}.",
-                "files": files
-            }
+            if to_delete:
+                with write_lock:
+                    vector_store.delete(to_delete)
+            vector_store.commit()
+            progress["chunks_removed"] = len(to_delete)
+            manifest.files = new_files
+            manifest.embedding = backend
+            manifest.save()
         except Exception as e:
             return {"status": "error", "message": f"Vector DB Error: {str(e)}"}
+        report()
+
+        return {
+            "status": "success",
+            "message": f"Embedded {progress['chunks_embedded']} new chunks and removed {len(to_delete)} stale chunks "
+                       f"({len(skipped)} of {len(files)} files unchanged) using the {backend} embedding backend.",
+            "files": files,
+            "added": progress["chunks_embedded"],
+            "removed": len(to_delete),
+            "skipped_files": skipped,
+            "progress": progress,
+        }
 
 ingestion_service = IngestionService()
@@ -0,0 +1,160 @@
+import json
+import re
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from app.services.language import HINDI, GUJARATI
+
+# Devanagari / Gujarati vowel signs are not \w, so the Indic blocks are kept explicitly
+_PUNCT_RE = re.compile(r"[^\w\s\u0900-\u097F\u0A80-\u0AFF]")
+_REPEAT_RE = re.compile(r"(\w)\1{2,}")
+_SPACE_RE = re.compile(r"\s+")
+_PLACEHOLDER_RE = re.compile(r"\{(section|fact):([^}]+)\}")
+_FACT_RE = re.compile(r"^\s*-\s*\*\*(.+?)\*\*\s*:\s*(.+)$")
+
+LANG_CODES = {HINDI: "hi", GUJARATI: "gu"}
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, drop punctuation, squeeze letters repeated 3+ times ("hiiii" -> "hi") and spaces."""
+    text = _PUNCT_RE.sub(" ", text.lower())
+    text = _REPEAT_RE.sub(r"\1", text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+class AhoCorasick:
+    """Character-level Aho-Corasick automaton: finds every pattern occurring in a text in one pass."""
+
+    def __init__(self, patterns: List[Tuple[str, object]]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[List[Tuple[int, object]]] = [[]]  # (priority, payload)
+        for priority, (pattern, payload) in enumerate(patterns):
+            node = 0
+            for ch in pattern:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                node = nxt
+            self.out[node].append((priority, payload))
+
+        # Breadth-first pass to wire the failure links
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def best(self, text: str) -> Optional[object]:
+        """Payload of the highest-priority (earliest registered) pattern found in text."""
+        node, found = 0, None
+        for ch in text:
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            for priority, payload in self.out[node]:
+                if found is None or priority < found[0]:
+                    found = (priority, payload)
+        return found[1] if found else None
+
+
+def kb_facts(sections: List[Tuple[str, str]]) -> Dict[str, Tuple[str, str]]:
+    """Bullet facts ("- **Toll-Free**: 1800 ...") by lowercased label -> (value, section title)."""
+    facts = {}
+    for title, body in sections:
+        for line in body.splitlines():
+            m = _FACT_RE.match(line)
+            if m:
+                facts.setdefault(m.group(1).strip().lower(), (m.group(2).strip(), title))
+    return facts
+
+
+class IntentMatcher:
+    """
+    Startup-built fast path for greetings, thanks and top FAQ questions.
+
+    Intents come from a JSON data file (data/intents.json). Each intent is either
+    - "exact":    the whole normalized query (minus ignorable filler words for FAQs) is a pattern
+    - "contains": a pattern occurs anywhere in a short query (thanks / dhanyawad ...)
+    Exact patterns live in one dict, contains patterns in one Aho-Corasick automaton.
+    FAQ answers may embed {section:TITLE} / {fact:Label} placeholders that are filled
+    from the knowledge base when the matcher is built, so they never need an LLM call.
+    """
+
+    def __init__(self, config: dict, kb_sections: List[Tuple[str, str]]):
+        self.ignore_words = frozenset(normalize_text(w) for w in config.get("ignore_words", []))
+        facts = kb_facts(kb_sections)
+        self.exact: Dict[str, dict] = {}
+        self.faq_exact: Dict[str, dict] = {}
+        contains = []
+        for intent in config.get("intents", []):
+            intent = dict(intent)
+            used = []
+            intent["responses"] = {lang: self._render(text, kb_sections, facts, used)
+                                   for lang, text in intent["responses"].items()}
+            intent["sources"] = list(dict.fromkeys(used))
+            for pattern in intent["patterns"]:
+                norm = normalize_text(pattern)
+                if intent.get("match") == "contains":
+                    contains.append((norm, intent))
+                elif intent.get("faq"):
+                    self.faq_exact.setdefault(self._strip_filler(norm), intent)
+                else:
+                    self.exact.setdefault(norm, intent)
+        self.contains = AhoCorasick(contains)
+        self.size = len(self.exact) + len(self.faq_exact) + len(contains)
+
+    @classmethod
+    def from_file(cls, path: str, kb_sections: List[Tuple[str, str]]) -> "IntentMatcher":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f), kb_sections)
+
+    def _strip_filler(self, norm: str) -> str:
+        return " ".join(w for w in norm.split() if w not in self.ignore_words)
+
+    @staticmethod
+    def _render(text: str, sections: List[Tuple[str, str]], facts: Dict[str, Tuple[str, str]], used: List[str]) -> str:
+        def fill(m):
+            kind, key = m.group(1), m.group(2).strip()
+            if kind == "fact":
+                value, title = facts.get(key.lower(), ("", None))
+                if title:
+                    used.append(title)
+                return value
+            for title, body in sections:
+                if key.lower() in title.lower():
+                    used.append(title)
+                    return "\n".join(l for l in body.splitlines() if not l.startswith("#")).strip()
+            return ""
+        return _PLACEHOLDER_RE.sub(fill, text)
+
+    def match(self, query: str, target_lang: str) -> Optional[Tuple[str, str, List[str]]]:
+        """Returns (response, language code, sources) if the query is a known intent, else None."""
+        norm = normalize_text(query)
+        if not norm:
+            return None
+        intent = self.exact.get(norm)
+        if intent is None:
+            intent = self.faq_exact.get(self._strip_filler(norm))
+        if intent is None:
+            candidate = self.contains.best(norm)
+            if candidate is not None and len(norm) < candidate.get("max_length", 20):
+                intent = candidate
+        if intent is None:
+            return None
+
+        responses = intent["responses"]
+        # Intents written for one language answer in it; FAQs follow the detected language
+        lang = intent.get("language") or LANG_CODES.get(target_lang, "en")
+        if lang not in responses:
+            lang = "en"
+        return responses[lang], lang, intent["sources"]
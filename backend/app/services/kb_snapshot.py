@@ -0,0 +1,220 @@
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.retrieval import BM25Index, split_sections, tokenize
+
+MAGIC = b"KPGUKB1\n"
+POINTER_FILE = "CURRENT"
+KEEP_SNAPSHOTS = 3
+
+
+def dataset_path() -> str:
+    """Location of the master dataset (backend/data, or ./data when run from elsewhere)."""
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "kpgu_master_dataset.txt")
+    return path if os.path.exists(path) else "data/kpgu_master_dataset.txt"
+
+
+def snapshot_version(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+
+def snapshot_path(directory: str, version: str) -> str:
+    return os.path.join(directory, f"kb-{version}.snap")
+
+
+def write_snapshot(text: str, directory: str) -> str:
+    """
+    Serialize the dataset, its sections and a prebuilt BM25 index into one
+    content-addressed file (kb-<version>.snap) that workers memory-map.
+
+    Layout: MAGIC | u64 header length | JSON header | UTF-8 blob | int32 doc ids | float32 tfs
+    The blob holds the raw dataset followed by every section title and body; the
+    two arrays are the postings lists of all terms back to back (vocab maps a term
+    to its [start, count] slice).
+    """
+    version = snapshot_version(text)
+    path = snapshot_path(directory, version)
+    if os.path.exists(path):
+        return version
+    os.makedirs(directory, exist_ok=True)
+
+    sections = split_sections(text)
+    blob = bytearray(text.encode("utf-8"))
+    raw = [0, len(blob)]
+    spans, doc_len = [], []
+    postings: Dict[str, List[Tuple[int, int]]] = {}
+    for doc_id, (title, body) in enumerate(sections):
+        t, b = title.encode("utf-8"), body.encode("utf-8")
+        spans.append([len(blob), len(t), len(blob) + len(t), len(b)])
+        blob += t + b
+        terms = tokenize(f"{title}\n{body}")
+        doc_len.append(len(terms))
+        for term, tf in Counter(terms).items():
+            postings.setdefault(term, []).append((doc_id, tf))
+
+    vocab, doc_ids, tfs = {}, [], []
+    for term, plist in postings.items():
+        vocab[term] = [len(doc_ids), len(plist)]
+        doc_ids.extend(d for d, _ in plist)
+        tfs.extend(tf for _, tf in plist)
+
+    header = json.dumps({
+        "version": version,
+        "raw": raw,
+        "sections": spans,
+        "doc_len": doc_len,
+        "vocab": vocab,
+        "blob_len": len(blob),
+        "n_postings": len(doc_ids),
+    }, ensure_ascii=False).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + 8 + len(header)) % 8)  # keep the arrays 8-byte aligned
+    blob += b"\0" * (-len(blob) % 8)
+
+    tmp = path + f".{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        f.write(blob)
+        f.write(np.asarray(doc_ids, dtype="<i4").tobytes())
+        f.write(np.asarray(tfs, dtype="<f4").tobytes())
+    os.replace(tmp, path)
+    return version
+
+
+def read_pointer(directory: str) -> Optional[str]:
+    try:
+        with open(os.path.join(directory, POINTER_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def publish(text: str, directory: str) -> str:
+    """
+    Write the snapshot and atomically point CURRENT at it. Replacing CURRENT is
+    the reload signal: every worker polls it and switches on its next request.
+    """
+    version = write_snapshot(text, directory)
+    if read_pointer(directory) != version:
+        tmp = os.path.join(directory, f"{POINTER_FILE}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(tmp, os.path.join(directory, POINTER_FILE))
+    return version
+
+
+def prune(directory: str, keep: int = KEEP_SNAPSHOTS):
+    """Delete old snapshots (a worker that still maps one keeps its pages; on Windows the delete is retried later)."""
+    current = read_pointer(directory)
+    snaps = sorted(
+        (os.path.join(directory, n) for n in os.listdir(directory) if n.startswith("kb-") and n.endswith(".snap")),
+        key=os.path.getmtime, reverse=True,
+    )
+    for path in snaps[keep:]:
+        if current and path == snapshot_path(directory, current):
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class MappedSections(Sequence):
+    """(title, body) pairs decoded on access from the mapped blob."""
+
+    def __init__(self, buf, base: int, spans: List[List[int]]):
+        self._buf = buf
+        self._base = base
+        self._spans = spans
+
+    def __len__(self):
+        return len(self._spans)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        t_off, t_len, b_off, b_len = self._spans[i]
+        start = self._base
+        return (
+            bytes(self._buf[start + t_off:start + t_off + t_len]).decode("utf-8"),
+            bytes(self._buf[start + b_off:start + b_off + b_len]).decode("utf-8"),
+        )
+
+
+class MappedBM25Index(BM25Index):
+    """
+    BM25Index over a memory-mapped snapshot: postings are numpy views into the
+    mapping, so N workers share one copy of them through the page cache.
+    """
+
+    def __init__(self, sections: MappedSections, vocab: Dict[str, List[int]], doc_len: List[int],
+                 doc_ids: np.ndarray, tfs: np.ndarray, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.sections = sections
+        self.vocab = vocab
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        n = len(doc_len)
+        self.doc_len = np.asarray(doc_len, dtype=np.float32)
+        self.avg_len = float(self.doc_len.mean()) if n else 0.0
+        self.norm = (self.k1 * (1 - self.b + self.b * self.doc_len / (self.avg_len or 1))).astype(np.float32)
+        self.idf = {term: math.log(1 + (n - c + 0.5) / (c + 0.5)) for term, (_, c) in vocab.items()}
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[int, float]]:
+        scores = np.zeros(len(self.doc_len), dtype=np.float32)
+        for term in set(tokenize(query)):
+            span = self.vocab.get(term)
+            if span is None:
+                continue
+            start, count = span
+            ids, tf = self.doc_ids[start:start + count], self.tfs[start:start + count]
+            scores[ids] += self.idf[term] * tf * (self.k1 + 1) / (tf + self.norm[ids])
+        hits = np.flatnonzero(scores > 0)
+        top = hits[np.argsort(-scores[hits], kind="stable")][:k]
+        return [(int(i), float(scores[i])) for i in top]
+
+
+class MappedKB:
+    """One opened snapshot: version, raw dataset text, sections and the BM25 index."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not a KB snapshot: {path}")
+        (header_len,) = struct.unpack_from("<Q", self._mm, len(MAGIC))
+        base = len(MAGIC) + 8
+        header = json.loads(bytes(self._mm[base:base + header_len]).decode("utf-8"))
+        blob_start = base + header_len
+        arrays = blob_start + header["blob_len"] + (-header["blob_len"] % 8)
+        n = header["n_postings"]
+
+        self.version = header["version"]
+        raw_off, raw_len = header["raw"]
+        self.text = bytes(self._mm[blob_start + raw_off:blob_start + raw_off + raw_len]).decode("utf-8")
+        self.sections = MappedSections(self._mm, blob_start, header["sections"])
+        doc_ids = np.frombuffer(self._mm, dtype="<i4", count=n, offset=arrays)
+        tfs = np.frombuffer(self._mm, dtype="<f4", count=n, offset=arrays + 4 * n)
+        self.index = MappedBM25Index(self.sections, header["vocab"], header["doc_len"], doc_ids, tfs)
+
+    @classmethod
+    def open_current(cls, directory: str, source_path: Optional[str] = None) -> "MappedKB":
+        """Open the snapshot CURRENT points at, publishing one from source_path if there is none yet."""
+        version = read_pointer(directory)
+        if version is None or not os.path.exists(snapshot_path(directory, version)):
+            if source_path is None:
+                raise FileNotFoundError(f"No KB snapshot in {directory}")
+            with open(source_path, "r", encoding="utf-8") as f:
+                version = publish(f.read(), directory)
+        return cls(snapshot_path(directory, version))
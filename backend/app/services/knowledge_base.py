@@ -0,0 +1,294 @@
+import asyncio
+import hashlib
+import os
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.services.facts import FactStore
+from app.services.intents import IntentMatcher
+from app.services.kb_snapshot import (MappedKB, dataset_path, prune, publish, read_pointer, snapshot_path,
+                                      snapshot_version, write_snapshot)
+from app.services.retrieval import BM25Index, split_sections
+from app.services.telemetry import log
+
+FULL_KB_SOURCE = "KPGU Knowledge Base"
+
+
+def _data_path(path: str) -> str:
+    if not os.path.isabs(path) and not os.path.exists(path):
+        path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), path)
+    return path
+
+
+def intents_path() -> str:
+    return _data_path(settings.INTENTS_FILE)
+
+
+def fact_paths() -> List[str]:
+    """The fact store vocabulary file followed by the extra fact sheets."""
+    if not settings.FACTS_FILE:
+        return []
+    return [_data_path(settings.FACTS_FILE)] + [_data_path(p) for p in settings.FACT_SHEETS]
+
+
+def load_intents(sections) -> Optional[IntentMatcher]:
+    """Build the fast-path intent matcher; FAQ answers are rendered from the given KB sections."""
+    try:
+        return IntentMatcher.from_file(intents_path(), sections)
+    except Exception as e:
+        log(f"Intents Load Error: {e}")
+        return None
+
+
+def load_facts(sections) -> Optional[FactStore]:
+    """Compile the direct-lookup fact store from the KB sections and the fact sheets."""
+    paths = fact_paths()
+    if not paths or not sections:
+        return None
+    try:
+        return FactStore.from_files(paths[0], sections, paths[1:], settings.FACT_MAX_OTHER_WORDS)
+    except Exception as e:
+        log(f"Facts Load Error: {e}")
+        return None
+
+
+class KnowledgeBase:
+    """
+    One immutable, versioned view of the dataset: raw text, BM25 index, intents, the
+    compiled fact store and a hash per section. Requests grab the current instance once and use only it, so a
+    reload that swaps in a new one never mixes two versions inside a request.
+    """
+
+    def __init__(self, version: str, text: str, retriever, generation: int):
+        self.version = version
+        self.generation = generation
+        self.text = text
+        self.retriever = retriever
+        self.intents = load_intents(retriever.sections if retriever else [])
+        self.facts = load_facts(retriever.sections if retriever else [])
+        self.loaded_at = time.time()
+        self.section_hashes: Dict[str, str] = {
+            title: hashlib.sha1(body.encode("utf-8")).hexdigest()
+            for title, body in (retriever.sections if retriever else [])
+        }
+
+    @classmethod
+    def from_file(cls, path: str, generation: int = 1, snapshot_dir: str = "") -> "KnowledgeBase":
+        """
+        Parse the dataset. With snapshot_dir the parsed sections and BM25 index are
+        written there once per dataset version and memory-mapped, so the next start
+        of an unchanged dataset skips parsing and indexing.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        if snapshot_dir:
+            try:
+                version = snapshot_version(text)
+                if not os.path.exists(snapshot_path(snapshot_dir, version)):
+                    write_snapshot(text, snapshot_dir)
+                    prune(snapshot_dir)
+                kb = MappedKB(snapshot_path(snapshot_dir, version))
+                return cls(kb.version, kb.text, kb.index, generation)
+            except (OSError, ValueError) as e:
+                log(f"KB snapshot unavailable, parsing the dataset: {e}")
+        return cls(snapshot_version(text), text, BM25Index(split_sections(text)), generation)
+
+    @classmethod
+    def from_snapshot(cls, directory: str, source_path: Optional[str] = None, generation: int = 1) -> "KnowledgeBase":
+        kb = MappedKB.open_current(directory, source_path)
+        return cls(kb.version, kb.text, kb.index, generation)
+
+    @classmethod
+    def empty(cls) -> "KnowledgeBase":
+        return cls("none", "No knowledge base loaded.", None, 0)
+
+    def retrieve(self, query: str, k: int) -> Tuple[List[Tuple[int, str]], List[str]]:
+        """
+        Returns (sections, sources): the top-k KB sections relevant to the query as
+        (document position, text) pairs, best first, and their titles in document order.
+        """
+        if self.retriever:
+            hits = self.retriever.ranked_sections(query, k=k)
+            if hits:
+                return [(i, text) for i, _, text in hits], [title for _, title, _ in sorted(hits)]
+        # Nothing matched lexically (e.g. very vague query) -> fall back to the full dataset
+        return [(0, self.text)], [FULL_KB_SOURCE]
+
+    def changed_sections(self, old: "KnowledgeBase") -> Set[str]:
+        """Titles that were added, removed or edited between old and self."""
+        titles = set(old.section_hashes) | set(self.section_hashes)
+        return {t for t in titles if old.section_hashes.get(t) != self.section_hashes.get(t)}
+
+    def stale_predicate(self, old: "KnowledgeBase", k: int) -> Callable[[Tuple[str, Tuple[str, ...]], object], bool]:
+        """
+        A cached answer depends on the sections it was generated from. It is stale when
+        one of them changed, or when retrieval over the new index would now pick a
+        different set of sections for the same (normalized) question.
+        """
+        changed = self.changed_sections(old)
+
+        def is_stale(key, value) -> bool:
+            sources = list(getattr(value, "sources", []) or [])
+            if not changed:
+                return False
+            if not sources or FULL_KB_SOURCE in sources or changed.intersection(sources):
+                return True
+            _, tokens = key
+            return self.retrieve(" ".join(tokens), k)[1] != sources
+
+        return is_stale
+
+    def status(self) -> dict:
+        return {
+            "version": self.version,
+            "generation": self.generation,
+            "sections": len(self.retriever.sections) if self.retriever else 0,
+            "intents": self.intents.size if self.intents else 0,
+            "facts": self.facts.size if self.facts else 0,
+            "loaded_at": self.loaded_at,
+        }
+
+
+class KnowledgeBaseManager:
+    """
+    Owns the current KnowledgeBase and replaces it without a restart.
+
+    A background task polls the dataset, intents and fact files (or, in multi-worker
+    mode, the CURRENT snapshot pointer) every KB_WATCH_SECONDS; POST /admin/kb/reload
+    triggers the same path. The new version is parsed and indexed in a worker
+    thread, dependent cache entries are worked out there too, and then the
+    reference is swapped in one assignment on the event loop.
+    """
+
+    def __init__(self, cache_getter: Callable[[], object]):
+        self.path = dataset_path()
+        self.shared_dir = settings.SHARED_STATE_DIR
+        self._cache = cache_getter
+        self.current = self._load_initial()
+        self._signature = self._watch_signature()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.reloads = 0
+        self.last_reload: Optional[dict] = None
+
+    # --- loading ---
+    def _load_initial(self) -> KnowledgeBase:
+        try:
+            if self.shared_dir:
+                # Multi-worker mode: map the published snapshot instead of parsing a private copy
+                return KnowledgeBase.from_snapshot(self.shared_dir, self.path)
+            return KnowledgeBase.from_file(self.path, snapshot_dir=settings.KB_SNAPSHOT_DIR)
+        except Exception as e:
+            log(f"KB Load Error: {e}")
+            return KnowledgeBase.empty()
+
+    def _build(self, generation: int, publish_first: bool = False) -> KnowledgeBase:
+        if self.shared_dir:
+            if publish_first:
+                # Admin reload in a worker: publish the dataset so the other workers follow
+                with open(self.path, "r", encoding="utf-8") as f:
+                    publish(f.read(), self.shared_dir)
+            return KnowledgeBase.from_snapshot(self.shared_dir, generation=generation)
+        return KnowledgeBase.from_file(self.path, generation, settings.KB_SNAPSHOT_DIR)
+
+    def _watch_signature(self):
+        paths = [os.path.join(self.shared_dir, "CURRENT")] if self.shared_dir else [self.path]
+        sig = []
+        for path in paths + [intents_path()] + fact_paths():
+            try:
+                st = os.stat(path)
+                sig.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                sig.append(None)
+        return tuple(sig)
+
+    # --- reload ---
+    async def reload(self, reason: str = "manual", force: bool = False) -> dict:
+        async with self._lock:
+            started = time.perf_counter()
+            old = self.current
+            previous, self._signature = self._signature, await asyncio.to_thread(self._watch_signature)
+            # Intents / fact files are read by every process itself, not through the snapshot
+            config_changed = previous[1:] != self._signature[1:]
+            manual = reason == "admin"
+            if (not (force or config_changed or manual) and self.shared_dir
+                    and await asyncio.to_thread(read_pointer, self.shared_dir) == old.version):
+                return {"status": "unchanged", "version": old.version}
+            try:
+                new = await asyncio.to_thread(self._build, old.generation + 1, manual)
+            except Exception as e:
+                log(f"KB Reload Error: {e}")
+                return {"status": "error", "version": old.version, "error": str(e)}
+            if not (force or config_changed) and new.version == old.version:
+                return {"status": "unchanged", "version": old.version}
+
+            # Dependent cache entries are found off the loop against a snapshot of the cache
+            cache = self._cache()
+            is_stale = new.stale_predicate(old, settings.RETRIEVAL_TOP_K)
+            stale = []
+            seen = set()
+            if cache is not None:
+                items = cache.items()
+                seen = {key for key, _ in items}
+                stale = await asyncio.to_thread(lambda: [key for key, value in items if is_stale(key, value)])
+
+            self.current = new  # atomic swap: requests already running keep the old instance
+
+            invalidated = 0
+            if cache is not None:
+                # Entries answered while we were indexing were not in the snapshot (nothing
+                # from the old version is stored after the swap, so this list is final)
+                added = [(key, value) for key, value in cache.items() if key not in seen]
+                late = await asyncio.to_thread(lambda: [key for key, value in added if is_stale(key, value)])
+                invalidated = cache.invalidate(stale + late)
+                if hasattr(cache, "migrate_version"):
+                    invalidated += await asyncio.to_thread(cache.migrate_version, old.version, new.version, is_stale)
+
+            self.reloads += 1
+            self.last_reload = {
+                "status": "reloaded",
+                "reason": reason,
+                "from_version": old.version,
+                "version": new.version,
+                "generation": new.generation,
+                "changed_sections": sorted(new.changed_sections(old)),
+                "cache_invalidated": invalidated,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+            log(f"KB reloaded ({reason}): {old.version} -> {new.version} | "
+                  f"{len(self.last_reload['changed_sections'])} sections changed | {invalidated} cache entries invalidated")
+            return self.last_reload
+
+    async def _watch(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await asyncio.to_thread(self._watch_signature) != self._signature:
+                    await self.reload(reason="file change")
+            except Exception as e:
+                log(f"KB watcher error: {e}")
+
+    def start(self):
+        interval = settings.SHARED_POLL_SECONDS if self.shared_dir else settings.KB_WATCH_SECONDS
+        if interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._watch(interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> dict:
+        return {
+            **self.current.status(),
+            "path": self.path,
+            "shared_dir": self.shared_dir or None,
+            "watching": self._task is not None,
+            "reloads": self.reloads,
+            "last_reload": self.last_reload,
+        }
@@ -0,0 +1,88 @@
+import re
+from typing import Tuple
+
+HINDI = "Hindi (Devanagari Script)"
+GUJARATI = "Gujarati (Gujarati Script)"
+ENGLISH = "English"
+
+# One C-level scan finds every Indic character; everything else is skipped
+_INDIC_RE = re.compile("[\u0900-\u097F\u0A80-\u0AFF]")
+_PUNCT_RE = re.compile(r"[^\w\s]")
+
+# Romanized marker words. Weight 1.0 = unambiguous, 0.5 = common but also
+# seen in the other language / in English abbreviations, 2.0 = greeting words
+GUJARATI_WEIGHTS = {
+    **dict.fromkeys(["pachhi", "shun", "che", "chhe", "kyare", "ketla", "ketli", "kem", "kevu", "kevi",
+                     "tamaru", "tamne", "mari", "maru", "mane", "ena", "eni", "vishe", "samjay", "aapo",
+                     "joiye", "karvu", "thase", "chale", "shu", "kai", "hoy", "nathi"], 1.0),
+    **dict.fromkeys(["nu", "su", "ane", "mate", "ni", "kya"], 0.5),
+    **dict.fromkeys(["majama", "aabhar", "dhanyavad", "shubhechha"], 2.0),
+}
+HINDI_WEIGHTS = {
+    **dict.fromkeys(["kese", "kaise", "kaisa", "kya", "kitna", "kitni", "kitne", "kaun", "kab", "kahan",
+                     "bhai", "aap", "ap", "batao", "bataiye", "hain", "hai", "padhai", "vibhag", "karo",
+                     "milta", "milti", "mein", "nahi", "muje", "mujhe", "bareme", "baare", "sakte",
+                     "sakta", "chahiye", "hoga", "liye", "kripya"], 1.0),
+    **dict.fromkeys(["ki", "ka", "ke", "ho", "bata", "koi"], 0.5),
+    **dict.fromkeys(["namaste", "pranam", "dhanyawad", "shukriya"], 2.0),
+}
+# "kya" is Gujarati ("kya che") and Hindi ("kya hai"); both tables carry it so the
+# other words in the query decide.
+ENGLISH_WORDS = frozenset([
+    "the", "is", "are", "was", "what", "how", "for", "of", "in", "to", "and", "about", "tell", "me",
+    "can", "do", "does", "where", "when", "which", "who", "you", "i", "my", "please", "there", "any",
+    "with", "your", "an", "a", "get", "give", "much", "many",
+])
+
+
+def script_histogram(text: str) -> Tuple[int, int]:
+    """(Devanagari chars, Gujarati chars) in a single regex pass."""
+    indic = _INDIC_RE.findall(text)
+    deva = sum(1 for c in indic if c <= "\u097F")
+    return deva, len(indic) - deva
+
+
+def score_romanized(words) -> Tuple[float, float, int]:
+    """(gujarati score, hindi score, english function words) for a tokenized query."""
+    gu = hi = 0.0
+    en = 0
+    for w in words:
+        gu += GUJARATI_WEIGHTS.get(w, 0.0)
+        hi += HINDI_WEIGHTS.get(w, 0.0)
+        if w in ENGLISH_WORDS:
+            en += 1
+    return gu, hi, en
+
+
+def detect_language(query: str) -> str:
+    """
+    Target answer language for a query.
+    Native script wins (majority block); otherwise Romanized Gujarati/Hindi is
+    scored against English function words. Gujarati needs a score of 1, Hindi
+    a score of 2 (Hindi particles like "ki"/"ke" are easy false positives) -
+    unless the query has no English words at all, where half the words
+    being markers is enough ("fees kitni").
+    """
+    deva, guj = script_histogram(query)
+    if deva or guj:
+        return HINDI if deva >= guj else GUJARATI
+
+    words = _PUNCT_RE.sub("", query.lower()).split()
+    if not words:
+        return ENGLISH
+    gu, hi, en = score_romanized(words)
+    short_and_native = en == 0 and 2 * max(gu, hi) >= len(words)
+
+    if gu >= 1 and gu >= hi:
+        return GUJARATI
+    if hi >= 2 or (hi >= 1 and short_and_native):
+        return HINDI
+    if gu > 0 and short_and_native:
+        return GUJARATI
+    return ENGLISH
+
+
+def response_language(text: str) -> str:
+    """ISO tag for the script an answer was actually written in."""
+    deva, guj = script_histogram(text)
+    return "gu" if guj > 10 else "hi" if deva > 10 else "en"
@@ -0,0 +1,180 @@
+import math
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from app.services.language import HINDI, GUJARATI, ENGLISH
+from app.services.telemetry import log
+
+SCRIPT_RULES = {
+    HINDI: "- CRITICAL: You MUST use the native Devanagari script. NEVER use Romanized Hindi (e.g. write 'कैसे हो' NOT 'kese ho').",
+    GUJARATI: "- CRITICAL: You MUST use the native Gujarati script. NEVER use Romanized Gujarati.",
+    ENGLISH: "",
+}
+
+# {history} is either empty or a "CONVERSATION SO FAR" block ending in a blank line
+PROMPT_TEMPLATE = """You are the Official KPGU AI Assistant — a friendly, senior university counselor. ✨
+
+INTERACTION RULES:
+- If the user greets you or asks how you are, respond warmly with emojis. Example: "I'm doing great! 🎓 How can I help you today? 👋"
+- For factual questions, use ONLY the KPGU MASTER DATA below. Never guess fees.
+- If the answer is not in the data, say so and suggest calling 1800 843 9999.
+- Respond 100% in {{target_language}}.
+{script_rules}
+- Start your answer immediately. No robotic preamble.
+
+KPGU MASTER DATA:
+{{context}}
+
+{{history}}User: {{question}}
+
+Response (in {{target_language}}):"""
+
+HISTORY_HEADER = "CONVERSATION SO FAR:\n"
+
+if TYPE_CHECKING:
+    from langchain_core.prompts import ChatPromptTemplate
+
+
+def prompt_texts() -> Dict[str, Tuple[str, str]]:
+    """
+    The template text per answer language, and the same text with every variable
+    empty except the language, which is what the token budget counts as fixed overhead.
+    """
+    texts = {}
+    for lang, rules in SCRIPT_RULES.items():
+        template = PROMPT_TEMPLATE.format(script_rules=rules)
+        texts[lang] = (template, template.format(target_language=lang, context="", history="", question=""))
+    return texts
+
+
+def compile_prompts() -> Dict[str, "ChatPromptTemplate"]:
+    """
+    One ChatPromptTemplate per answer language. langchain is only imported here, so
+    it is loaded by the startup warmup (or the first LLM call), not at import time.
+    """
+    from langchain_core.prompts import ChatPromptTemplate
+    return {lang: ChatPromptTemplate.from_template(template) for lang, (template, _) in prompt_texts().items()}
+
+
+class TokenCounter:
+    """
+    Prompt token counts. "estimate" is a tokenizer-free approximation (~4 ASCII chars
+    per token, one token per non-ASCII char, which over-counts Devanagari/Gujarati a
+    little - the safe side for a budget). "tiktoken" uses cl100k_base; it needs the
+    encoding file to be cached or downloadable, so it falls back to the estimate.
+    """
+
+    def __init__(self, mode: str = "estimate"):
+        self.encoding = None
+        if mode == "tiktoken":
+            try:
+                import tiktoken
+                self.encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                log(f"tiktoken unavailable, estimating tokens instead: {e}")
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text))
+        non_ascii = len(text) - len(text.encode("ascii", "ignore"))
+        return math.ceil((len(text) - non_ascii) / 4) + non_ascii
+
+
+class TokenBudget:
+    """
+    Fits retrieved context and conversation history into a per-provider prompt budget.
+
+    Budgets are looked up by provider name prefix ("Groq", "Gemini" ...). The fixed part
+    (template + question) is always sent; history may use up to history_share of what is
+    left, newest turns first; context fills the rest with the best-ranked KB sections,
+    cutting the last one at a line boundary. Tokens sent are tallied per provider.
+    """
+
+    def __init__(self, counter: TokenCounter, budgets: Dict[str, int], default: int, history_share: float):
+        self.counter = counter
+        self.budgets = budgets
+        self.default = default
+        self.history_share = history_share
+        self.sent: Dict[str, dict] = {}
+
+    def limit(self, provider: str) -> int:
+        for prefix, budget in self.budgets.items():
+            if provider.startswith(prefix):
+                return budget
+        return self.default
+
+    def _trim_lines(self, text: str, budget: int) -> str:
+        kept, used = [], 0
+        for line in text.split("\n"):
+            cost = self.counter.count(line) + 1
+            if used + cost > budget:
+                break
+            kept.append(line)
+            used += cost
+        return "\n".join(kept).rstrip()
+
+    def fit(self, limit: int, fixed_tokens: int, sections: List[Tuple[int, str]],
+            history: Optional[List[dict]] = None) -> Tuple[str, str, dict]:
+        """
+        sections: (document position, text) pairs, best-ranked first.
+        Returns (context, history block, usage) with usage = token counts per part.
+        """
+        remaining = max(limit - fixed_tokens, 0)
+        trimmed = False
+
+        lines = []
+        history_budget = int(remaining * self.history_share)
+        used_history = self.counter.count(HISTORY_HEADER) + 1 if history else 0
+        for turn in reversed(history or []):
+            role = {"assistant": "Assistant", "summary": "Earlier"}.get(turn.get("role"), "User")
+            line = f"{role}: {turn.get('content', '')}"
+            cost = self.counter.count(line) + 1
+            if used_history + cost > history_budget:
+                trimmed = True
+                break
+            lines.append(line)
+            used_history += cost
+        history_block = HISTORY_HEADER + "\n".join(reversed(lines)) + "\n\n" if lines else ""
+        history_tokens = used_history if lines else 0
+        remaining -= history_tokens
+
+        picked, context_tokens = [], 0
+        for position, text in sections:
+            cost = self.counter.count(text) + 2
+            if context_tokens + cost > remaining:
+                trimmed = True
+                partial = self._trim_lines(text, remaining - context_tokens - 2)
+                if partial:
+                    picked.append((position, partial))
+                    context_tokens += self.counter.count(partial) + 2
+                break
+            picked.append((position, text))
+            context_tokens += cost
+        context = "\n\n".join(text for _, text in sorted(picked))
+
+        usage = {
+            "limit": limit,
+            "fixed": fixed_tokens,
+            "context": context_tokens,
+            "history": history_tokens,
+            "total": fixed_tokens + context_tokens + history_tokens,
+            "sections_sent": len(picked),
+            "sections_dropped": len(sections) - len(picked),
+            "history_turns": len(lines),
+            "trimmed": trimmed,
+        }
+        return context, history_block, usage
+
+    def record(self, provider: str, usage: dict):
+        stats = self.sent.setdefault(provider, {"requests": 0, "prompt_tokens": 0, "trimmed_requests": 0})
+        stats["requests"] += 1
+        stats["prompt_tokens"] += usage["total"]
+        if usage["trimmed"]:
+            stats["trimmed_requests"] += 1
+
+    def stats(self) -> dict:
+        return {
+            name: {**s, "limit": self.limit(name), "avg_prompt_tokens": round(s["prompt_tokens"] / s["requests"]) if s["requests"] else 0}
+            for name, s in self.sent.items()
+        }
@@ -0,0 +1,280 @@
+import re
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.rate_limiter import RateLimiter
+from app.services.telemetry import log
+
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+GROQ_MODEL = "llama-3.3-70b-versatile"
+GEMINI_MODEL = "gemini-2.0-flash"
+
+_RATE_LIMIT_RE = re.compile(r"\b429\b|RESOURCE_EXHAUSTED|rate limit", re.IGNORECASE)
+_SERVER_ERROR_RE = re.compile(r"\b5(00|02|03|04)\b|UNAVAILABLE|overloaded", re.IGNORECASE)
+
+
+class ProviderUnavailable(Exception):
+    """The provider went into cooldown, or its half-open probe was claimed, after the candidate list was built."""
+
+
+def classify_error(err: Exception) -> str:
+    """Map a provider exception to 'rate_limit', 'server', 'timeout' or 'other'."""
+    status = getattr(err, "status_code", None) or getattr(getattr(err, "response", None), "status_code", None)
+    text = str(err)
+    import httpx  # already loaded by the provider SDKs whenever there is an error to classify
+    if status == 429 or _RATE_LIMIT_RE.search(text):
+        return "rate_limit"
+    if (isinstance(status, int) and status >= 500) or _SERVER_ERROR_RE.search(text):
+        return "server"
+    if isinstance(err, (TimeoutError, httpx.TimeoutException)) or "timed out" in text.lower():
+        return "timeout"
+    return "other"
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies (seconds) for percentile estimates."""
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+class ProviderHealth:
+    """
+    Cooldown + circuit breaker for one provider.
+    - 429 / 5xx / timeouts put the provider in a short cooldown.
+    - N consecutive failures open the circuit for CIRCUIT_OPEN_SECONDS; after
+      that a single probe request is let through (half-open).
+    """
+
+    COOLDOWNS = {"rate_limit": 30.0, "server": 10.0, "timeout": 10.0, "other": 5.0}
+
+    def __init__(self, failure_threshold: int, open_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.consecutive_failures = 0
+        self.unavailable_until = 0.0
+        self.circuit_open = False
+        self.last_error: Optional[str] = None
+        self.successes = 0
+        self.failures = 0
+
+    def available(self, now: float) -> bool:
+        return now >= self.unavailable_until
+
+    def acquire(self, now: float) -> bool:
+        """Like available(), but an expired open circuit only lets one probe through at a time."""
+        if not self.available(now):
+            return False
+        if self.circuit_open:
+            self.unavailable_until = now + self.COOLDOWNS["timeout"]
+        return True
+
+    def record_success(self):
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.circuit_open = False
+        self.unavailable_until = 0.0
+
+    def record_failure(self, err: Exception, now: float):
+        kind = classify_error(err)
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = f"{kind}: {str(err)[:120]}"
+        if self.consecutive_failures >= self.failure_threshold:
+            self.circuit_open = True
+            self.unavailable_until = now + self.open_seconds
+        else:
+            self.unavailable_until = now + self.COOLDOWNS[kind]
+
+    def snapshot(self, now: float) -> dict:
+        state = "open" if self.circuit_open and not self.available(now) else \
+                "half-open" if self.circuit_open else \
+                "cooldown" if not self.available(now) else "closed"
+        return {
+            "state": state,
+            "retry_in": round(max(0.0, self.unavailable_until - now), 1),
+            "consecutive_failures": self.consecutive_failures,
+            "successes": self.successes,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+
+class ProviderRegistry:
+    """
+    Builds the LLM clients once and shares them across requests.
+    Groq goes through one pooled keep-alive httpx client; each Gemini client is
+    created once per key so its underlying SDK connection is reused as well.
+    """
+
+    def __init__(self, groq_key: str, google_keys: List[str]):
+        self.groq_key = groq_key
+        self.google_keys = google_keys
+        self._providers: Optional[List[Tuple[str, object]]] = None
+        self.health: Dict[str, ProviderHealth] = {}
+        self.latency: Dict[str, LatencyTracker] = {}
+        self.limiter = RateLimiter({}, settings.RATE_LIMIT_MAX_WAIT_SECONDS, settings.RATE_LIMIT_QUEUE_MAX)
+        self.http_client = None
+        self.http_async_client = None
+
+    def _build_http_clients(self):
+        # httpx and the provider SDKs are imported here, on first use or during the
+        # startup warmup, so importing the app stays cheap. One SSL context for both
+        # clients: loading the CA bundle is the slow part.
+        import httpx
+        limits = httpx.Limits(max_connections=settings.PROVIDER_MAX_CONNECTIONS,
+                              max_keepalive_connections=settings.PROVIDER_MAX_CONNECTIONS,
+                              keepalive_expiry=60.0)
+        timeout = httpx.Timeout(settings.PROVIDER_TIMEOUT_SECONDS, connect=5.0)
+        context = httpx.create_ssl_context()
+        self.http_client = httpx.Client(limits=limits, timeout=timeout, verify=context)
+        self.http_async_client = httpx.AsyncClient(limits=limits, timeout=timeout, verify=context)
+
+    def _build(self) -> List[Tuple[str, object]]:
+        providers = []
+        if self.groq_key and "gsk_" in self.groq_key:
+            self._build_http_clients()
+            try:
+                from langchain_openai import ChatOpenAI
+                llm = ChatOpenAI(model=GROQ_MODEL, api_key=self.groq_key, base_url=GROQ_BASE_URL, temperature=0.0,
+                                 max_retries=settings.PROVIDER_MAX_RETRIES,
+                                 http_client=self.http_client, http_async_client=self.http_async_client)
+                providers.append(("Groq", llm))
+            except Exception as e:
+                log(f"Groq client init failed: {e}")
+        for i, key in enumerate(self.google_keys):
+            try:
+                from langchain_google_genai import ChatGoogleGenerativeAI
+                llm = ChatGoogleGenerativeAI(model=GEMINI_MODEL, google_api_key=key, temperature=0.0,
+                                             max_retries=settings.PROVIDER_MAX_RETRIES,
+                                             timeout=settings.PROVIDER_TIMEOUT_SECONDS,
+                                             convert_system_message_to_human=True)
+                providers.append((f"Gemini-{i+1}", llm))
+            except Exception as e:
+                log(f"Gemini-{i+1} client init failed: {e}")
+        for name, _ in providers:
+            self.health[name] = ProviderHealth(settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_OPEN_SECONDS)
+            self.latency[name] = LatencyTracker()
+        self.limiter = RateLimiter({name: self._rate_limits(name) for name, _ in providers},
+                                   settings.RATE_LIMIT_MAX_WAIT_SECONDS, settings.RATE_LIMIT_QUEUE_MAX)
+        return providers
+
+    @staticmethod
+    def _rate_limits(name: str) -> Tuple[int, int]:
+        """(RPM, TPM) for one key: PROVIDER_RATE_LIMITS[name] over the provider default."""
+        rpm, tpm = (settings.GROQ_RPM, settings.GROQ_TPM) if name == "Groq" else (settings.GEMINI_RPM, settings.GEMINI_TPM)
+        override = settings.PROVIDER_RATE_LIMITS.get(name, {})
+        return override.get("rpm", rpm), override.get("tpm", tpm)
+
+    @property
+    def providers(self) -> List[Tuple[str, object]]:
+        if self._providers is None:
+            self._providers = self._build()
+        return self._providers
+
+    def available(self) -> List[Tuple[str, object]]:
+        """
+        Configured providers in priority order, minus those in cooldown or with an
+        open circuit. The Gemini keys are one pool: least-loaded key first. Nothing is
+        claimed here: a half-open provider's probe is only taken by acquire(), when a
+        call to it actually starts.
+        """
+        now = time.monotonic()
+        healthy = [(name, llm) for name, llm in self.providers if self.health[name].available(now)]
+        pool = {name: llm for name, llm in healthy if name.startswith("Gemini")}
+        ranked = iter(self.limiter.order(list(pool)))
+        result = []
+        for name, llm in healthy:
+            if name in pool:
+                # Each Gemini slot in the priority list takes the next least-loaded key
+                name = next(ranked)
+                llm = pool[name]
+            result.append((name, llm))
+        return result
+
+    def record_success(self, name: str, seconds: Optional[float] = None):
+        if name in self.health:
+            self.health[name].record_success()
+            if seconds is not None:
+                self.latency[name].add(seconds)
+
+    def record_failure(self, name: str, err: Exception):
+        if name in self.health:
+            self.health[name].record_failure(err, time.monotonic())
+            if classify_error(err) == "rate_limit":
+                self.limiter.penalize(name)
+
+    async def acquire(self, name: str, tokens: int):
+        """
+        Start a call: wait for rate-limit capacity on this key (RateLimitWait past the
+        max wait), then claim the attempt from the circuit breaker (ProviderUnavailable
+        if it cooled down meanwhile, or another request already holds the probe).
+        """
+        await self.limiter.acquire(name, tokens)
+        health = self.health.get(name)
+        if health is not None and not health.acquire(time.monotonic()):
+            self.limiter.release(name)
+            raise ProviderUnavailable(f"{name} is cooling down")
+
+    def release(self, name: str):
+        self.limiter.release(name)
+
+    def hedge_delay(self, name: str) -> float:
+        """
+        How long to wait on a provider before hedging with the next one: its p95
+        latency once enough samples exist, else HEDGE_DELAY_SECONDS.
+        """
+        tracker = self.latency.get(name)
+        p95 = tracker.percentile(95) if tracker and len(tracker.samples) >= settings.HEDGE_MIN_SAMPLES else None
+        if p95 is None:
+            return settings.HEDGE_DELAY_SECONDS
+        return min(max(p95, settings.HEDGE_MIN_DELAY_SECONDS), settings.HEDGE_DELAY_SECONDS)
+
+    def status(self) -> dict:
+        now = time.monotonic()
+        result = {}
+        for name, _ in self.providers:
+            p50, p95 = self.latency[name].percentile(50), self.latency[name].percentile(95)
+            result[name] = {
+                **self.health[name].snapshot(now),
+                "p50_ms": round(p50 * 1000) if p50 is not None else None,
+                "p95_ms": round(p95 * 1000) if p95 is not None else None,
+                "hedge_delay_ms": round(self.hedge_delay(name) * 1000),
+                "rate": self.limiter.snapshot(name),
+            }
+        return result
+
+    async def preconnect(self, timeout: float) -> Dict[str, str]:
+        """
+        Open the pooled keep-alive connection (DNS + TCP + TLS) before the first user
+        request needs it. Only Groq goes through our httpx pool; the Gemini clients are
+        just built. Failures here are reported, never counted against provider health.
+        """
+        result = {}
+        for name, _ in self.providers:
+            if name != "Groq":
+                result[name] = "built"
+                continue
+            try:
+                response = await self.http_async_client.get(
+                    f"{GROQ_BASE_URL}/models", headers={"Authorization": f"Bearer {self.groq_key}"}, timeout=timeout)
+                result[name] = f"connected ({response.status_code})"
+            except Exception as e:
+                result[name] = f"failed: {classify_error(e)}"
+        return result
+
+    async def aclose(self):
+        if self.http_async_client is not None:
+            await self.http_async_client.aclose()
+            self.http_client.close()
@@ -1,147 +1,243 @@
+import asyncio
 import os
+import time
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, NamedTuple, Optional, Tuple, Union
 from app.schemas.chat import ChatRequest, ChatResponse
 from app.core.config import settings
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+from app.services.admission import AdmissionController, AdmissionGate, AdmissionRejected, SlidingWindowLimiter
+from app.services.response_cache import ResponseCache, SharedResponseCache
+from app.services.knowledge_base import KnowledgeBaseManager
+from app.services.providers import ProviderRegistry, ProviderUnavailable, classify_error
+from app.services.rate_limiter import RateLimitWait
+from app.services.language import detect_language, response_language
+from app.services.prompts import TokenBudget, TokenCounter, compile_prompts, prompt_texts
+from app.services.session_memory import SessionStore, is_followup
+from app.services.single_flight import NORMALIZATIONS, SingleFlight, coalesce_key
+from app.services.telemetry import log, metrics, set_outcome, span
+
+if TYPE_CHECKING:
+    from langchain_core.prompts import ChatPromptTemplate
+
+BUSY_MESSAGE = "⚠️ All AI providers are busy. Please wait 30 seconds and try again."
+
+
+class PreparedQuery(NamedTuple):
+    query: str
+    lookup: str                      # query used for retrieval (follow-ups include the previous question)
+    target_lang: str
+    prompt: "ChatPromptTemplate"
+    providers: List[Tuple[str, object]]
+    sections: List[Tuple[int, str]]  # (document position, text), best-ranked first
+    sources: List[str]
+    history: List[dict]
+    fixed_tokens: int                # template + question, always sent
+    kb_version: str                  # snapshot the context came from
+    followup: bool                   # answer depends on the conversation: not cached, not coalesced
 
 
 class RAGService:
     def __init__(self):
         self.google_keys = [k.strip() for k in settings.GOOGLE_API_KEY.split(",")] if settings.GOOGLE_API_KEY else []
         self.groq_key = settings.GROQ_API_KEY or ""
-        self.context_text = self._load_knowledge_base()
-        print(f"KPGU RAG Service Ready | Groq: {'YES' if 'gsk_' in self.groq_key else 'NO'} | Gemini Keys: {len(self.google_keys)}")
-
-    def _load_knowledge_base(self):
-        """Load the full KPGU master dataset once at startup."""
-        data_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "kpgu_master_dataset.txt")
-        if not os.path.exists(data_path):
-            data_path = "data/kpgu_master_dataset.txt"
-        try:
-            with open(data_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except Exception as e:
-            print(f"KB Load Error: {e}")
-            return "No knowledge base loaded."
+        self.registry = ProviderRegistry(self.groq_key, self.google_keys)
+        self.cache = None
+        # Versioned knowledge base (dataset text, BM25 index, intents), hot-reloadable
+        self.knowledge = KnowledgeBaseManager(lambda: self.cache)
+        # Three prompt variants (one per answer language), compiled on first use / warmup
+        self._prompts: Optional[Dict[str, "ChatPromptTemplate"]] = None
+        counter = TokenCounter(settings.TOKEN_COUNTER)
+        self.prompt_overhead = {lang: counter.count(bare) for lang, (_, bare) in prompt_texts().items()}
+        self.budget = TokenBudget(counter, settings.PROMPT_TOKEN_BUDGETS,
+                                  settings.PROMPT_TOKEN_BUDGET_DEFAULT, settings.PROMPT_HISTORY_SHARE)
+        self.sessions = SessionStore(
+            window=settings.SESSION_WINDOW_TURNS,
+            summary_chars=settings.SESSION_SUMMARY_MAX_CHARS,
+            max_sessions=settings.SESSION_MAX_SESSIONS,
+            max_chars=settings.SESSION_MAX_CHARS,
+            ttl_seconds=settings.SESSION_TTL_SECONDS,
+            spill_path=settings.SESSION_SPILL_PATH,
+        )
+        self.cache = self._build_cache() if settings.CACHE_ENABLED else None
+        # Identical questions that are already waiting on a provider share that call
+        self.inflight = SingleFlight() if settings.COALESCE_ENABLED else None
+        self.coalesce_mode = settings.COALESCE_NORMALIZATION
+        # Load shedding for questions that need a provider (429 / 503 instead of a pile-up)
+        self.admission = AdmissionController(
+            AdmissionGate(settings.ADMISSION_MAX_CONCURRENT, settings.ADMISSION_QUEUE_MAX,
+                          settings.ADMISSION_MAX_WAIT_SECONDS, settings.ADMISSION_MAX_PER_CLIENT),
+            SlidingWindowLimiter(settings.CLIENT_RATE_LIMIT_PER_IP, settings.CLIENT_RATE_WINDOW_SECONDS),
+            SlidingWindowLimiter(settings.CLIENT_RATE_LIMIT_PER_SESSION, settings.CLIENT_RATE_WINDOW_SECONDS),
+        ) if settings.ADMISSION_ENABLED else None
+        if self.coalesce_mode not in NORMALIZATIONS:
+            log(f"Unknown COALESCE_NORMALIZATION '{self.coalesce_mode}', using 'tokens'")
+            self.coalesce_mode = "tokens"
+        kb = self.knowledge.current.status()
+        log(f"KPGU RAG Service Ready | Groq: {'YES' if 'gsk_' in self.groq_key else 'NO'} | Gemini Keys: {len(self.google_keys)} | KB Sections: {kb['sections']} | Intents: {kb['intents']} | Facts: {kb['facts']} | KB Version: {kb['version']}")
+
+    @property
+    def prompts(self) -> Dict[str, "ChatPromptTemplate"]:
+        if self._prompts is None:
+            self._prompts = compile_prompts()
+        return self._prompts
+
+    @staticmethod
+    def _chain(prompt, llm):
+        from langchain_core.output_parsers import StrOutputParser
+        return prompt | llm | StrOutputParser()
+
+    def _build_cache(self):
+        if settings.SHARED_STATE_DIR:
+            # Shared across workers; rows are tagged with the KB version they were answered from
+            return SharedResponseCache(
+                db_path=os.path.join(settings.SHARED_STATE_DIR, "cache.db"),
+                dumps=lambda response: response.model_dump_json(),
+                loads=ChatResponse.model_validate_json,
+                version=self.knowledge.current.version,
+                max_entries=settings.CACHE_MAX_ENTRIES,
+                ttl_seconds=settings.CACHE_TTL_SECONDS,
+                fuzzy_threshold=settings.CACHE_FUZZY_THRESHOLD,
+            )
+        return ResponseCache(
+            max_entries=settings.CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.CACHE_TTL_SECONDS,
+            fuzzy_threshold=settings.CACHE_FUZZY_THRESHOLD,
+        )
 
     def _get_providers(self):
-        """Returns list of (name, llm) tuples in priority order: Groq first, then Gemini keys."""
-        providers = []
-        if self.groq_key and "gsk_" in self.groq_key:
-            try:
-                from langchain_openai import ChatOpenAI
-                llm = ChatOpenAI(model="llama-3.3-70b-versatile", api_key=self.groq_key,
-                                 base_url="https://api.groq.com/openai/v1", temperature=0.0)
-                providers.append(("Groq", llm))
-            except Exception:
-                pass
-        for i, key in enumerate(self.google_keys):
-            try:
-                from langchain_google_genai import ChatGoogleGenerativeAI
-                llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", google_api_key=key,
-                                             temperature=0.0, convert_system_message_to_human=True)
-                providers.append((f"Gemini-{i+1}", llm))
-            except Exception:
-                pass
-        return providers
+        """Returns list of (name, llm) tuples in priority order (Groq first, then Gemini keys least-loaded first), skipping unhealthy ones."""
+        return self.registry.available()
+
+    async def _admit(self, name: str, plan: PreparedQuery) -> dict:
+        """
+        Prompt variables for one provider, trimmed to that provider's token budget.
+        Waits in the key's admission queue until its RPM/TPM buckets can take the
+        prompt plus the reserved answer tokens (RateLimitWait / ProviderUnavailable = try
+        the next provider).
+        """
+        with span("prompt", provider=name) as s:
+            context, history, usage = self.budget.fit(self.budget.limit(name), plan.fixed_tokens, plan.sections, plan.history)
+            s["tokens"] = usage["total"]
+        try:
+            with span("admission", provider=name):
+                await self.registry.acquire(name, usage["total"] + settings.RATE_LIMIT_OUTPUT_TOKENS)
+        except (RateLimitWait, ProviderUnavailable) as e:
+            metrics.provider_errors.inc(provider=name, kind="rate_wait" if isinstance(e, RateLimitWait) else "unavailable")
+            log(f"  -> SKIP {name}: {e}")
+            raise
+        self.budget.record(name, usage)
+        metrics.prompt_tokens.observe(usage["total"], provider=name)
+        log(f"  -> PROMPT {name}: {usage['total']}/{usage['limit']} tokens "
+              f"(context {usage['context']}, history {usage['history']}{', trimmed' if usage['trimmed'] else ''})")
+        return {"context": context, "history": history, "question": plan.query, "target_language": plan.target_lang}
+
+    def _provider_failed(self, name: str, err: Exception, seconds: float):
+        self.registry.record_failure(name, err)
+        metrics.provider_errors.inc(provider=name, kind=classify_error(err))
+        metrics.provider_seconds.observe(seconds, provider=name, result="error")
+        log(f"  -> FAIL {name}: {str(err)[:80]}")
+
+    def _provider_succeeded(self, name: str, result: str, seconds: float):
+        self.registry.record_success(name, seconds)
+        metrics.provider_seconds.observe(seconds, provider=name, result="ok")
+        metrics.completion_tokens.observe(self.budget.counter.count(result), provider=name)
+        log(f"  -> SUCCESS via {name}")
 
     def _detect_language(self, query):
-        """Detect language from query text using word scoring."""
-        import re
-        q = query.lower().strip()
-        # Remove punctuation for clean word matching
-        q_clean = re.sub(r'[^\w\s]', '', q)
-        
-        # Native script detection (highest priority)
-        if any(0x0900 <= ord(c) <= 0x097F for c in query):
-            return "Hindi (Devanagari Script)"
-        if any(0x0A80 <= ord(c) <= 0x0AFF for c in query):
-            return "Gujarati (Gujarati Script)"
-
-        words = q_clean.split()
-
-        # Gujarati-only words (checked first — higher priority)
-        guj_strong = ["pachhi","shun","che","kyare","ketla","nu","kem","kevu","tamaru","mari","ane","mane","ena","vishe","samjay","su","aapo","mate","joiye","karvu","thase"]
-        guj_score = sum(1 for w in words if w in guj_strong)
-        if guj_score >= 1:
-            return "Gujarati (Gujarati Script)"
-
-        # Hindi-only words (must NOT be common English)
-        hin_strong = ["kese","kaise","kya","kitna","kitni","kaun","kab","kahan",
-                      "bhai","aap","batao","hain","hai","ho","padhai","vibhag",
-                      "karo","milta","milti","mein","ki","ka","ke","nahi"]
-        hin_score = sum(1 for w in words if w in hin_strong)
-        # Need 2+ Hindi words to avoid false positives on English queries
-        if hin_score >= 2:
-            return "Hindi (Devanagari Script)"
-
-        return "English"
-
-    async def generate_response(self, request: ChatRequest) -> ChatResponse:
+        """Detect language from query text (script histogram + Romanized word scoring)."""
+        return detect_language(query)
+
+    def _remember(self, session_id: Optional[str], query: str, answer: str):
+        """
+        Add a finished turn to the session memory (warnings like BUSY_MESSAGE are not part
+        of the conversation). Requests without a session_id are stateless: they never
+        create a session, so one-off and batch questions don't push real conversations
+        out of the LRU.
+        """
+        if session_id and query.strip() and answer and not answer.startswith("⚠️"):
+            self.sessions.append(session_id, query.strip(), answer)
+
+    async def _prepare(self, request: ChatRequest, session_id: Optional[str]) -> Union[ChatResponse, PreparedQuery]:
+        """
+        Everything that happens before the LLM call: language detection, fast path,
+        session memory, fact lookup, cache lookup, retrieval, prompt and provider routing.
+        Returns a finished ChatResponse when no LLM call is needed.
+        """
+        # One snapshot for the whole request, even if a reload swaps the KB meanwhile
+        kb = self.knowledge.current
         query = request.query.strip()
         if not query:
+            set_outcome("empty")
             return ChatResponse(response="Please enter a question about KPGU.", sources=[], detected_language="en")
 
-        target_lang = self._detect_language(query)
-        print(f"--- LANG: {target_lang} | QUERY: {query} ---")
-
-        # Ultra-Fast Path: Small Talk & Greetings bypass the LLM completely for 0 latency
-        q_lower = query.lower().replace("?", "").strip()
-        fast_responses = {
-            "english": ["hi", "hello", "hey", "how are you", "how are u", "hi kpgu"],
-            "hindi": ["kese ho", "kaise ho", "namaste", "pranam", "kya haal hai", "hello kpgu", "kese hai"],
-            "gujarati": ["kem cho", "kem chho", "majama", "shubhechha", "namaskar", "hello kem cho"]
-        }
-        
-        gratitude_responses = {
-            "english": ["thanks", "thank you", "ok thanks", "okay thanks", "thx"],
-            "hindi": ["dhanyawad", "shukriya", "thanks bhai", "bahut dhanyawad"],
-            "gujarati": ["aabhar", "khub khub aabhar", "dhanyavad", "thank you"]
-        }
-        
-        if q_lower in fast_responses["english"]:
-            return ChatResponse(response="Hello! I'm KPGU Assistant. I'm doing great! 🎓 How can I help you regarding admissions, courses, or fees today? 👋", sources=[], detected_language="en")
-        if q_lower in fast_responses["hindi"]:
-            return ChatResponse(response="नमस्ते! मैं बिल्कुल ठीक हूँ! 🎓 बताइए, आज मैं केपीजीयू (KPGU) से संबंधित आपकी क्या सहायता कर सकता हूँ? 👋", sources=[], detected_language="hi")
-        if q_lower in fast_responses["gujarati"]:
-            return ChatResponse(response="નમસ્તે! હું મજામાં છું! 🎓 ચાલો, આજે KPGU ને લગતી તમે કઈ માહિતી જાણવા માંગો છો? 👋", sources=[], detected_language="gu")
-
-        if any(g in q_lower for g in gratitude_responses["english"]) and len(q_lower) < 20:
-            return ChatResponse(response="You're very welcome! 😊 Feel free to ask if you need anything else about KPGU.", sources=[], detected_language="en")
-        if any(g in q_lower for g in gratitude_responses["hindi"]) and len(q_lower) < 20:
-            return ChatResponse(response="आपका स्वागत है! 😊 अगर आपको KPGU के बारे में कुछ और जानना हो, तो बेझिझक पूछें।", sources=[], detected_language="hi")
-        if any(g in q_lower for g in gratitude_responses["gujarati"]) and len(q_lower) < 20:
-            return ChatResponse(response="તમારો આભાર! 😊 જો તમને KPGU વિશે કોઈ અન્ય માહિતી જોઈતી હોય તો જરૂરથી પૂછો.", sources=[], detected_language="gu")
-
-        script_rules = ""
-        if target_lang == "Hindi (Devanagari Script)":
-            script_rules = "- CRITICAL: You MUST use the native Devanagari script. NEVER use Romanized Hindi (e.g. write 'कैसे हो' NOT 'kese ho')."
-        elif target_lang == "Gujarati (Gujarati Script)":
-            script_rules = "- CRITICAL: You MUST use the native Gujarati script. NEVER use Romanized Gujarati."
-
-        template = f"""You are the Official KPGU AI Assistant — a friendly, senior university counselor. ✨
-
-INTERACTION RULES:
-- If the user greets you or asks how you are, respond warmly with emojis. Example: "I'm doing great! 🎓 How can I help you today? 👋"
-- For factual questions, use ONLY the KPGU MASTER DATA below. Never guess fees.
-- If the answer is not in the data, say so and suggest calling 1800 843 9999.
-- Respond 100% in {{target_language}}.
-{script_rules}
-- Start your answer immediately. No robotic preamble.
-
-KPGU MASTER DATA:
-{{context}}
-
-User: {{question}}
-
-Response (in {{target_language}}):"""
-
-        prompt = ChatPromptTemplate.from_template(template)
-        providers = self._get_providers()
+        with span("detect_language") as s:
+            target_lang = s["language"] = self._detect_language(query)
+        log(f"--- LANG: {target_lang} | QUERY: {query} ---")
 
-        if not providers:
+        # Ultra-Fast Path: greetings, thanks and top FAQs are answered from the
+        # precomputed intent table without touching the LLM
+        if kb.intents:
+            with span("fast_path") as s:
+                hit = kb.intents.match(query, target_lang)
+                s["hit"] = hit is not None
+            if hit is not None:
+                response, lang, sources = hit
+                log("  -> FAST PATH")
+                metrics.fast_path.inc()
+                set_outcome("fast_path")
+                return ChatResponse(response=response, sources=sources, detected_language=lang)
+
+        # Conversation memory: an explicit client history wins, otherwise the session's
+        # window + summary. Follow-ups ("and for MBA?") are retrieved together with the
+        # previous question, but their answer depends on it, so they bypass the cache
+        # and request coalescing (both are keyed on the question alone).
+        with span("session") as s:
+            if session_id:
+                await self.sessions.load(session_id)
+            history = request.history or (self.sessions.history(session_id) if session_id else [])
+            lookup = query
+            previous = self.sessions.last_question(session_id) if session_id else None
+            followup = s["followup"] = bool(previous and is_followup(query))
+        if followup:
+            lookup = f"{previous} {query}"
+            log(f"  -> FOLLOW-UP of: {previous}")
+
+        # Fact store: direct lookups ("B.Tech CSE fees", "BPT duration") answered from
+        # records compiled out of the dataset; a follow-up borrows the previous question's course
+        if kb.facts:
+            with span("fact_lookup") as s:
+                hit = kb.facts.match(query, target_lang, previous if followup else None)
+                s["hit"] = hit is not None
+            if hit is not None:
+                response, lang, sources = hit
+                log("  -> FACT LOOKUP")
+                metrics.fact_lookups.inc()
+                set_outcome("fact")
+                return ChatResponse(response=response, sources=sources, detected_language=lang)
+
+        # Response Cache: near-identical questions in the same language skip the LLM
+        if self.cache and not followup:
+            with span("cache") as s:
+                cached = await self.cache.aget(query, target_lang)
+                s["hit"] = cached is not None
+            metrics.cache_lookups.inc(result="hit" if cached is not None else "miss")
+            if cached is not None:
+                log("  -> CACHE HIT")
+                set_outcome("cache")
+                return cached.model_copy()
+
+        prompt = self.prompts.get(target_lang, self.prompts["English"])
+        if not self.registry.providers:
+            set_outcome("no_providers")
             return ChatResponse(response="⚠️ No AI providers configured. Check API keys.", sources=[], detected_language="en")
 
+        # Providers in cooldown / with an open circuit are skipped instead of waiting on a timeout
+        providers = self._get_providers()
+        if not providers:
+            log("  -> All providers cooling down")
+            set_outcome("busy")
+            return ChatResponse(response=BUSY_MESSAGE, sources=[], detected_language="en")
+
         # Smart Model Routing: Llama-3.1-8B hallucinates/loops on Gujarati & Hindi translation. 
         # For non-English strictly prioritize Gemini 2.0 Flash.
         if target_lang != "English":
@@ -149,25 +245,276 @@ Response (in {{target_language}}):"""
             groq_providers = [p for p in providers if "Groq" in p[0]]
             providers = gemini_providers + groq_providers
 
-        last_err = ""
-        for name, llm in providers:
+        with span("retrieval") as s:
+            sections, sources = kb.retrieve(lookup, settings.RETRIEVAL_TOP_K)
+            s["sections"] = len(sections)
+        fixed_tokens = self.prompt_overhead.get(target_lang, 0) + self.budget.counter.count(query)
+        return PreparedQuery(query, lookup, target_lang, prompt, providers, sections, sources, history, fixed_tokens,
+                             kb.version, followup)
+
+    def _finish(self, plan: PreparedQuery, result: str, store: bool = True) -> ChatResponse:
+        response = ChatResponse(response=result, sources=plan.sources, detected_language=response_language(result))
+        # An answer built from a KB version that was swapped out mid-request is not cached
+        if store and self.cache and not plan.followup and plan.kb_version == self.knowledge.current.version:
+            self.cache.set(plan.query, plan.target_lang, response)
+        return response
+
+    async def _invoke(self, name, llm, plan: PreparedQuery) -> str:
+        """One provider attempt; records latency / health and raises on failure or empty output."""
+        log(f"  -> Trying {name}...")
+        inputs = await self._admit(name, plan)
+        started = time.perf_counter()
+        with span("provider", provider=name, result="cancelled") as s:
             try:
-                print(f"  -> Trying {name}...")
-                chain = prompt | llm | StrOutputParser()
-                result = await chain.ainvoke({"context": self.context_text, "question": query, "target_language": target_lang})
-                if result:
-                    print(f"  -> SUCCESS via {name}")
-                    gu = sum(1 for c in result if 0x0A80 <= ord(c) <= 0x0AFF)
-                    hi = sum(1 for c in result if 0x0900 <= ord(c) <= 0x097F)
-                    lang = "gu" if gu > 10 else "hi" if hi > 10 else "en"
-                    return ChatResponse(response=result, sources=["KPGU Knowledge Base"], detected_language=lang)
+                chain = self._chain(plan.prompt, llm)
+                result = await chain.ainvoke(inputs)
             except Exception as e:
-                last_err = str(e)
-                print(f"  -> FAIL {name}: {last_err[:80]}")
+                s["result"] = "error"
+                self._provider_failed(name, e, time.perf_counter() - started)
+                raise
+            finally:
+                self.registry.release(name)
+            if not result:
+                s["result"] = "empty"
+                raise ValueError(f"{name} returned an empty answer")
+            s["result"] = "ok"
+            self._provider_succeeded(name, result, time.perf_counter() - started)
+        return result
 
+    async def _invoke_sequential(self, plan: PreparedQuery) -> Optional[str]:
+        for i, (name, llm) in enumerate(plan.providers):
+            try:
+                return await self._invoke(name, llm, plan)
+            except Exception as e:
+                if i + 1 < len(plan.providers):
+                    metrics.failovers.inc(reason="rate_wait" if isinstance(e, RateLimitWait) else "error")
+                continue
+        return None
+
+    async def _invoke_hedged(self, plan: PreparedQuery, race: bool) -> Optional[str]:
+        """
+        Hedged failover: if the running provider hasn't answered within its latency
+        budget (adaptive p95, or 0 in race mode) the next provider is started
+        concurrently. The first successful answer wins, the rest are cancelled.
+        """
+        queue = list(plan.providers)
+        pending = {}
+
+        def launch():
+            name, llm = queue.pop(0)
+            pending[asyncio.create_task(self._invoke(name, llm, plan))] = name
+            return name
+
+        try:
+            last = launch()
+            while pending:
+                delay = None
+                if queue:
+                    delay = 0 if race else self.registry.hedge_delay(last)
+                done, _ = await asyncio.wait(pending.keys(), timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                failed = False
+                for task in done:
+                    pending.pop(task)
+                    if not task.exception():
+                        return task.result()
+                    failed = True
+                if queue and (failed or not done):
+                    if not done:
+                        log(f"  -> HEDGE: {last} over budget, starting next provider")
+                    metrics.failovers.inc(reason="error" if failed else "hedge")
+                    last = launch()
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _coalesces(self, plan: PreparedQuery) -> bool:
+        return self.inflight is not None and not plan.followup
+
+    def _flight_key(self, plan: PreparedQuery):
+        return plan.kb_version, plan.target_lang, coalesce_key(plan.query, self.coalesce_mode)
+
+    def _join_flight(self, plan: PreparedQuery, endpoint: str):
+        """The future of an identical question already waiting on a provider, or None."""
+        future = self.inflight.join(self._flight_key(plan)) if self._coalesces(plan) else None
+        if future is not None:
+            log("  -> COALESCED with an identical question in flight")
+            metrics.coalesced.inc(endpoint=endpoint)
+            set_outcome("coalesced")
+        return future
+
+    async def _call_providers(self, plan: PreparedQuery) -> Optional[str]:
+        mode = settings.PROVIDER_HEDGE_MODE
+        if mode in ("hedge", "race") and len(plan.providers) > 1:
+            return await self._invoke_hedged(plan, race=(mode == "race"))
+        return await self._invoke_sequential(plan)
+
+    def _check_rate(self, request: ChatRequest, client: Optional[str]):
+        """
+        Per-IP / per-session fair share, counted only for questions that need a provider
+        and before they lead or join a flight (raises AdmissionRejected).
+        """
+        if self.admission:
+            self.admission.check_rate(client, request.session_id)
+            self.admission.check_client(client)
+
+    def _slot(self, client: Optional[str]):
+        """One of the ADMISSION_MAX_CONCURRENT provider slots, held for the whole provider call."""
+        return self.admission.slot(client) if self.admission else nullcontext()
+
+    async def generate_response(self, request: ChatRequest, client: Optional[str] = None,
+                                llm_limit: Optional[asyncio.Semaphore] = None) -> ChatResponse:
+        """
+        client: the caller's IP, for admission control (AdmissionRejected when shed).
+        llm_limit: held only while the question needs a provider (bounds a batch's LLM calls).
+        """
+        session_id = request.session_id
+        response = await self._generate(request, session_id, client, llm_limit)
+        self._remember(session_id, request.query, response.response)
+        return response.model_copy(update={"session_id": session_id})
+
+    async def _generate(self, request: ChatRequest, session_id: Optional[str], client: Optional[str] = None,
+                        llm_limit: Optional[asyncio.Semaphore] = None) -> ChatResponse:
+        plan = await self._prepare(request, session_id)
+        if isinstance(plan, ChatResponse):
+            return plan
+        async with llm_limit or nullcontext():
+            return await self._answer(request, plan, client)
+
+    async def _answer(self, request: ChatRequest, plan: PreparedQuery, client: Optional[str]) -> ChatResponse:
+        self._check_rate(request, client)
+
+        async def call():
+            async with self._slot(client):
+                return await self._call_providers(plan)
+
+        # Single flight: one provider call per distinct question in flight, the
+        # identical requests arriving meanwhile await its result
+        lead = self._coalesces(plan)
+        future = self._join_flight(plan, "chat")
+        if future is not None:
+            try:
+                result = await asyncio.shield(future)
+            except AdmissionRejected:
+                result = None
+            if result:
+                return self._finish(plan, result, store=False)
+            # The leader was shed for its own client or went away (a streaming client
+            # disconnected) before it had an answer: make our own call
+            result = await call()
+        elif lead:
+            result = await self.inflight.run(self._flight_key(plan), call)
+        else:
+            result = await call()
+        if result:
+            return self._finish(plan, result)
+
+        set_outcome("busy")
         return ChatResponse(
-            response="⚠️ All AI providers are busy. Please wait 30 seconds and try again.",
+            response=BUSY_MESSAGE,
             sources=[], detected_language="en"
         )
 
+    async def stream_response(self, request: ChatRequest, client: Optional[str] = None) -> AsyncIterator[dict]:
+        """
+        Streaming variant of generate_response. Yields {"type": "token"} events as the
+        provider produces them and ends with a {"type": "done"} event carrying
+        detected_language, sources and session_id. Failover to the next provider only
+        happens if a provider fails before sending its first token.
+        """
+        session_id = request.session_id
+        parts = []
+        async for event in self._stream(request, session_id, client):
+            if event["type"] == "token":
+                parts.append(event["content"])
+            elif event["type"] == "done":
+                self._remember(session_id, request.query, "".join(parts))
+                event = {**event, "session_id": session_id}
+            yield event
+
+    async def _stream(self, request: ChatRequest, session_id: Optional[str], client: Optional[str] = None) -> AsyncIterator[dict]:
+        plan = await self._prepare(request, session_id)
+        if isinstance(plan, ChatResponse):
+            yield {"type": "token", "content": plan.response}
+            yield {"type": "done", "detected_language": plan.detected_language, "sources": plan.sources}
+            return
+        self._check_rate(request, client)
+
+        lead = self._coalesces(plan)
+        future = self._join_flight(plan, "stream")
+        if future is not None:
+            # Same question already being answered: send its answer in one piece when ready
+            try:
+                result = await asyncio.shield(future)
+            except AdmissionRejected:
+                result = None
+            if result:
+                response = self._finish(plan, result, store=False)
+                yield {"type": "token", "content": result}
+                yield {"type": "done", "detected_language": response.detected_language, "sources": response.sources}
+                return
+            # The leader was shed or went away without an answer: stream our own
+            lead = False
+
+        # Lead the flight: followers (streaming or not) get the full answer at the end
+        key = self._flight_key(plan) if lead else None
+        flight = self.inflight.begin(key) if key is not None else None
+        answer = error = None
+        try:
+            async with self._slot(client):
+                async for event in self._stream_providers(plan):
+                    if event["type"] == "done" and "answer" in event:
+                        answer = event.pop("answer")
+                    yield event
+        except AdmissionRejected as e:
+            error = e
+            raise
+        finally:
+            if flight is not None:
+                self.inflight.end(key, flight, answer, error)
+
+    async def _stream_providers(self, plan: PreparedQuery) -> AsyncIterator[dict]:
+        for i, (name, llm) in enumerate(plan.providers):
+            if i:
+                metrics.failovers.inc(reason="error")
+            parts = []
+            log(f"  -> Streaming via {name}...")
+            try:
+                inputs = await self._admit(name, plan)
+            except (RateLimitWait, ProviderUnavailable):
+                continue
+            started = time.perf_counter()
+            with span("provider", provider=name, result="cancelled") as s:
+                try:
+                    chain = self._chain(plan.prompt, llm)
+                    async for chunk in chain.astream(inputs):
+                        if chunk:
+                            if not parts:
+                                s["first_token_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                            parts.append(chunk)
+                            yield {"type": "token", "content": chunk}
+                except Exception as e:
+                    s["result"] = "error"
+                    self._provider_failed(name, e, time.perf_counter() - started)
+                    if parts:
+                        # Tokens already reached the client, a different provider can't continue them
+                        set_outcome("interrupted")
+                        yield {"type": "error", "message": "The answer was interrupted. Please try again."}
+                        return
+                    continue
+                finally:
+                    self.registry.release(name)
+                s["result"] = "ok" if parts else "empty"
+            if parts:
+                result = "".join(parts)
+                self._provider_succeeded(name, result, time.perf_counter() - started)
+                response = self._finish(plan, result)
+                yield {"type": "done", "detected_language": response.detected_language, "sources": response.sources,
+                       "answer": result}
+                return
+
+        set_outcome("busy")
+        yield {"type": "token", "content": BUSY_MESSAGE}
+        yield {"type": "done", "detected_language": "en", "sources": []}
+
 rag_service = RAGService()
@@ -0,0 +1,175 @@
+import asyncio
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+
+class RateLimitWait(Exception):
+    """Raised when a provider key has no capacity within the allowed wait (the caller fails over)."""
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `capacity` units, refilled continuously at `rate` units per
+    second. A rate or capacity of 0 means unlimited: it never makes a caller wait.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+        self.unlimited = rate <= 0 or capacity <= 0
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` units are available (0 = now)."""
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def consume(self, amount: float, now: float):
+        if self.unlimited:
+            return
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+
+    def drain(self, now: float):
+        if self.unlimited:
+            return
+        self._refill(now)
+        self.level = min(self.level, 0.0)
+
+    def used_fraction(self, now: float) -> float:
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        return 1.0 - max(self.level, 0.0) / self.capacity
+
+
+class KeyLimiter:
+    """RPM + TPM buckets for one API key, plus a 60 s window of what was actually sent."""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = TokenBucket(rpm / 60.0, rpm)
+        self.tokens = TokenBucket(tpm / 60.0, tpm)
+        self.window = deque()  # (timestamp, tokens)
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.waited = 0
+        self.rejected = 0
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        return max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+
+    def consume(self, tokens: int, now: float):
+        self.requests.consume(1, now)
+        self.tokens.consume(tokens, now)
+        self.window.append((now, tokens))
+        self.admitted += 1
+
+    def load(self, now: float) -> float:
+        """0..1: how much of the key's capacity is in use (the busier of requests and tokens)."""
+        return max(self.requests.used_fraction(now), self.tokens.used_fraction(now))
+
+    def snapshot(self, now: float) -> dict:
+        while self.window and now - self.window[0][0] > 60:
+            self.window.popleft()
+        return {
+            "rpm_limit": self.rpm,
+            "tpm_limit": self.tpm,
+            "requests_last_min": len(self.window),
+            "tokens_last_min": sum(t for _, t in self.window),
+            "utilization": round(self.load(now), 3),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "waited": self.waited,
+            "rejected": self.rejected,
+        }
+
+
+class RateLimiter:
+    """
+    Per-key admission control in front of the LLM providers.
+
+    Each key has request and token buckets sized from its RPM/TPM. A call reserves
+    one request plus its estimated tokens. If the key has no capacity, the call
+    joins that key's FIFO admission queue and waits for the bucket to refill, for
+    at most max_wait seconds. Beyond that, or when the queue is full, it raises
+    RateLimitWait so the caller can fail over. order() ranks a pool of keys by
+    current load, which spreads traffic across several Gemini keys.
+    """
+
+    def __init__(self, limits: Dict[str, tuple], max_wait: float, queue_max: int):
+        self.keys: Dict[str, KeyLimiter] = {name: KeyLimiter(rpm, tpm) for name, (rpm, tpm) in limits.items()}
+        self.max_wait = max_wait
+        self.queue_max = queue_max
+        self._turnstiles: Dict[str, asyncio.Lock] = {}
+
+    def order(self, names: List[str]) -> List[str]:
+        """Least-loaded first (ties: fewer calls in flight, then configured order)."""
+        now = time.monotonic()
+        rank = {name: i for i, name in enumerate(names)}
+        return sorted(names, key=lambda n: (round(self.keys[n].load(now), 2), self.keys[n].in_flight, rank[n])
+                      if n in self.keys else (0, 0, rank[n]))
+
+    async def acquire(self, name: str, tokens: int):
+        key = self.keys.get(name)
+        if key is None:
+            return
+        now = time.monotonic()
+        wait = key.wait_time(tokens, now)
+        if wait == 0 and key.queued == 0:
+            key.consume(tokens, now)
+            key.in_flight += 1
+            return
+        if wait > self.max_wait or key.queued >= self.queue_max:
+            key.rejected += 1
+            raise RateLimitWait(f"{name} over its rate limit (capacity in {wait:.1f}s)")
+
+        # FIFO: asyncio.Lock wakes waiters in arrival order, only the head sleeps on the bucket
+        turnstile = self._turnstiles.setdefault(name, asyncio.Lock())
+        key.queued += 1
+        key.waited += 1
+        deadline = time.monotonic() + self.max_wait
+        try:
+            async with turnstile:
+                while True:
+                    now = time.monotonic()
+                    wait = key.wait_time(tokens, now)
+                    if wait == 0:
+                        key.consume(tokens, now)
+                        key.in_flight += 1
+                        return
+                    if now + wait > deadline:
+                        key.rejected += 1
+                        raise RateLimitWait(f"{name} over its rate limit (waited {self.max_wait:.0f}s)")
+                    await asyncio.sleep(wait)
+        finally:
+            key.queued -= 1
+
+    def release(self, name: str):
+        key = self.keys.get(name)
+        if key is not None and key.in_flight > 0:
+            key.in_flight -= 1
+
+    def penalize(self, name: str):
+        """The provider answered 429: trust it over our estimate and empty the buckets."""
+        key = self.keys.get(name)
+        if key is not None:
+            now = time.monotonic()
+            key.requests.drain(now)
+            key.tokens.drain(now)
+
+    def snapshot(self, name: str) -> Optional[dict]:
+        key = self.keys.get(name)
+        return key.snapshot(time.monotonic()) if key is not None else None
@@ -0,0 +1,337 @@
+import asyncio
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.services.retrieval import tokenize
+
+# Politeness / filler words that do not change what is being asked
+FILLER_WORDS = frozenset([
+    "please", "pls", "plz", "kindly", "bhai", "sir", "madam", "hai", "che", "chhe",
+    "kitni", "kitna", "ketla", "kya", "su", "shu", "batao", "bata", "aapo", "hello", "hi",
+])
+
+
+# Branch / degree codes that are also English words ("B.Tech IT", "ME", "B.E."). Retrieval
+# drops them as stopwords, but in a cache key they decide which answer is the right one.
+CODE_WORDS = frozenset(["it", "me", "be"])
+_CODE_AFTER = frozenset(["btech", "mtech", "diploma", "polytechnic"])               # "btech it fees"
+_CODE_BEFORE = frozenset(["branch", "engineering", "department", "dept", "stream"])  # "me branch"
+_WORD_RE = re.compile(r"[\w\u0900-\u097F\u0A80-\u0AFF]+")
+
+
+def code_words(query: str) -> Set[str]:
+    """
+    The CODE_WORDS a question uses as course codes: written in capitals ("IT", "M.E.")
+    or next to a course word ("btech me fees", "it branch"). "tell me" and "is it" are not.
+    """
+    words = _WORD_RE.findall(query.replace(".", ""))
+    codes = set()
+    for i, word in enumerate(words):
+        lower = word.lower()
+        if lower not in CODE_WORDS:
+            continue
+        before = words[i - 1].lower() if i else ""
+        after = words[i + 1].lower() if i + 1 < len(words) else ""
+        if word.isupper() or before in _CODE_AFTER or after in _CODE_BEFORE:
+            codes.add(lower)
+    return codes
+
+
+def normalize_query(query: str) -> Tuple[str, ...]:
+    """
+    Canonical form of a question: sorted unique content tokens plus the course codes
+    retrieval treats as stopwords ("B.Tech CSE fees?" == "fees for btech cse",
+    "B.Tech IT fees" != "B.Tech ME fees").
+    """
+    return tuple(sorted({t for t in tokenize(query) if t not in FILLER_WORDS} | code_words(query)))
+
+
+class ResponseCache:
+    """
+    Two-tier (exact + fuzzy token-set) LRU cache of LLM answers with a TTL.
+    Entries are keyed on (language, normalized query). When the knowledge base is
+    reloaded, KnowledgeBaseManager drops the entries the change affects (items() /
+    invalidate()).
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 3600, fuzzy_threshold: float = 0.8):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.fuzzy_threshold = fuzzy_threshold
+
+        self._entries: "OrderedDict[Tuple[str, Tuple[str, ...]], Tuple[float, object]]" = OrderedDict()
+        # (language, token) -> keys containing that token, used to find fuzzy candidates
+        self._token_index: Dict[Tuple[str, str], Set[Tuple[str, Tuple[str, ...]]]] = defaultdict(set)
+        self.hits_exact = 0
+        self.hits_fuzzy = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    # --- internals ---
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        lang, tokens = key
+        for tok in tokens:
+            bucket = self._token_index.get((lang, tok))
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._token_index[(lang, tok)]
+
+    def _live(self, key, now) -> Optional[object]:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        stored_at, value = item
+        if now - stored_at > self.ttl_seconds:
+            self._remove(key)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _fuzzy(self, lang, tokens, now) -> Optional[object]:
+        if not tokens:
+            return None
+        overlap: Dict[Tuple[str, Tuple[str, ...]], int] = defaultdict(int)
+        for tok in tokens:
+            for key in self._token_index.get((lang, tok), ()):
+                overlap[key] += 1
+        best_key, best_sim = None, 0.0
+        n = len(tokens)
+        for key, shared in overlap.items():
+            sim = shared / (n + len(key[1]) - shared)
+            if sim > best_sim:
+                best_key, best_sim = key, sim
+        if best_key is not None and best_sim >= self.fuzzy_threshold:
+            return self._live(best_key, now)
+        return None
+
+    # --- public API ---
+    def get(self, query: str, language: str) -> Optional[object]:
+        now = time.monotonic()
+        tokens = normalize_query(query)
+        key = (language, tokens)
+
+        value = self._live(key, now)
+        if value is not None:
+            self.hits_exact += 1
+            return value
+        value = self._fuzzy(language, tokens, now)
+        if value is not None:
+            self.hits_fuzzy += 1
+            return value
+        self.misses += 1
+        return None
+
+    async def aget(self, query: str, language: str) -> Optional[object]:
+        """get() for the event loop (the in-process tiers never block)."""
+        return self.get(query, language)
+
+    def set(self, query: str, language: str, value: object):
+        tokens = normalize_query(query)
+        if not tokens:
+            return
+        key = (language, tokens)
+        self._remove(key)
+        self._entries[key] = (time.monotonic(), value)
+        for tok in tokens:
+            self._token_index[(language, tok)].add(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def items(self) -> List[Tuple[Tuple[str, Tuple[str, ...]], object]]:
+        """Snapshot of (key, value) pairs, e.g. to work out which entries a KB change affects."""
+        return [(key, value) for key, (_, value) in self._entries.items()]
+
+    def invalidate(self, keys) -> int:
+        """Drop the given keys (entries that depend on changed knowledge); returns how many were present."""
+        removed = 0
+        for key in keys:
+            if key in self._entries:
+                self._remove(key)
+                removed += 1
+        if removed:
+            self.invalidations += 1
+        return removed
+
+    def clear(self):
+        self._entries.clear()
+        self._token_index.clear()
+
+    def close(self):
+        pass
+
+    def stats(self) -> dict:
+        hits = self.hits_exact + self.hits_fuzzy
+        total = hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits_exact": self.hits_exact,
+            "hits_fuzzy": self.hits_fuzzy,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "llm_calls_saved": hits,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+class SharedResponseCache(ResponseCache):
+    """
+    ResponseCache whose entries are also written to a SQLite file that every worker
+    process opens (WAL mode, so readers never block the writer). The in-process LRU
+    stays in front as the first tier; a local miss falls through to an exact lookup
+    in the shared table. Entries carry the knowledge base version they were answered
+    from and are only served while that version is current; migrate_version carries
+    the still-valid ones over to a new version.
+
+    Nothing touches SQLite on the event loop: aget() reads the shared table in a
+    worker thread, and set() only queues the row for a background writer thread
+    that commits whatever has queued up in one transaction. stats() and
+    migrate_version() query the table directly: call them through asyncio.to_thread.
+    """
+
+    def __init__(self, db_path: str, dumps, loads, version: str = "", **kwargs):
+        super().__init__(**kwargs)
+        self.dumps = dumps
+        self.loads = loads
+        self.version = version
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            "lang TEXT NOT NULL, query_key TEXT NOT NULL, kb_version TEXT NOT NULL, "
+            "value TEXT NOT NULL, created_at REAL NOT NULL, PRIMARY KEY (lang, query_key, kb_version))"
+        )
+        self._db.commit()
+        self.hits_shared = 0
+        self.shared_errors = 0
+        self._writes: "queue.Queue" = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="shared-cache-writer", daemon=True)
+        self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            rows = [self._writes.get()]
+            while not self._writes.empty():
+                rows.append(self._writes.get_nowait())
+            stop = None in rows
+            rows = [row for row in rows if row is not None]
+            if rows:
+                try:
+                    with self._lock:
+                        self._db.executemany("INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?, ?, ?)", rows)
+                        self._db.commit()
+                except sqlite3.Error:
+                    self.shared_errors += 1
+            if stop:
+                return
+
+    def migrate_version(self, old: str, new: str, is_stale) -> int:
+        """
+        Move shared rows answered from KB version `old` to `new`, deleting the ones
+        is_stale(key, value) rejects. The first worker to switch does the work; for
+        the others no rows of the old version are left. Returns rows deleted.
+        """
+        self.version = new
+        deleted = 0
+        try:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT lang, query_key, value FROM response_cache WHERE kb_version = ?", (old,)
+                ).fetchall()
+                for lang, query_key, raw in rows:
+                    key = (lang, tuple(query_key.split(" ")) if query_key else ())
+                    if is_stale(key, self.loads(raw)):
+                        self._db.execute("DELETE FROM response_cache WHERE lang = ? AND query_key = ? AND kb_version = ?",
+                                         (lang, query_key, old))
+                        deleted += 1
+                self._db.execute("UPDATE OR REPLACE response_cache SET kb_version = ? WHERE kb_version = ?", (new, old))
+                self._db.execute("DELETE FROM response_cache WHERE kb_version NOT IN (?, ?)", (new, old))
+                self._db.commit()
+        except sqlite3.Error:
+            self.shared_errors += 1
+        return deleted
+
+    def _read_shared(self, language: str, tokens: Tuple[str, ...]) -> Optional[str]:
+        try:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT value, created_at FROM response_cache WHERE lang = ? AND query_key = ? AND kb_version = ?",
+                    (language, " ".join(tokens), self.version),
+                ).fetchone()
+        except sqlite3.Error:
+            self.shared_errors += 1
+            return None
+        if row is None or time.time() - row[1] > self.ttl_seconds:
+            return None
+        return row[0]
+
+    def _promote(self, query: str, language: str, raw: Optional[str]) -> Optional[object]:
+        """Copy a shared hit into the local tier (counted as a miss there; it was a hit after all)."""
+        if raw is None:
+            return None
+        value = self.loads(raw)
+        ResponseCache.set(self, query, language, value)
+        self.misses -= 1
+        self.hits_shared += 1
+        return value
+
+    def get(self, query: str, language: str) -> Optional[object]:
+        value = super().get(query, language)
+        tokens = normalize_query(query)
+        if value is not None or not tokens:
+            return value
+        return self._promote(query, language, self._read_shared(language, tokens))
+
+    async def aget(self, query: str, language: str) -> Optional[object]:
+        value = super().get(query, language)
+        tokens = normalize_query(query)
+        if value is not None or not tokens:
+            return value
+        return self._promote(query, language, await asyncio.to_thread(self._read_shared, language, tokens))
+
+    def set(self, query: str, language: str, value: object):
+        super().set(query, language, value)
+        tokens = normalize_query(query)
+        if tokens:
+            self._writes.put((language, " ".join(tokens), self.version, self.dumps(value), time.time()))
+
+    def close(self):
+        """Write out the queued rows and stop the writer thread."""
+        if self._writer.is_alive():
+            self._writes.put(None)
+            self._writer.join()
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        hits = stats["llm_calls_saved"] + self.hits_shared
+        total = hits + self.misses
+        try:
+            with self._lock:
+                shared_entries = self._db.execute("SELECT COUNT(*) FROM response_cache WHERE kb_version = ?", (self.version,)).fetchone()[0]
+        except sqlite3.Error:
+            shared_entries = None
+        return {
+            **stats,
+            "hits_shared": self.hits_shared,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "llm_calls_saved": hits,
+            "shared_entries": shared_entries,
+            "kb_version": self.version,
+            "shared_errors": self.shared_errors,
+        }
@@ -0,0 +1,120 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+# Course codes are written with dots ("B.Tech", "B.A.M.S."), so dots are
+# folded away before tokenizing to make "btech" and "B.Tech" the same term.
+_TOKEN_RE = re.compile(r"[\w\u0900-\u097F\u0A80-\u0AFF]+")
+_HEADING_RE = re.compile(r"^(#{3,4})\s+(.*)$")
+
+STOPWORDS = frozenset([
+    "a", "an", "the", "is", "are", "was", "be", "of", "for", "to", "in", "on", "at", "and",
+    "or", "what", "which", "who", "how", "when", "where", "me", "i", "my", "you", "your",
+    "about", "tell", "there", "any", "do", "does", "can", "with", "it", "this", "that", "kpgu",
+])
+
+# Native-script queries share no terms with the English master dataset, so the
+# most common question words are mapped to the English vocabulary of the KB.
+QUERY_SYNONYMS = {
+    "फीस": "fee", "शुल्क": "fee", "ફી": "fee", "ફીનું": "fee", "fees": "fee",
+    "हॉस्टल": "hostel", "छात्रावास": "hostel", "હોસ્ટેલ": "hostel",
+    "प्लेसमेंट": "placement", "પ્લેસમેન્ટ": "placement", "पैकेज": "package", "પેકેજ": "package",
+    "प्रवेश": "admission", "એડમિશન": "admission", "પ્રવેશ": "admission",
+    "छात्रवृत्ति": "scholarship", "સ્કોલરશિપ": "scholarship",
+    "संपर्क": "contact", "સંપર્ક": "contact",
+    "उपस्थिति": "attendance", "હાજરી": "attendance", "હાજરીનો": "attendance",
+    "पात्रता": "eligibility", "પાત્રતા": "eligibility", "પાત્રતાના": "eligibility",
+    "इंजीनियरिंग": "engineering", "એન્જિનિયરિંગ": "engineering",
+    "कोर्स": "course", "કોર્સ": "course", "કોર્સમાં": "course",
+    "सुविधाओं": "facilities", "સુવિધાઓ": "facilities", "कैंपस": "campus", "કેમ્પસ": "campus",
+    "कंपनियां": "recruiters", "કંપનીઓ": "recruiters",
+    "बीटेक": "btech", "सीएसई": "cse", "एमबीए": "mba", "बीएएमएस": "bams",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, fold course-code dots and apply a light plural stemmer."""
+    text = text.lower().replace(".", "")
+    tokens = []
+    for tok in _TOKEN_RE.findall(text):
+        tok = QUERY_SYNONYMS.get(tok, tok)
+        if tok in STOPWORDS:
+            continue
+        if len(tok) > 3 and tok.endswith("s") and not tok.endswith("ss"):
+            tok = tok[:-1]
+        tokens.append(tok)
+    return tokens
+
+
+def split_sections(text: str) -> List[Tuple[str, str]]:
+    """Split the master dataset on its ### / #### headings into (title, body) pairs."""
+    sections = []
+    parent = ""
+    title = "Overview"
+    lines: List[str] = []
+
+    def flush():
+        # Headings without any content of their own (e.g. a ### that only
+        # groups #### subsections) are not worth retrieving on their own.
+        if any(l.strip() for l in lines[1:]) or (lines and not _HEADING_RE.match(lines[0])):
+            sections.append((title, "\n".join(lines).strip()))
+
+    for line in text.splitlines():
+        m = _HEADING_RE.match(line.strip())
+        if m:
+            flush()
+            level, heading = m.group(1), m.group(2).strip()
+            if len(level) == 3:
+                parent = heading
+                title = heading
+            else:
+                title = f"{parent} > {heading}" if parent else heading
+            # Keep the heading inside the body so the LLM sees the context
+            lines = [line.strip() if len(level) == 3 else f"### {parent}\n{line.strip()}"]
+            continue
+        lines.append(line)
+    flush()
+    return sections
+
+
+class BM25Index:
+    """Small in-memory Okapi BM25 inverted index over knowledge base sections."""
+
+    def __init__(self, sections: List[Tuple[str, str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.sections = sections
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.doc_len: List[int] = []
+
+        for doc_id, (title, body) in enumerate(sections):
+            terms = tokenize(f"{title}\n{body}")
+            self.doc_len.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self.postings[term].append((doc_id, tf))
+
+        n = len(sections)
+        self.avg_len = (sum(self.doc_len) / n) if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for term, plist in self.postings.items()
+        }
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[int, float]]:
+        """Return up to k (section index, score) pairs with a positive score, best first."""
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = self.idf[term]
+            for doc_id, tf in plist:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / (self.avg_len or 1))
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        return ranked[:k]
+
+    def ranked_sections(self, query: str, k: int = 4) -> List[Tuple[int, str, str]]:
+        """Top-k sections as (section index, title, text), best first."""
+        return [(i, self.sections[i][0], self.sections[i][1]) for i, _ in self.search(query, k)]
@@ -0,0 +1,267 @@
+import asyncio
+import json
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+from app.services.response_cache import code_words
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?।])\s")
+_WORD_RE = re.compile(r"[\w\u0900-\u097F\u0A80-\u0AFF]+")
+
+# Words that only make sense with the previous question ("and its fees?", "is that hostel AC?")
+FOLLOWUP_WORDS = frozenset([
+    "it", "its", "that", "those", "these", "they", "them", "their", "same",
+    "iski", "iska", "uski", "uska", "eni", "enu", "ena", "ema", "इसकी", "इसका", "उसकी", "उसका", "એની", "એનું",
+])
+# Openers that continue the previous question ("and for MBA?", "what about hostel")
+FOLLOWUP_OPENERS = (
+    "and", "also", "then", "what about", "how about", "same for", "aur", "or", "ane", "और", "अच्छा", "અને",
+)
+
+
+def is_followup(query: str) -> bool:
+    """
+    A question that points back at the last turn: it opens with a connective ("and
+    for MBA?") or uses a pronoun for something asked before ("its fees"). Length
+    alone says nothing: "MBA placements" is a question of its own.
+    """
+    words = _WORD_RE.findall(query.lower().replace(".", ""))
+    if not words:
+        return False
+    text = " ".join(words)
+    if any(text == opener or text.startswith(opener + " ") for opener in FOLLOWUP_OPENERS):
+        return True
+    # "B.Tech IT fees" names a branch, it doesn't point back at anything
+    return bool(set(words) & FOLLOWUP_WORDS - code_words(query))
+
+
+class SessionState:
+    """Recent turns kept verbatim plus an extractive summary of the turns that slid out of the window."""
+
+    __slots__ = ("turns", "summary", "last_used", "size")
+
+    def __init__(self, turns=None, summary: str = "", window: int = 6):
+        self.turns = deque(turns or [], maxlen=window)
+        self.summary = summary
+        self.last_used = time.monotonic()
+        self.size = 0
+
+    def to_json(self) -> str:
+        return json.dumps({"turns": list(self.turns), "summary": self.summary}, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, raw: str, window: int) -> "SessionState":
+        data = json.loads(raw)
+        return cls([tuple(t) for t in data["turns"]], data["summary"], window)
+
+
+class SessionStore:
+    """
+    Server-side conversation memory keyed by session id.
+
+    Each session keeps the last `window` (question, answer) turns verbatim; older turns
+    are folded into a rolling summary capped at summary_chars (oldest lines dropped
+    first). The summary is extractive - the question plus the first sentence of the
+    answer - so it costs no extra LLM call.
+
+    Sessions live in an LRU bounded by count and by an approximate size in characters.
+    Idle sessions expire after ttl_seconds. With a spill_path, sessions evicted for space
+    are written to a small SQLite table and read back on their next request. SQLite
+    stays off the event loop: evicted sessions are queued for a background writer
+    thread, and load() reads a spilled session back in a worker thread.
+
+    The store is per process: with several workers (run_workers.py) a session only
+    has memory on the worker that served its earlier turns. Clients that can land on
+    any worker should send the conversation in ChatRequest.history instead.
+    """
+
+    def __init__(self, window: int = 6, summary_chars: int = 600, max_sessions: int = 5000,
+                 max_chars: int = 8_000_000, ttl_seconds: float = 3600, spill_path: str = ""):
+        self.window = window
+        self.summary_chars = summary_chars
+        self.max_sessions = max_sessions
+        self.max_chars = max_chars
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str, SessionState]" = OrderedDict()
+        self._chars = 0
+
+        self._spill = None
+        self._spill_lock = threading.Lock()
+        self._pending: Dict[str, str] = {}  # evicted sessions not yet written: id -> state JSON
+        self._writes: "queue.Queue" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        if spill_path:
+            self._spill = sqlite3.connect(spill_path, check_same_thread=False)
+            self._spill.execute("PRAGMA journal_mode=WAL")
+            self._spill.execute(
+                "CREATE TABLE IF NOT EXISTS chat_sessions (session_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._writer = threading.Thread(target=self._write_loop, name="session-spill-writer", daemon=True)
+            self._writer.start()
+
+        self.spilled = 0
+        self.restored = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # --- spill ---
+    def _write_loop(self):
+        while True:
+            op = self._writes.get()
+            if op is None:
+                return
+            session_id, raw = op
+            with self._spill_lock:
+                if raw is None:
+                    self._spill.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+                elif self._pending.get(session_id) is raw:
+                    self._spill.execute("INSERT OR REPLACE INTO chat_sessions VALUES (?, ?, ?)",
+                                        (session_id, raw, time.time()))
+                    self._pending.pop(session_id, None)
+                    self.spilled += 1
+                else:
+                    continue  # read back or cleared before it was written
+                self._spill.commit()
+
+    def _spill_write(self, session_id: str, state: SessionState):
+        if self._spill is None:
+            return
+        raw = self._pending[session_id] = state.to_json()
+        self._writes.put((session_id, raw))
+
+    def _spill_read(self, session_id: str) -> Optional[str]:
+        """Runs in a worker thread: take the session's row out of the table."""
+        with self._spill_lock:
+            row = self._spill.execute("SELECT state, updated_at FROM chat_sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            self._spill.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+            self._spill.commit()
+        return row[0] if time.time() - row[1] <= self.ttl_seconds else None
+
+    def _spill_delete(self, session_id: str) -> bool:
+        with self._spill_lock:
+            found = self._spill.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+            self._spill.commit()
+        return found
+
+    async def load(self, session_id: str):
+        """Bring a spilled session back into memory before the request reads it."""
+        if self._spill is None or session_id in self._sessions:
+            return
+        raw = self._pending.pop(session_id, None)
+        if raw is not None:
+            # Still queued: the write is skipped, or removed again if it already happened
+            self._writes.put((session_id, None))
+        else:
+            raw = await asyncio.to_thread(self._spill_read, session_id)
+        if raw is None or session_id in self._sessions:
+            return
+        state = self._sessions[session_id] = SessionState.from_json(raw, self.window)
+        self._resize(state)
+        self.restored += 1
+        self._enforce_limits()
+
+    # --- bookkeeping ---
+    @staticmethod
+    def _measure(state: SessionState) -> int:
+        return len(state.summary) + sum(len(q) + len(a) for q, a in state.turns) + 100
+
+    def _resize(self, state: SessionState):
+        size = self._measure(state)
+        self._chars += size - state.size
+        state.size = size
+
+    def _drop(self, session_id: str) -> Optional[SessionState]:
+        state = self._sessions.pop(session_id, None)
+        if state is not None:
+            self._chars -= state.size
+        return state
+
+    def _enforce_limits(self):
+        while self._sessions and (len(self._sessions) > self.max_sessions or self._chars > self.max_chars):
+            session_id, state = next(iter(self._sessions.items()))
+            self._drop(session_id)
+            self.evictions += 1
+            self._spill_write(session_id, state)
+
+    def _get(self, session_id: str) -> Optional[SessionState]:
+        state = self._sessions.get(session_id)
+        if state is None:
+            return None
+        if time.monotonic() - state.last_used > self.ttl_seconds:
+            self._drop(session_id)
+            self.expirations += 1
+            return None
+        self._sessions.move_to_end(session_id)
+        state.last_used = time.monotonic()
+        return state
+
+    # --- public API ---
+    def history(self, session_id: str) -> List[dict]:
+        """Prompt history for a session: the summary (as one entry) followed by the recent turns."""
+        state = self._get(session_id)
+        if state is None:
+            return []
+        messages = [{"role": "summary", "content": state.summary}] if state.summary else []
+        for question, answer in state.turns:
+            messages.append({"role": "user", "content": question})
+            messages.append({"role": "assistant", "content": answer})
+        return messages
+
+    def last_question(self, session_id: str) -> Optional[str]:
+        state = self._sessions.get(session_id)
+        return state.turns[-1][0] if state and state.turns else None
+
+    def append(self, session_id: str, question: str, answer: str):
+        state = self._get(session_id)
+        if state is None:
+            state = SessionState(window=self.window)
+            self._sessions[session_id] = state
+        if len(state.turns) == self.window:
+            old_q, old_a = state.turns[0]
+            first = _SENTENCE_RE.split(old_a.strip(), 1)[0]
+            lines = (state.summary.split("\n") if state.summary else []) + [f"Q: {old_q[:120]} -> A: {first[:160]}"]
+            while lines and sum(len(l) + 1 for l in lines) > self.summary_chars:
+                lines.pop(0)
+            state.summary = "\n".join(lines)
+        state.turns.append((question, answer))
+        self._resize(state)
+        self._enforce_limits()
+
+    async def clear(self, session_id: str) -> bool:
+        found = self._drop(session_id) is not None
+        if self._spill is not None:
+            found = self._pending.pop(session_id, None) is not None or found
+            found = await asyncio.to_thread(self._spill_delete, session_id) or found
+        return found
+
+    def close(self):
+        """Spill every live session (so they survive a restart) and close the SQLite file. Blocks: run it in a thread."""
+        if self._spill is None:
+            return
+        for session_id, state in list(self._sessions.items()):
+            self._spill_write(session_id, state)
+        self._writes.put(None)
+        self._writer.join()
+        self._spill.close()
+        self._spill = None
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "chars": self._chars,
+            "max_chars": self.max_chars,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "spill_enabled": self._spill is not None,
+            "spill_queued": len(self._pending),
+            "spilled": self.spilled,
+            "restored": self.restored,
+        }
@@ -0,0 +1,94 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, Optional
+
+from app.services.intents import normalize_text
+from app.services.response_cache import normalize_query
+
+NORMALIZATIONS = ("exact", "text", "tokens")
+
+
+def coalesce_key(query: str, mode: str) -> Hashable:
+    """
+    What counts as "the same question":
+    - exact:  the question with whitespace collapsed
+    - text:   case, punctuation and stretched letters ignored ("Fees??" == "fees")
+    - tokens: the response cache key, sorted content words ("cse fees" == "fees of CSE please")
+    """
+    if mode == "exact":
+        return " ".join(query.split())
+    if mode == "text":
+        return normalize_text(query)
+    return normalize_query(query)
+
+
+class SingleFlight:
+    """
+    Deduplicates identical work that is already in flight. The first caller for a
+    key (the leader) starts the call; callers arriving before it finishes await the
+    same future instead of starting their own. The call runs in its own task, so a
+    caller that disconnects does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.max_waiters = 0
+
+    def join(self, key: Hashable) -> Optional[asyncio.Future]:
+        """The in-flight future for key (counted as a coalesced call), or None."""
+        future = self._calls.get(key)
+        if future is None:
+            return None
+        self.coalesced += 1
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        self.max_waiters = max(self.max_waiters, self._waiters[key])
+        return future
+
+    def begin(self, key: Hashable) -> asyncio.Future:
+        """Register the caller as leader for key; finish with end()."""
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self._waiters[key] = 0
+        self.leaders += 1
+        return future
+
+    def end(self, key: Hashable, future: asyncio.Future, result=None, error: Optional[BaseException] = None):
+        if self._calls.get(key) is future:
+            del self._calls[key]
+            self._waiters.pop(key, None)
+        if future.done():
+            return
+        if error is not None:
+            self.errors += 1
+            future.set_exception(error)
+            future.exception()  # mark retrieved: nobody may be waiting
+        else:
+            future.set_result(result)
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable]):
+        """Start fn() as the leader for key and wait for it."""
+        future = self.begin(key)
+        task = asyncio.ensure_future(fn())
+
+        def done(t: asyncio.Task):
+            if t.cancelled():
+                self.end(key, future, error=asyncio.CancelledError())
+            else:
+                self.end(key, future, t.result() if t.exception() is None else None, t.exception())
+
+        task.add_done_callback(done)
+        return await asyncio.shield(future)
+
+    def stats(self) -> dict:
+        total = self.leaders + self.coalesced
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / total, 4) if total else 0.0,
+            "max_waiters": self.max_waiters,
+            "errors": self.errors,
+        }
@@ -0,0 +1,85 @@
+import asyncio
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.services.telemetry import log
+
+
+class Startup:
+    """
+    Tracks how far the process is from serving at full speed.
+
+    The app accepts requests as soon as the knowledge base is loaded: the schema
+    migration and the warmup (importing LangChain and the provider SDKs, compiling
+    the prompt templates, opening the provider connections) run in the background.
+    A request that arrives before the warmup is done simply does that work itself.
+    /readyz reports the state, and can hold traffic back until the warmup is over
+    (READY_AFTER_WARMUP) for load balancers that route on readiness.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.ready_at: Optional[float] = None
+        self.migration: Optional[asyncio.Task] = None
+        self.warmup: Optional[asyncio.Task] = None
+        self.warmup_seconds: Optional[float] = None
+        self.warmup_error: Optional[str] = None
+        self.connections: dict = {}
+        self.stopping = False
+
+    def begin(self, rag) -> None:
+        """Called from the app lifespan once the knowledge base has loaded."""
+        from app.db.migrations import migrate
+        # SQLAlchemy is first imported in this thread, not on the startup path
+        self.migration = asyncio.create_task(asyncio.to_thread(migrate))
+        self.ready_at = time.monotonic()
+        log(f"Startup: accepting requests after {self.ready_at - self.started:.2f}s")
+        if settings.WARMUP_ON_START:
+            self.warmup = asyncio.create_task(self._warm(rag))
+
+    async def _warm(self, rag):
+        began = time.monotonic()
+        try:
+            await asyncio.wait_for(self._warm_steps(rag), settings.WARMUP_TIMEOUT_SECONDS)
+        except Exception as e:
+            self.warmup_error = f"{type(e).__name__}: {e}"[:200]
+            log(f"Startup: warmup incomplete ({self.warmup_error})")
+        self.warmup_seconds = time.monotonic() - began
+        log(f"Startup: warmup finished in {self.warmup_seconds:.2f}s {self.connections}")
+
+    @staticmethod
+    def _import_and_compile(rag):
+        from langchain_core.output_parsers import StrOutputParser  # noqa: F401
+        rag.prompts
+        rag.registry.providers
+
+    async def _warm_steps(self, rag):
+        await asyncio.to_thread(self._import_and_compile, rag)
+        self.connections = await rag.registry.preconnect(settings.WARMUP_TIMEOUT_SECONDS)
+
+    @property
+    def warm(self) -> bool:
+        return self.warmup is None or self.warmup.done()
+
+    def status(self, kb_loaded: bool) -> dict:
+        """Readiness plus the details behind it, served by /readyz (/healthz is plain liveness)."""
+        migration = "pending"
+        if self.migration is not None and self.migration.done():
+            error = self.migration.exception()
+            migration = f"failed: {error}" if error else f"version {self.migration.result()}"
+        ready = (kb_loaded and self.ready_at is not None and not self.stopping
+                 and (self.warm or not settings.READY_AFTER_WARMUP))
+        return {
+            "ready": ready,
+            "knowledge_base": "loaded" if kb_loaded else "loading",
+            "database": migration,
+            "warmup": "disabled" if not settings.WARMUP_ON_START else
+                      "running" if not self.warm else self.warmup_error or "done",
+            "providers": self.connections,
+            "startup_seconds": round(self.ready_at - self.started, 3) if self.ready_at else None,
+            "warmup_seconds": round(self.warmup_seconds, 3) if self.warmup_seconds is not None else None,
+        }
+
+
+startup = Startup()
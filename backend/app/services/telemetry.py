@@ -0,0 +1,272 @@
+import atexit
+import bisect
+import contextvars
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+
+# --- logging -----------------------------------------------------------------
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never blocks the caller: when the queue is full the line is dropped and counted."""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+    def prepare(self, record):
+        # The message is already a finished string, skip QueueHandler's copy/format work
+        return record
+
+
+_log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_MAX)
+_stdout = logging.StreamHandler(sys.stdout)
+_stdout.setFormatter(logging.Formatter("%(message)s"))
+_listener = logging.handlers.QueueListener(_log_queue, _stdout)
+_logger = logging.getLogger("kpgu")
+_logger.setLevel(logging.INFO)
+_logger.propagate = False
+_logger.addHandler(_DroppingQueueHandler(_log_queue))
+_listener.start()
+
+
+def log(message: str):
+    """print() replacement for the request path: the line is written to stdout by a background thread."""
+    _logger.info(message)
+
+
+def dropped_log_lines() -> int:
+    return _DroppingQueueHandler.dropped
+
+
+def stop_logging():
+    """Flush queued log lines (called on shutdown; safe to call twice)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+# --- metrics -----------------------------------------------------------------
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_label_text(self.labels, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Sequence[float], labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self.series: Dict[Tuple[str, ...], list] = {}  # key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [0] * len(self.buckets) + [0.0, 0]
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="%g"' % bound
+                lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {series[-1]}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {series[-2]:g}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, key)} {series[-1]}")
+        return lines
+
+
+class Metrics:
+    """The service's metrics, rendered in the Prometheus text exposition format by GET /metrics."""
+
+    def __init__(self):
+        self.request_seconds = Histogram("kpgu_request_seconds", "End-to-end chat request latency.",
+                                         LATENCY_BUCKETS, ("endpoint", "outcome"))
+        self.stage_seconds = Histogram("kpgu_stage_seconds", "Latency of each request stage (trace span).",
+                                       LATENCY_BUCKETS, ("stage",))
+        self.provider_seconds = Histogram("kpgu_provider_seconds", "Latency of one LLM provider attempt.",
+                                          LATENCY_BUCKETS, ("provider", "result"))
+        self.prompt_tokens = Histogram("kpgu_prompt_tokens", "Prompt tokens sent per provider call.",
+                                       TOKEN_BUCKETS, ("provider",))
+        self.completion_tokens = Histogram("kpgu_completion_tokens", "Estimated tokens per generated answer.",
+                                           TOKEN_BUCKETS, ("provider",))
+        self.cache_lookups = Counter("kpgu_cache_lookups_total", "Response cache lookups.", ("result",))
+        self.fast_path = Counter("kpgu_fast_path_total", "Questions answered from the intent table.")
+        self.fact_lookups = Counter("kpgu_fact_lookups_total", "Questions answered from the compiled fact store.")
+        self.coalesced = Counter("kpgu_coalesced_total", "Requests that shared an identical in-flight LLM call.",
+                                 ("endpoint",))
+        self.failovers = Counter("kpgu_failovers_total", "Times a request moved on to another provider.", ("reason",))
+        self.provider_errors = Counter("kpgu_provider_errors_total", "Failed provider attempts.", ("provider", "kind"))
+        self.history_write_seconds = Histogram("kpgu_history_write_seconds", "Chat history batch insert latency.",
+                                               LATENCY_BUCKETS)
+        self.admission_wait_seconds = Histogram("kpgu_admission_wait_seconds",
+                                                "Time a question queued for an LLM slot.", LATENCY_BUCKETS)
+        self.admission_rejected = Counter("kpgu_admission_rejected_total",
+                                          "Requests shed with 429 / 503 before reaching a provider.", ("reason",))
+        self._all = [self.request_seconds, self.stage_seconds, self.provider_seconds, self.prompt_tokens,
+                     self.completion_tokens, self.cache_lookups, self.fast_path, self.fact_lookups,
+                     self.coalesced, self.failovers, self.provider_errors, self.history_write_seconds,
+                     self.admission_wait_seconds, self.admission_rejected]
+
+    def render(self, gauges: Optional[Dict[str, Tuple[str, float]]] = None) -> str:
+        lines = []
+        for metric in self._all:
+            lines.extend(metric.render())
+        for name, (help, value) in (gauges or {}).items():
+            lines.extend([f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {value:g}"])
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+# --- tracing -----------------------------------------------------------------
+
+class Trace:
+    """
+    Spans of one chat request. A span is (name, start offset, duration, attributes);
+    spans opened in tasks started by the request (hedged provider attempts) land in
+    the same trace because the context variable is inherited by the task.
+    """
+
+    def __init__(self, endpoint: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.endpoint = endpoint
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.spans: List[Tuple[str, float, float, dict]] = []
+        self.outcome = "llm"
+        self.duration: Optional[float] = None
+
+    def add(self, name: str, start: float, duration: float, attrs: dict):
+        self.spans.append((name, start - self._t0, duration, attrs))
+        metrics.stage_seconds.observe(duration, stage=name)
+
+    def finish(self):
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._t0
+        metrics.request_seconds.observe(self.duration, endpoint=self.endpoint, outcome=self.outcome)
+        recent_traces.append(self)
+        if settings.TRACE_LOG:
+            stages = " ".join(f"{name}={d * 1000:.1f}" for name, _, d, _ in self.spans)
+            log(f"TRACE {self.id} {self.endpoint} {self.outcome} {self.duration * 1000:.1f}ms | {stages}")
+
+    def history_fields(self) -> dict:
+        """Provider, outcome and latency so far, stored with the chat history row."""
+        provider = next((attrs.get("provider") for name, _, _, attrs in self.spans
+                         if name == "provider" and attrs.get("result") == "ok"), None)
+        return {
+            "provider": provider,
+            "outcome": self.outcome,
+            "latency_ms": round((time.perf_counter() - self._t0) * 1000, 1),
+        }
+
+    def as_dict(self) -> dict:
+        return {
+            "trace_id": self.id,
+            "endpoint": self.endpoint,
+            "outcome": self.outcome,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 2) if self.duration is not None else None,
+            "spans": [
+                {"name": name, "start_ms": round(start * 1000, 2), "duration_ms": round(d * 1000, 2), **attrs}
+                for name, start, d, attrs in self.spans
+            ],
+        }
+
+
+recent_traces: deque = deque(maxlen=settings.TRACE_BUFFER)
+_current: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("kpgu_trace", default=None)
+
+
+def start_trace(endpoint: str) -> Trace:
+    trace = Trace(endpoint)
+    _current.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+def set_outcome(outcome: str):
+    """How the current request was answered: llm, fast_path, fact, cache, busy, shed, rate_limited, empty, ..."""
+    trace = _current.get()
+    if trace is not None:
+        trace.outcome = outcome
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Time a block as a span of the current request (no-op outside a request).
+    The yielded dict can be filled with attributes while the block runs.
+    """
+    trace = _current.get()
+    started = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        if trace is not None:
+            trace.add(name, started, time.perf_counter() - started, attrs)
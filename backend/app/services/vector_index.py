@@ -0,0 +1,158 @@
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class NumpyVectorIndex:
+    """
+    Minimal on-disk vector store: float16 rows appended to a raw file that is
+    memory-mapped for search, plus a JSON sidecar with ids, texts and metadata.
+    Vectors are L2-normalized, so a single matmul gives cosine scores.
+
+    Deletes and upserts leave tombstoned rows behind; compact() rewrites the
+    matrix without them (ingestion calls it once at the end of a run).
+    """
+
+    SEARCH_BLOCK_ROWS = 65536
+
+    def __init__(self, directory: str, dim: Optional[int] = None, use_idf: bool = False):
+        self.directory = directory
+        self.vectors_path = os.path.join(directory, "vectors.f16")
+        self.meta_path = os.path.join(directory, "index.json")
+        os.makedirs(directory, exist_ok=True)
+
+        self.dim = dim
+        self.use_idf = use_idf
+        self.rows: List[Optional[dict]] = []  # None = tombstone
+        self.id_to_row: Dict[str, int] = {}
+        self.df: Optional[np.ndarray] = None
+        self._mm: Optional[np.memmap] = None
+        self._mm_rows = 0
+
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            self.dim = meta["dim"]
+            self.use_idf = meta.get("use_idf", False)
+            self.rows = meta["rows"]
+            if meta.get("df") is not None:
+                self.df = np.asarray(meta["df"], dtype=np.float64)
+            self.id_to_row = {r["id"]: i for i, r in enumerate(self.rows) if r is not None}
+            # Rows appended after the last save() have no metadata: drop them
+            self._truncate_vectors(len(self.rows))
+
+    # --- bookkeeping ---
+    def _truncate_vectors(self, n_rows: int):
+        if not self.dim:
+            return
+        expected = n_rows * self.dim * 2
+        if os.path.exists(self.vectors_path) and os.path.getsize(self.vectors_path) != expected:
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(expected)
+
+    def _matrix(self) -> np.ndarray:
+        n = len(self.rows)
+        if n == 0:
+            return np.zeros((0, self.dim or 0), dtype=np.float16)
+        if self._mm is None or self._mm_rows != n:
+            self._mm = np.memmap(self.vectors_path, dtype=np.float16, mode="r", shape=(n, self.dim))
+            self._mm_rows = n
+        return self._mm
+
+    def _update_df(self, vectors: np.ndarray, sign: int):
+        if not self.use_idf:
+            return
+        if self.df is None:
+            self.df = np.zeros(self.dim, dtype=np.float64)
+        self.df += sign * (vectors != 0).sum(axis=0)
+
+    def count(self) -> int:
+        return len(self.id_to_row)
+
+    # --- writes ---
+    def delete(self, ids: List[str]):
+        dead = [self.id_to_row.pop(i) for i in ids if i in self.id_to_row]
+        if not dead:
+            return
+        if self.use_idf:
+            self._update_df(np.asarray(self._matrix()[sorted(dead)], dtype=np.float32), -1)
+        for row in dead:
+            self.rows[row] = None
+
+    def upsert(self, ids: List[str], embeddings, documents: List[str], metadatas: Optional[List[dict]] = None):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Vector dim {vectors.shape[1]} != index dim {self.dim}")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+
+        self.delete(ids)
+        with open(self.vectors_path, "ab") as f:
+            f.write(vectors.astype(np.float16).tobytes())
+        metadatas = metadatas or [{}] * len(ids)
+        for cid, text, meta in zip(ids, documents, metadatas):
+            self.id_to_row[cid] = len(self.rows)
+            self.rows.append({"id": cid, "text": text, "metadata": meta})
+        self._update_df(vectors, +1)
+
+    def reset(self):
+        self.rows, self.id_to_row, self.df, self._mm = [], {}, None, None
+        if os.path.exists(self.vectors_path):
+            os.remove(self.vectors_path)
+        self.save()
+
+    def compact(self):
+        """Rewrite the matrix without tombstoned rows."""
+        live = [i for i, r in enumerate(self.rows) if r is not None]
+        if len(live) == len(self.rows):
+            return
+        matrix = np.asarray(self._matrix()[live]) if live else np.zeros((0, self.dim), dtype=np.float16)
+        self._mm = None
+        tmp = self.vectors_path + ".tmp"
+        matrix.tofile(tmp)
+        os.replace(tmp, self.vectors_path)
+        self.rows = [self.rows[i] for i in live]
+        self.id_to_row = {r["id"]: i for i, r in enumerate(self.rows)}
+        self.save()
+
+    def save(self):
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "dim": self.dim,
+                "use_idf": self.use_idf,
+                "df": self.df.tolist() if self.df is not None else None,
+                "rows": self.rows,
+            }, f, ensure_ascii=False)
+        os.replace(tmp, self.meta_path)
+
+    # --- search ---
+    def search(self, query_vector, k: int = 4) -> List[Tuple[dict, float]]:
+        """Top-k (row, cosine score) pairs for one query vector."""
+        if not self.id_to_row:
+            return []
+        q = np.asarray(query_vector, dtype=np.float32)
+        if self.use_idf and self.df is not None:
+            n = max(self.count(), 1)
+            q = q * (np.log((1 + n) / (1 + np.maximum(self.df, 0))) + 1).astype(np.float32)
+        norm = np.linalg.norm(q)
+        if norm:
+            q /= norm
+
+        # float16 rows are upcast block by block so memory stays bounded; for any
+        # realistic corpus this is a single matmul over the whole matrix
+        matrix = self._matrix()
+        scores = np.empty(len(self.rows), dtype=np.float32)
+        for start in range(0, len(self.rows), self.SEARCH_BLOCK_ROWS):
+            block = matrix[start:start + self.SEARCH_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ q
+        if len(self.id_to_row) != len(self.rows):
+            scores[[i for i, r in enumerate(self.rows) if r is None]] = -np.inf
+        k = min(k, len(self.id_to_row))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.rows[i], float(scores[i])) for i in top]
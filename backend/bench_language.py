@@ -0,0 +1,128 @@
+"""
+Accuracy check + micro-benchmark for the language detector.
+Run from the backend folder:  python bench_language.py
+No server or API keys needed.
+"""
+import re
+import sys
+import timeit
+
+from app.services.language import detect_language, response_language, HINDI, GUJARATI, ENGLISH
+
+# Labeled queries collected from test_hinglish.py, test_iso_language.py,
+# test_multilingual.py, quick_test.py and test_full_suite.py
+LABELED_QUERIES = [
+    # test_hinglish.py
+    ("kya ap muje IT course ke bareme bata sakte hai ?", HINDI),
+    ("fees kitni hai", HINDI),
+    ("su chale che", GUJARATI),
+    # test_iso_language.py
+    ("Fees kitni hai?", HINDI),
+    ("Admission process su che?", GUJARATI),
+    ("Tell me about the campus.", ENGLISH),
+    # test_multilingual.py
+    ("Namaste", HINDI),
+    ("What is the fee for B.Tech?", ENGLISH),
+    ("Kem cho?", GUJARATI),
+    # quick_test.py
+    ("What are the fees for B.Tech CSE?", ENGLISH),
+    ("Tell me about placement", ENGLISH),
+    ("B.Tech ki fees kitni hai?", HINDI),
+    ("kese ho bhai?", HINDI),
+    ("fees ketla che?", GUJARATI),
+    ("placement pachhi salary ketla?", GUJARATI),
+    # verify_lang.py
+    ("Graduate course pachhi placement nu", GUJARATI),
+    ("fees kya hai", HINDI),
+    ("How are you?", ENGLISH),
+    # test_full_suite.py (native script + English)
+    ("What is the fee structure for B.Tech CSE?", ENGLISH),
+    ("Where is the university located and how can I contact them?", ENGLISH),
+    ("Are there any scholarships available for Gujarat students?", ENGLISH),
+    ("What is the attendance rule for students?", ENGLISH),
+    ("बी.टेक सीएसई की फीस संरचना क्या है?", HINDI),
+    ("छात्रों के लिए उपस्थिति (attendance) का नियम क्या है?", HINDI),
+    ("बी.ए.एम.एस. (B.A.M.S.) कोर्स में प्रवेश कैसे मिल सकता है?", HINDI),
+    ("B.Tech CSE માટે ફીનું માળખું શું છે?", GUJARATI),
+    ("KPGU માં કયા એન્જિનિયરિંગ કોર્સ ઉપલબ્ધ છે?", GUJARATI),
+    ("વિદ્યાર્થીઓ માટે હાજરીનો નિયમ શું છે?", GUJARATI),
+    # Short Romanized follow-ups
+    ("hostel kab milta hai", HINDI),
+    ("hostel ni fees ketli che", GUJARATI),
+    ("Is hostel available for girls?", ENGLISH),
+    ("MBA eligibility", ENGLISH),
+    ("fees kitni", HINDI),
+    ("hostel kab", HINDI),
+]
+
+SAMPLE_RESPONSES = [
+    ("B.Tech CSE ની વાર્ષિક ફી આશરે ₹1,20,000 - ₹1,30,000 છે. કુલ ફી ₹4.8 થી ₹5.2 લાખ છે. 🎓" * 4, "gu"),
+    ("बी.टेक सीएसई की वार्षिक फीस लगभग ₹1,20,000 - ₹1,30,000 है। कुल फीस ₹4.8 से ₹5.2 लाख है। 🎓" * 4, "hi"),
+    ("The annual fee for B.Tech CSE is approximately ₹1,20,000 - ₹1,30,000 (total ₹4.8 - 5.2 Lakhs). 🎓" * 4, "en"),
+]
+
+
+def legacy_detect_language(query):
+    """Copy of the previous RAGService._detect_language, kept as the benchmark baseline."""
+    q = query.lower().strip()
+    q_clean = re.sub(r'[^\w\s]', '', q)
+    if any(0x0900 <= ord(c) <= 0x097F for c in query):
+        return HINDI
+    if any(0x0A80 <= ord(c) <= 0x0AFF for c in query):
+        return GUJARATI
+    words = q_clean.split()
+    guj_strong = ["pachhi","shun","che","kyare","ketla","nu","kem","kevu","tamaru","mari","ane","mane","ena","vishe","samjay","su","aapo","mate","joiye","karvu","thase"]
+    if sum(1 for w in words if w in guj_strong) >= 1:
+        return GUJARATI
+    hin_strong = ["kese","kaise","kya","kitna","kitni","kaun","kab","kahan",
+                  "bhai","aap","batao","hain","hai","ho","padhai","vibhag",
+                  "karo","milta","milti","mein","ki","ka","ke","nahi"]
+    if sum(1 for w in words if w in hin_strong) >= 2:
+        return HINDI
+    return ENGLISH
+
+
+def legacy_response_language(result):
+    gu = sum(1 for c in result if 0x0A80 <= ord(c) <= 0x0AFF)
+    hi = sum(1 for c in result if 0x0900 <= ord(c) <= 0x097F)
+    return "gu" if gu > 10 else "hi" if hi > 10 else "en"
+
+
+def accuracy(fn):
+    misses = [(q, exp, fn(q)) for q, exp in LABELED_QUERIES if fn(q) != exp]
+    return 1 - len(misses) / len(LABELED_QUERIES), misses
+
+
+def bench(fn, inputs, number):
+    total = timeit.timeit(lambda: [fn(x) for x in inputs], number=number)
+    return total / (number * len(inputs)) * 1e6  # microseconds per call
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("LANGUAGE DETECTOR - ACCURACY")
+    print("=" * 60)
+    for name, fn in (("legacy", legacy_detect_language), ("compiled", detect_language)):
+        acc, misses = accuracy(fn)
+        print(f"{name:9s}: {acc:.1%} ({len(LABELED_QUERIES) - len(misses)}/{len(LABELED_QUERIES)})")
+        for q, exp, got in misses:
+            print(f"    MISS '{q}' expected={exp} got={got}")
+
+    bad = [exp for text, exp in SAMPLE_RESPONSES if response_language(text) != exp]
+    print(f"response script tags: {'OK' if not bad else 'WRONG ' + str(bad)}")
+
+    print("\n" + "=" * 60)
+    print("LANGUAGE DETECTOR - THROUGHPUT (us per call)")
+    print("=" * 60)
+    queries = [q for q, _ in LABELED_QUERIES]
+    responses = [t for t, _ in SAMPLE_RESPONSES]
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    for label, old, new, inputs in (
+        ("query detection", legacy_detect_language, detect_language, queries),
+        ("response script", legacy_response_language, response_language, responses),
+    ):
+        t_old, t_new = bench(old, inputs, n), bench(new, inputs, n)
+        print(f"{label:16s}: legacy {t_old:7.2f} us | compiled {t_new:7.2f} us | {t_old / t_new:4.1f}x")
+
+    acc, _ = accuracy(detect_language)
+    sys.exit(0 if acc == 1.0 and not bad else 1)
@@ -0,0 +1,449 @@
+"""
+Offline load test for the chat API.
+
+Drives the FastAPI app in-process (httpx ASGI transport, no server, no API keys)
+with stub LLM providers that have configurable latency, token rate and failure
+rate, and measures throughput, p50/p95/p99 latency, event-loop lag and memory
+per scenario:
+
+    fast_path   greetings and top FAQs answered from the intent table
+    cache_hit   one question repeated (answered from the response cache)
+    llm         distinct questions through a healthy provider
+    failover    the first provider fails every call, the second answers
+    streaming   POST /chat/stream through a healthy provider
+    burst       everyone asks the same uncached question (request coalescing)
+
+Run from the backend folder:
+    python bench_load.py                                   # all scenarios, results in bench_results.json
+    python bench_load.py --scenarios llm,streaming --concurrency 64 --requests 1000
+    python bench_load.py --profile slow --out today.json --baseline bench_results.json
+
+With --baseline the run is compared to an earlier result file and the exit code
+is 1 when a scenario's p95 or throughput got worse by more than --tolerance.
+The benchmark works in a temporary directory, so the real chat history database
+and .env keys are never touched.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+LAUNCH_DIR = os.getcwd()
+
+# Offline: no keys, no .env, chat history goes to a throwaway SQLite file
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ["GROQ_API_KEY"] = ""
+os.environ["GOOGLE_API_KEY"] = ""
+os.environ["SHARED_STATE_DIR"] = ""
+os.environ["KB_WATCH_SECONDS"] = "0"
+os.environ.setdefault("PROVIDER_HEDGE_MODE", "off")
+# Every simulated user comes from the same in-process client address: per-client
+# limits would shed the benchmark itself (the global admission gate stays on)
+os.environ.setdefault("CLIENT_RATE_LIMIT_PER_IP", "0")
+os.environ.setdefault("CLIENT_RATE_LIMIT_PER_SESSION", "0")
+os.environ.setdefault("ADMISSION_MAX_PER_CLIENT", "0")
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(tempfile.mkdtemp(prefix="kpgu-bench-"))
+
+import httpx  # noqa: E402
+from langchain_core.language_models.chat_models import BaseChatModel  # noqa: E402
+from langchain_core.messages import AIMessage, AIMessageChunk  # noqa: E402
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult  # noqa: E402
+
+import main  # noqa: E402
+from app.db.migrations import migrate  # noqa: E402
+from app.db.database import engine  # noqa: E402
+from app.services.history_writer import history_writer  # noqa: E402
+from app.services.providers import LatencyTracker, ProviderHealth  # noqa: E402
+from app.services.rag_service import rag_service  # noqa: E402
+from app.services.rate_limiter import RateLimiter  # noqa: E402
+from app.core.config import settings  # noqa: E402
+
+# name -> (first token latency s, tokens per second, failure rate, answer tokens)
+PROFILES = {
+    "fast": (0.05, 400.0, 0.0, 60),
+    "typical": (0.4, 150.0, 0.0, 120),
+    "slow": (1.5, 40.0, 0.0, 200),
+    "flaky": (0.4, 150.0, 0.3, 120),
+    "down": (0.05, 150.0, 1.0, 0),
+}
+
+QUESTIONS = [
+    "What is the fee structure for B.Tech CSE?",
+    "Tell me about the campus facilities and hostel details.",
+    "What are the eligibility criteria for MBA?",
+    "Who are the top recruiters visiting the campus?",
+    "Are there any scholarships available for Gujarat students?",
+    "What is the attendance rule for students?",
+    "How can I get admission to the B.A.M.S. course?",
+    "बी.टेक सीएसई की फीस संरचना क्या है?",
+    "KPGU માં સરેરાશ અને ઉચ્ચતમ પ્લેસમેન્ટ પેકેજ શું છે?",
+    "B.Tech ki fees kitni hai?",
+]
+GREETINGS = ["hello", "hi", "namaste", "kem cho", "thanks", "thank you so much", "dhanyavad", "fees", "contact number"]
+ANSWER_WORDS = "KPGU offers this programme with experienced faculty modern labs and strong placement support".split()
+
+
+class StubChatModel(BaseChatModel):
+    """Offline stand-in for Groq/Gemini: sleeps like a real provider and can fail on purpose."""
+
+    latency: float = 0.4
+    tokens_per_second: float = 150.0
+    failure_rate: float = 0.0
+    answer_tokens: int = 120
+    seed: int = 0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _answer(self) -> List[str]:
+        return [ANSWER_WORDS[i % len(ANSWER_WORDS)] + " " for i in range(max(self.answer_tokens, 1))]
+
+    def _should_fail(self) -> bool:
+        self.calls += 1
+        return random.Random(self.seed * 1_000_003 + self.calls).random() < self.failure_rate
+
+    @staticmethod
+    def _result(tokens: List[str]) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        if self._should_fail():
+            raise RuntimeError("503 UNAVAILABLE (stub)")
+        tokens = self._answer()
+        time.sleep(len(tokens) / self.tokens_per_second)
+        return self._result(tokens)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        if self._should_fail():
+            raise RuntimeError("503 UNAVAILABLE (stub)")
+        tokens = self._answer()
+        await asyncio.sleep(len(tokens) / self.tokens_per_second)
+        return self._result(tokens)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        if self._should_fail():
+            raise RuntimeError("503 UNAVAILABLE (stub)")
+        delay = 1.0 / self.tokens_per_second
+        for token in self._answer():
+            await asyncio.sleep(delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+def stub(profile: str, seed: int) -> StubChatModel:
+    latency, tps, failure_rate, tokens = PROFILES[profile]
+    return StubChatModel(latency=latency, tokens_per_second=tps, failure_rate=failure_rate,
+                         answer_tokens=tokens, seed=seed)
+
+
+def install_providers(spec: List[tuple]):
+    """spec: [(name, profile)] in priority order. Fresh health, latency and (generous) rate limits."""
+    registry = rag_service.registry
+    registry._providers = [(name, stub(profile, seed)) for seed, (name, profile) in enumerate(spec)]
+    for name, _ in spec:
+        registry.health[name] = ProviderHealth(settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_OPEN_SECONDS)
+        registry.latency[name] = LatencyTracker()
+    registry.limiter = RateLimiter({name: (1_000_000, 1_000_000_000) for name, _ in spec},
+                                   settings.RATE_LIMIT_MAX_WAIT_SECONDS, settings.RATE_LIMIT_QUEUE_MAX)
+
+
+def reset_cache():
+    rag_service.cache = rag_service._build_cache() if settings.CACHE_ENABLED else None
+
+
+def llm_calls() -> int:
+    return sum(getattr(llm, "calls", 0) for _, llm in rag_service.registry.providers)
+
+
+def rss_mb() -> Optional[float]:
+    """Resident set size (Linux /proc, else peak RSS from resource, else None on Windows)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+    except ImportError:
+        return None
+
+
+def percentiles(samples: List[float]) -> Dict[str, Optional[float]]:
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None, "max": None, "mean": None}
+    ordered = sorted(samples)
+
+    def pick(p):
+        return round(ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000, 2)
+
+    return {"p50": pick(50), "p95": pick(95), "p99": pick(99),
+            "max": round(ordered[-1] * 1000, 2), "mean": round(statistics.fmean(ordered) * 1000, 2)}
+
+
+class LoopLagMonitor:
+    """Samples how late a short sleep wakes up; lag means something blocked the event loop."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+        self._sleeping_since = 0.0
+
+    async def _run(self):
+        while True:
+            self._sleeping_since = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - self._sleeping_since - self.interval))
+
+    def __enter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        # A sleep that never woke up before the end is the worst lag of all, count it
+        overdue = time.perf_counter() - self._sleeping_since - self.interval
+        if overdue > 0:
+            self.samples.append(overdue)
+        self._task.cancel()
+
+
+# --- scenarios ---------------------------------------------------------------
+# Each returns (setup coroutine, request factory). A request is (path, json body).
+
+def scenario_fast_path(args):
+    async def setup():
+        install_providers([("Groq", args.profile)])
+    return setup, lambda i: ("/api/v1/chat/", {"query": GREETINGS[i % len(GREETINGS)]})
+
+
+def scenario_cache_hit(args):
+    question = QUESTIONS[0]
+
+    async def setup():
+        install_providers([("Groq", args.profile)])
+        reset_cache()
+        async with client() as c:
+            await c.post("/api/v1/chat/", json={"query": question})
+    return setup, lambda i: ("/api/v1/chat/", {"query": question})
+
+
+def _distinct(i: int) -> str:
+    # Distinct enough that the fuzzy cache never matches two requests
+    return f"{QUESTIONS[i % len(QUESTIONS)]} (ref {i} {i * 7919 % 10007})"
+
+
+def scenario_llm(args):
+    async def setup():
+        install_providers([("Groq", args.profile), ("Gemini-1", args.profile)])
+        rag_service.cache = None
+    return setup, lambda i: ("/api/v1/chat/", {"query": _distinct(i)})
+
+
+def scenario_failover(args):
+    async def setup():
+        install_providers([("Groq", "down"), ("Gemini-1", args.profile)])
+        rag_service.cache = None
+    return setup, lambda i: ("/api/v1/chat/", {"query": _distinct(i)})
+
+
+def scenario_streaming(args):
+    async def setup():
+        install_providers([("Groq", args.profile), ("Gemini-1", args.profile)])
+        rag_service.cache = None
+    return setup, lambda i: ("/api/v1/chat/stream", {"query": _distinct(i)})
+
+
+def scenario_burst(args):
+    async def setup():
+        install_providers([("Groq", args.profile), ("Gemini-1", args.profile)])
+        rag_service.cache = None
+    # A new question every `concurrency` requests, each asked by a whole wave of clients
+    return setup, lambda i: ("/api/v1/chat/", {"query": _distinct(i // args.concurrency)})
+
+
+SCENARIOS = {
+    "fast_path": scenario_fast_path,
+    "cache_hit": scenario_cache_hit,
+    "llm": scenario_llm,
+    "failover": scenario_failover,
+    "streaming": scenario_streaming,
+    "burst": scenario_burst,
+}
+
+
+def client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=120.0)
+
+
+def classify(path: str, status: int, body: str) -> str:
+    if status != 200:
+        return f"http_{status}"
+    if path.endswith("/stream"):
+        if "event: error" in body:
+            return "interrupted"
+        return "busy" if "⚠️" in body else "ok"
+    return "busy" if json.loads(body).get("response", "").startswith("⚠️") else "ok"
+
+
+async def run_scenario(name: str, args) -> Dict[str, Any]:
+    setup, make_request = SCENARIOS[name](args)
+    await setup()
+    latencies: List[float] = []
+    outcomes: Counter = Counter()
+    counter = iter(range(args.requests))
+
+    async def worker(c: httpx.AsyncClient):
+        for i in counter:
+            path, body = make_request(i)
+            started = time.perf_counter()
+            try:
+                response = await c.post(path, json=body)
+                outcomes[classify(path, response.status_code, response.text)] += 1
+            except Exception as e:
+                outcomes[f"exception:{type(e).__name__}"] += 1
+            latencies.append(time.perf_counter() - started)
+            # A real client waits on its socket here; without it a request that never
+            # suspends (fast path, cache hit) would let one worker run the whole batch
+            await asyncio.sleep(0)
+
+    # Warm-up (lazy imports, first DB connection) is not measured
+    async with client() as c:
+        for j in range(args.warmup):
+            path, body = make_request(args.requests + j)
+            await c.post(path, json=body)
+
+    calls_before = llm_calls()
+    if args.tracemalloc:
+        tracemalloc.start()
+    rss_before = rss_mb()
+    async with client() as c:
+        with LoopLagMonitor() as lag:
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(c) for _ in range(args.concurrency)))
+            duration = time.perf_counter() - started
+    peak = None
+    if args.tracemalloc:
+        peak = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        tracemalloc.stop()
+
+    ok = outcomes.get("ok", 0)
+    return {
+        "requests": len(latencies),
+        "concurrency": args.concurrency,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 1) if duration else None,
+        "success_rate": round(ok / len(latencies), 4) if latencies else None,
+        "llm_calls": llm_calls() - calls_before,
+        "outcomes": dict(outcomes),
+        "latency_ms": percentiles(latencies),
+        "loop_lag_ms": percentiles(lag.samples),
+        "memory_mb": {"rss_before": rss_before, "rss_after": rss_mb(), "tracemalloc_peak": peak},
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Regressions against an earlier run: p95 latency up or throughput down by more than tolerance."""
+    problems = []
+    for name, now in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        p95_now, p95_before = now["latency_ms"]["p95"], before["latency_ms"]["p95"]
+        if p95_now and p95_before and p95_now > p95_before * (1 + tolerance):
+            problems.append(f"{name}: p95 {p95_before} -> {p95_now} ms")
+        rps_now, rps_before = now["throughput_rps"], before["throughput_rps"]
+        if rps_now and rps_before and rps_now < rps_before * (1 - tolerance):
+            problems.append(f"{name}: throughput {rps_before} -> {rps_now} req/s")
+    return problems
+
+
+async def main_async(args) -> dict:
+    migrate(engine)
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "profile": args.profile,
+            "profile_params": dict(zip(("latency_s", "tokens_per_second", "failure_rate", "answer_tokens"),
+                                       PROFILES[args.profile])),
+            "concurrency": args.concurrency,
+            "requests_per_scenario": args.requests,
+            "warmup": args.warmup,
+            "hedge_mode": settings.PROVIDER_HEDGE_MODE,
+        },
+        "scenarios": {},
+    }
+    for name in args.scenarios:
+        print(f"Running {name} ({args.requests} requests, concurrency {args.concurrency})...")
+        r = await run_scenario(name, args)
+        results["scenarios"][name] = r
+        lat = r["latency_ms"]
+        print(f"  {r['throughput_rps']} req/s | p50 {lat['p50']} p95 {lat['p95']} p99 {lat['p99']} ms | "
+              f"loop lag p99 {r['loop_lag_ms']['p99']} ms | {r['llm_calls']} LLM calls | outcomes {r['outcomes']}")
+    await history_writer.stop()
+    await rag_service.registry.aclose()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline load test for the KPGU chat API.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=300, help="requests per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests before each scenario")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="typical", help="stub provider profile")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report the Python heap peak (slower)")
+    parser.add_argument("--verbose", action="store_true", help="show the service's per-request log lines")
+    parser.add_argument("--out", default=os.path.join(BACKEND_DIR, "bench_results.json"))
+    parser.add_argument("--baseline", help="earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression (0.2 = 20%%)")
+    args = parser.parse_args()
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in args.scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    args.out = os.path.join(LAUNCH_DIR, args.out)
+    if not args.verbose:
+        logging.getLogger("kpgu").setLevel(logging.WARNING)
+
+    results = asyncio.run(main_async(args))
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"Results written to {args.out}")
+
+    if args.baseline:
+        with open(os.path.join(LAUNCH_DIR, args.baseline), "r", encoding="utf-8") as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        for line in problems:
+            print(f"REGRESSION {line}")
+        sys.exit(1 if problems else 0)
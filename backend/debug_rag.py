@@ -1,6 +1,5 @@
-from langchain_chroma import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from app.core.config import settings
+from app.services.embeddings import get_embeddings, resolve_embedding_backend
 import sys
 
 # Force load settings
@@ -9,38 +8,49 @@ load_dotenv()
 
 def debug_retrieval(query):
     print(f"--- Debugging Query: '{query}' ---")
-    
-    # Setup Embeddings (Gemini)
-    if not settings.GOOGLE_API_KEY or "placeholder" in settings.GOOGLE_API_KEY:
-        print("ERROR: Google API Key missing.")
-        return
+
+    backend = resolve_embedding_backend()
+    print(f"Embedding backend: {backend} | Vector store: {settings.VECTOR_STORE}")
 
     try:
-        embeddings = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001", google_api_key=settings.GOOGLE_API_KEY)
-        
-        # Connect to DB
-        vector_store = Chroma(
-            persist_directory=settings.CHROMA_DB_DIR,
-            embedding_function=embeddings
-        )
-        
-        # Check Count
-        count = vector_store._collection.count()
-        print(f"Total Docs in DB: {count}")
-        
-        if count == 0:
-            print("DB IS EMPTY! Ingestion failed.")
-            return
-
-        # Perform Search
-        results = vector_store.similarity_search_with_score(query, k=3)
-        
+        embeddings = get_embeddings(backend)
+
+        if settings.VECTOR_STORE == "numpy":
+            from app.services.vector_index import NumpyVectorIndex
+            index = NumpyVectorIndex(settings.VECTOR_INDEX_DIR)
+            count = index.count()
+            print(f"Total Docs in DB: {count}")
+            if count == 0:
+                print("DB IS EMPTY! Ingestion failed.")
+                return
+            results = [(row["text"], row["metadata"], score)
+                       for row, score in index.search(embeddings.embed_query(query), k=3)]
+        else:
+            from langchain_chroma import Chroma
+            # Connect to DB
+            vector_store = Chroma(
+                persist_directory=settings.CHROMA_DB_DIR,
+                embedding_function=embeddings
+            )
+
+            # Check Count
+            count = vector_store._collection.count()
+            print(f"Total Docs in DB: {count}")
+
+            if count == 0:
+                print("DB IS EMPTY! Ingestion failed.")
+                return
+
+            # Perform Search
+            results = [(doc.page_content, doc.metadata, score)
+                       for doc, score in vector_store.similarity_search_with_score(query, k=3)]
+
         print(f"\nTop {len(results)} Results:")
-        for i, (doc, score) in enumerate(results):
+        for i, (content, metadata, score) in enumerate(results):
             print(f"\n[Result {i+1}] (Score: {score:.4f})")
-            print(f"Content: {doc.page_content[:200]}...") # Show first 200 chars
-            print(f"Source: {doc.metadata.get('source', 'Unknown')}")
-            
+            print(f"Content: {content[:200]}...") # Show first 200 chars
+            print(f"Source: {metadata.get('source', 'Unknown')}")
+
     except Exception as e:
         print(f"EXCEPTION: {e}")
 
@@ -1,15 +1,41 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.api.endpoints import chat
-from app.db.database import engine, Base
-from app.db import models
+from app.api.endpoints import admin, chat, ingest
+from app.services.history_writer import history_writer
+from app.services.ingest_jobs import ingest_jobs
+from app.services.startup import startup
+from app.services.telemetry import dropped_log_lines, metrics, stop_logging
 
-# Create Database Tables (Bypassed for Python 3.14 Compatibility)
-# models.Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The knowledge base is already loaded (memory-mapped snapshot when unchanged).
+    # Schema migration and the provider warmup run in the background; history rows
+    # queue up until the migration is done (see app/services/startup.py).
+    startup.begin(chat.rag_service)
+    history_writer.start(after=startup.migration)
+    chat.rag_service.knowledge.start()
+    yield
+    startup.stopping = True
+    await chat.rag_service.knowledge.stop()
+    # Flush queued chat history so no rows are lost on shutdown
+    await history_writer.stop()
+    await asyncio.to_thread(ingest_jobs.shutdown)
+    # Close pooled keep-alive connections to the LLM providers
+    await chat.rag_service.registry.aclose()
+    # Persist live conversations when a SQLite spill file is configured
+    await asyncio.to_thread(chat.rag_service.sessions.close)
+    # Write out queued shared-cache rows (multi-worker mode)
+    if chat.rag_service.cache:
+        await asyncio.to_thread(chat.rag_service.cache.close)
+    stop_logging()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
+    lifespan=lifespan,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     description="Backend API for Language-Agnostic Generative AI College Chatbot"
 )
@@ -21,15 +47,51 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # The chat UI reads Retry-After from 429 / 503 responses
+    expose_headers=["Retry-After"],
 )
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to the College Chatbot API. Visit /docs for Swagger UI."}
 
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    """
+    Liveness: the process is up and the event loop answers.
+    """
+    return {"status": "ok"}
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    """
+    Readiness: 200 once the knowledge base is loaded (and the warmup is done when
+    READY_AFTER_WARMUP is set), 503 while starting or shutting down.
+    """
+    status = startup.status(kb_loaded=chat.rag_service.knowledge.current.generation > 0)
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """
+    Prometheus scrape endpoint: latency / token histograms, cache hits, failovers and provider errors.
+    """
+    rag = chat.rag_service
+    gauges = {
+        "kpgu_history_queue_depth": ("Chat history rows waiting to be written.", history_writer.stats()["queue_depth"]),
+        "kpgu_sessions_active": ("Conversations held in memory.", rag.sessions.stats()["sessions"]),
+        "kpgu_kb_generation": ("Knowledge base reload generation.", rag.knowledge.current.generation),
+        "kpgu_log_lines_dropped": ("Log lines dropped because the log queue was full.", dropped_log_lines()),
+    }
+    if rag.admission:
+        gauges["kpgu_admission_active"] = ("Questions holding an LLM slot.", rag.admission.gate.active)
+        gauges["kpgu_admission_queue_depth"] = ("Questions queued for an LLM slot.", rag.admission.gate.queued)
+    return PlainTextResponse(metrics.render(gauges), media_type="text/plain; version=0.0.4")
+
 # Include routers
 app.include_router(chat.router, prefix=f"{settings.API_V1_STR}/chat", tags=["chat"])
-
-# DISABLED FOR PRESENTATION (Prevents Chroma conflict)
-# from app.api.endpoints import ingest
-# app.include_router(ingest.router, prefix=f"{settings.API_V1_STR}/ingest", tags=["ingest"])
+app.include_router(admin.router, prefix=f"{settings.API_V1_STR}/admin", tags=["admin"])
+# Ingestion runs as serialized background jobs (vector store is only imported when a job runs).
+# A run can start paid embedding calls, so it needs the admin token too.
+app.include_router(ingest.router, prefix=f"{settings.API_V1_STR}/ingest", tags=["ingest"],
+                   dependencies=[Depends(admin.require_admin)])
@@ -0,0 +1,73 @@
+"""
+Multi-worker launcher.
+
+Publishes the knowledge base as a memory-mapped snapshot in SHARED_STATE_DIR,
+starts N uvicorn workers that all map it (and share the SQLite response cache
+next to it), and watches the dataset: when the file changes a new snapshot is
+published and the CURRENT pointer is swapped atomically, which every worker
+picks up on its next request. Session memory stays per worker (see SessionStore).
+
+Run from the backend folder:
+    python run_workers.py --workers 4 --port 8000
+    python run_workers.py --reload      # publish the current dataset now (e.g. from a deploy script)
+"""
+import argparse
+import os
+import threading
+import time
+
+# Workers are spawned with this environment, so set it before settings are imported
+os.environ.setdefault("SHARED_STATE_DIR", "./shared_state")
+
+from app.core.config import settings  # noqa: E402
+from app.services.kb_snapshot import dataset_path, prune, publish, read_pointer  # noqa: E402
+
+
+def publish_dataset(directory: str) -> str:
+    with open(dataset_path(), "r", encoding="utf-8") as f:
+        text = f.read()
+    previous = read_pointer(directory)
+    version = publish(text, directory)
+    if version != previous:
+        print(f"KB snapshot published: {version} (was {previous})")
+        prune(directory)
+    return version
+
+
+def watch_dataset(directory: str, interval: float):
+    """Polling watcher (works the same on Windows and Linux)."""
+    path = dataset_path()
+    last = None
+    while True:
+        try:
+            st = os.stat(path)
+            sig = (st.st_mtime_ns, st.st_size)
+            if sig != last:
+                if last is not None:
+                    publish_dataset(directory)
+                last = sig
+        except OSError as e:
+            print(f"KB watcher: {e}")
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the KPGU backend with several worker processes.")
+    parser.add_argument("--workers", type=int, default=settings.WORKERS)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--watch-interval", type=float, default=2.0)
+    parser.add_argument("--reload", action="store_true", help="publish the dataset and exit")
+    args = parser.parse_args()
+
+    directory = settings.SHARED_STATE_DIR
+    os.makedirs(directory, exist_ok=True)
+    version = publish_dataset(directory)
+    if args.reload:
+        raise SystemExit(0)
+
+    threading.Thread(target=watch_dataset, args=(directory, args.watch_interval), daemon=True).start()
+    print(f"Starting {args.workers} workers | KB snapshot {version} | shared state in {os.path.abspath(directory)}")
+
+    import uvicorn
+    uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
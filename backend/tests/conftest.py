@@ -0,0 +1,6 @@
+import os
+
+# Settings require a secret; tests never read .env API keys or talk to providers
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ["GROQ_API_KEY"] = ""
+os.environ["GOOGLE_API_KEY"] = ""
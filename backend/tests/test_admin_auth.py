@@ -0,0 +1,13 @@
+from fastapi.testclient import TestClient
+
+import main
+from app.core.config import settings
+
+
+def test_ingest_requires_the_admin_token(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "s3cret")
+    client = TestClient(main.app)  # no lifespan: nothing is started
+    assert client.post("/api/v1/ingest/").status_code == 403
+    assert client.get("/api/v1/ingest/", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.get("/api/v1/ingest/", headers={"X-Admin-Token": "s3cret"}).status_code == 200
+    assert client.get("/api/v1/admin/kb").status_code == 403
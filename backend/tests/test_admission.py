@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from app.services.admission import AdmissionGate, AdmissionRejected, SlidingWindowLimiter
+
+
+def test_retry_after_is_rounded_up_in_the_message():
+    e = AdmissionRejected(503, "overloaded", 0.2)
+    assert e.retry_after == 1
+    assert str(e) == "Request rejected (overloaded), retry in 1s"
+    assert AdmissionRejected(429, "ip_rate", 2.1).retry_after == 3
+
+
+def test_sliding_window():
+    limiter = SlidingWindowLimiter(limit=2, window=10)
+    assert limiter.hit("a", 0) is None
+    assert limiter.hit("a", 1) is None
+    assert limiter.hit("a", 2) == 8
+    assert limiter.hit("b", 2) is None
+    assert limiter.hit("a", 10) is None
+
+
+def test_sliding_window_tracks_a_bounded_number_of_clients():
+    limiter = SlidingWindowLimiter(limit=1, window=10, max_clients=2)
+    for key in ("a", "b", "c"):
+        limiter.hit(key, 0)
+    assert len(limiter) == 2
+    assert limiter.hit("a", 1) is None
+
+
+def test_gate_queues_then_sheds():
+    gate = AdmissionGate(limit=1, max_queue=1, max_wait=5)
+
+    async def main():
+        await gate.acquire("a")
+        waiter = asyncio.ensure_future(gate.acquire("b"))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as e:
+            await gate.acquire("c")
+        assert e.value.status_code == 503 and e.value.reason == "queue_full"
+        gate.release("a", 0.5)
+        await waiter
+        gate.release("b", 0.5)
+
+    asyncio.run(main())
+    stats = gate.stats()
+    assert stats["active"] == 0 and stats["queue_depth"] == 0 and stats["clients"] == 0
+    assert stats["admitted"] == 2 and stats["rejected"] == {"queue_full": 1}
+
+
+def test_gate_hands_freed_slots_to_clients_in_turn():
+    gate = AdmissionGate(limit=1, max_queue=10, max_wait=5)
+    order = []
+
+    async def wait(client):
+        await gate.acquire(client)
+        order.append(client)
+
+    async def main():
+        await gate.acquire("x")
+        waiters = [asyncio.ensure_future(wait(c)) for c in ("a", "a", "a", "b")]
+        await asyncio.sleep(0)
+        for client in ["x", "a", "a", "b"]:
+            gate.release(client, 0.1)
+            await asyncio.sleep(0)
+        await asyncio.gather(*waiters)
+
+    asyncio.run(main())
+    assert order == ["a", "b", "a", "a"]
+
+
+def test_gate_enforces_the_per_client_share():
+    gate = AdmissionGate(limit=4, max_queue=4, max_wait=5, per_client=1)
+
+    async def main():
+        await gate.acquire("a")
+        with pytest.raises(AdmissionRejected) as e:
+            await gate.acquire("a")
+        assert e.value.status_code == 429 and e.value.reason == "client_concurrency"
+        await gate.acquire("b")
+
+    asyncio.run(main())
+
+
+def test_cors_exposes_retry_after():
+    client = TestClient(main.app)
+    response = client.get("/", headers={"Origin": "http://localhost:5173"})
+    assert "retry-after" in response.headers["access-control-expose-headers"].lower()
@@ -0,0 +1,72 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+import main
+from app.schemas.chat import ChatRequest, ChatResponse
+from app.services import batch
+from app.services.admission import AdmissionRejected
+from app.services.batch import BatchRunner
+
+
+class FakeRag:
+    """Answers after a per-question delay and records every call it gets."""
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.registry = SimpleNamespace(providers=["A"])
+        self.calls = []
+
+    async def generate_response(self, request, client=None, limit=None):
+        self.calls.append(request.query)
+        await asyncio.sleep(self.delays.get(request.query, 0))
+        if request.query == "busy":
+            raise AdmissionRejected(503, "overloaded", 2)
+        return ChatResponse(response=f"answer: {request.query}", detected_language="English",
+                            session_id=request.session_id)
+
+
+def run(rag, requests, monkeypatch):
+    monkeypatch.setattr(batch.history_writer, "enqueue", lambda *args, **kwargs: None)
+
+    async def collect():
+        return [line async for line in BatchRunner(rag).run(requests)]
+
+    return asyncio.run(collect())
+
+
+def test_duplicates_are_answered_once_and_share_the_answer(monkeypatch):
+    rag = FakeRag({})
+    lines = run(rag, [ChatRequest(query="MBA fees"), ChatRequest(query="mba fees?"),
+                      ChatRequest(query="MBA fees", language="Hindi (Devanagari Script)")], monkeypatch)
+    assert len(rag.calls) == 2
+    items = {line["index"]: line for line in lines[:-1]}
+    assert items[1]["duplicate_of"] == 0 and items[1]["response"] == items[0]["response"]
+    assert "duplicate_of" not in items[2]
+    assert lines[-1]["done"] and lines[-1]["unique"] == 2 and lines[-1]["deduplicated"] == 1
+
+
+def test_results_come_in_completion_order_and_sessions_run_in_turn(monkeypatch):
+    rag = FakeRag({"slow": 0.05, "and for MBA?": 0.02})
+    lines = run(rag, [ChatRequest(query="slow"), ChatRequest(query="BTech fees", session_id="s"),
+                      ChatRequest(query="and for MBA?", session_id="s"), ChatRequest(query="busy"),
+                      ChatRequest(query="hi")], monkeypatch)
+    order = [line["index"] for line in lines[:-1]]
+    assert order.index(1) < order.index(2) and order[-1] == 0
+    assert [line["seq"] for line in lines[:-1]] == list(range(5))
+    rejected = next(line for line in lines if line.get("index") == 3)
+    assert rejected["status"] == 503 and rejected["retry_after"] == 2
+    assert lines[-1]["statuses"] == {"200": 4, "503": 1}
+
+
+def test_batch_endpoint_streams_ndjson(monkeypatch):
+    monkeypatch.setattr(batch.batch_runner, "rag", FakeRag({}))
+    monkeypatch.setattr(batch.history_writer, "enqueue", lambda *args, **kwargs: None)
+    client = TestClient(main.app)
+    response = client.post("/api/v1/chat/batch", json={"items": [{"query": "hi"}, {"query": "Hi!"}]})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line.get("index") for line in lines] == [0, 1, None] and lines[1]["duplicate_of"] == 0
+    assert client.post("/api/v1/chat/batch", json={"items": []}).status_code == 422
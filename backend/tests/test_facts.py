@@ -0,0 +1,29 @@
+from app.services.rag_service import rag_service
+
+
+def facts():
+    return rag_service.knowledge.current.facts
+
+
+def test_direct_lookups_are_answered_from_the_fact_store():
+    response, _, sources = facts().match("What are the fees for MBA?", "English")
+    assert "M.B.A." in response and "72,000" in response
+    assert sources == ["4. FEE STRUCTURE (ESTIMATED TOTAL & PER YEAR)"]
+    response, _, _ = facts().match("BPT duration", "English")
+    assert "4.5-year" in response
+
+
+def test_questions_with_more_than_a_fact_go_to_the_llm():
+    assert facts().match("B.Tech CSE fees and hostel and placement record details", "English") is None
+
+
+def test_followup_borrows_the_course_of_the_previous_question():
+    assert facts().match("duration?", "English") is None
+    response, _, _ = facts().match("duration?", "English", previous="B.Tech CSE fees")
+    assert "B.Tech" in response and "4-year" in response
+
+
+def test_qualified_questions_are_not_answered_with_the_plain_table():
+    for query in ("Is B.Tech CSE fees refundable?", "B.Tech CSE fees for NRI", "MBA fee cancellation",
+                  "B.Tech CSE fees with hostel", "BBA fees after scholarships", "MBA fees on EMI"):
+        assert facts().match(query, "English") is None, query
@@ -0,0 +1,54 @@
+import asyncio
+
+from app.services.rag_service import PreparedQuery, rag_service
+
+
+class FakeChain:
+    """Stands in for prompt | llm | parser: answers after `delay` seconds, or fails."""
+
+    def __init__(self, answer, delay=0.0, fail=False):
+        self.answer = answer
+        self.delay = delay
+        self.fail = fail
+        self.cancelled = False
+
+    async def ainvoke(self, inputs):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.fail:
+            raise RuntimeError("503 UNAVAILABLE")
+        return self.answer
+
+
+def hedged(monkeypatch, providers, race):
+    monkeypatch.setattr(rag_service, "_chain", lambda prompt, llm: llm)
+    monkeypatch.setattr(rag_service.registry, "hedge_delay", lambda name: 0.05)
+    plan = PreparedQuery("hostel fees", "hostel fees", "English", None, providers, [], [], [], 50,
+                         rag_service.knowledge.current.version, False)
+    return asyncio.run(rag_service._invoke_hedged(plan, race=race))
+
+
+def test_race_takes_the_fastest_answer_and_cancels_the_rest(monkeypatch):
+    slow, fast = FakeChain("slow", delay=1.0), FakeChain("fast", delay=0.01)
+    assert hedged(monkeypatch, [("A", slow), ("B", fast)], race=True) == "fast"
+    assert slow.cancelled
+
+
+def test_hedge_starts_the_next_provider_after_the_latency_budget(monkeypatch):
+    slow, backup = FakeChain("slow", delay=1.0), FakeChain("backup", delay=0.01)
+    assert hedged(monkeypatch, [("A", slow), ("B", backup)], race=False) == "backup"
+    assert slow.cancelled
+
+
+def test_hedge_waits_for_a_provider_within_its_budget(monkeypatch):
+    quick, backup = FakeChain("quick", delay=0.01), FakeChain("backup")
+    assert hedged(monkeypatch, [("A", quick), ("B", backup)], race=False) == "quick"
+
+
+def test_failure_moves_on_at_once(monkeypatch):
+    failing, backup = FakeChain(None, fail=True), FakeChain("backup")
+    assert hedged(monkeypatch, [("A", failing), ("B", backup)], race=False) == "backup"
+    assert hedged(monkeypatch, [("A", FakeChain(None, fail=True))], race=False) is None
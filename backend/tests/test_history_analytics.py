@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+
+from app.db import database
+from app.db.migrations import MIGRATIONS, fts_available, migrate
+from app.services.history_analytics import HistoryAnalytics, _fts_query
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'history.db'}")
+    monkeypatch.setattr(database, "engine", engine)
+    yield engine
+    engine.dispose()
+
+
+def insert(engine, rows):
+    start = datetime(2026, 5, 4, 10)
+    with engine.begin() as conn:
+        for i, (query, response) in enumerate(rows):
+            conn.exec_driver_sql(
+                'INSERT INTO chat_history ("query", response, timestamp, detected_language, outcome)'
+                " VALUES (?, ?, ?, 'en', 'llm')",
+                (query, response, (start + timedelta(minutes=i)).strftime("%Y-%m-%d %H:%M:%S")))
+
+
+def test_migrations_are_idempotent_and_upgrade_old_databases(engine):
+    with engine.begin() as conn:  # a database from before migrations: bare table, version 0
+        conn.exec_driver_sql('CREATE TABLE chat_history (id INTEGER NOT NULL PRIMARY KEY,'
+                             ' "query" TEXT NOT NULL, response TEXT NOT NULL, timestamp DATETIME)')
+        conn.exec_driver_sql("INSERT INTO chat_history (\"query\", response, timestamp)"
+                             " VALUES ('B.Tech CSE fees?', 'answer', '2026-05-04 10:30:00')")
+    with engine.connect() as conn:
+        expected = len(MIGRATIONS) if fts_available(conn) else len(MIGRATIONS) - 1
+    assert migrate(engine) == expected
+    assert migrate(engine) == expected
+    with engine.begin() as conn:  # a step that died before bumping the version just runs again
+        conn.exec_driver_sql("PRAGMA user_version = 1")
+    assert migrate(engine) == expected
+
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT query_key FROM chat_history").scalar()
+        assert conn.exec_driver_sql("SELECT hour, count FROM chat_question_hourly").fetchall() == [
+            ("2026-05-04 10:00", 1)]
+
+
+def test_keyword_search_pages_backwards_by_id(engine):
+    migrate(engine)
+    insert(engine, [(f"hostel fees question {i}", "The hostel fee is 80,000.") for i in range(5)]
+           + [("MBA placements", "Average package 6 LPA.")])
+    analytics = HistoryAnalytics()
+
+    first = analytics.search("hostel fee*", limit=2)
+    assert [item["id"] for item in first["items"]] == [5, 4]
+    second = analytics.search("hostel fee*", before_id=first["next_cursor"], limit=2)
+    assert [item["id"] for item in second["items"]] == [3, 2]
+    last = analytics.search("hostel fee*", before_id=second["next_cursor"], limit=2)
+    assert [item["id"] for item in last["items"]] == [1] and last["next_cursor"] is None
+
+    assert [item["id"] for item in analytics.search("placements")["items"]] == [6]
+    assert analytics.search("hostel", outcome="cache")["items"] == []
+
+
+def test_full_text_search_tokenises_indic_words_whole(engine):
+    migrate(engine)
+    analytics = HistoryAnalytics()
+    if not analytics.fts:
+        pytest.skip("SQLite built without FTS5")
+    insert(engine, [("छात्रावास शुल्क कितना है", "८०,००० रुपये"), ("hostel", "80,000")])
+    result = analytics.search("छात्रावास")
+    assert result["full_text"] and [item["id"] for item in result["items"]] == [1]
+
+
+def test_fts_operators_in_keywords_are_plain_text():
+    assert _fts_query('fees OR "hostel" fee*') == '"fees" "OR" """hostel""" "fee"*'
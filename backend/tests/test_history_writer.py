@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import database
+from app.db.migrations import migrate
+from app.services.history_writer import HistoryWriter
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'history.db'}")
+    migrate(engine)
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=engine))
+    yield engine
+    engine.dispose()
+
+
+def rows(engine, sql):
+    with engine.connect() as conn:
+        return conn.exec_driver_sql(sql).fetchall()
+
+
+def test_stop_flushes_everything_still_queued(engine):
+    writer = HistoryWriter(max_queue=100, batch_size=50, flush_interval=60)
+
+    async def main():
+        for i in range(3):
+            writer.enqueue(f"question {i}", "answer", outcome="fast_path")
+        await writer.stop()  # long before the flush interval
+
+    asyncio.run(main())
+    assert rows(engine, "SELECT COUNT(*) FROM chat_history") == [(3,)]
+    assert writer.stats()["written"] == 3 and writer.stats()["queue_depth"] == 0
+
+
+def test_rows_are_dropped_not_awaited_when_the_queue_is_full(engine):
+    writer = HistoryWriter(max_queue=2, batch_size=50, flush_interval=60)
+
+    async def main():
+        for i in range(5):
+            writer.enqueue(f"question {i}", "answer")
+        await writer.stop()
+
+    asyncio.run(main())
+    assert writer.stats()["dropped"] == 3 and writer.stats()["written"] == 2
+
+
+def test_hourly_rollups_group_rephrasings(engine):
+    writer = HistoryWriter(max_queue=100, batch_size=2, flush_interval=60)
+    hour = datetime(2026, 5, 4, 10, 15)
+
+    async def main():
+        for query, latency in (("B.Tech CSE fees?", 100.0), ("MBA fees", None), ("fees for btech cse", 300.0)):
+            writer.enqueue(query, "answer", detected_language="en", latency_ms=latency, timestamp=hour)
+        await writer.stop()
+
+    asyncio.run(main())
+    assert writer.stats()["batches"] == 2  # the CSE rows land in separate batches and still add up
+    questions = rows(engine, "SELECT query_key, count, timed, latency_ms_sum, sample_query"
+                             " FROM chat_question_hourly ORDER BY count DESC")
+    assert questions[0][1:] == (2, 2, 400.0, "B.Tech CSE fees?")
+    assert questions[1][1:3] == (1, 0)
+    assert rows(engine, "SELECT hour, detected_language, count, timed FROM chat_hourly_totals") == [
+        ("2026-05-04 10:00", "en", 3, 2)]
@@ -0,0 +1,104 @@
+import pytest
+
+from app.core.config import settings
+from app.services import ingestion_service as ingestion
+from app.services.embeddings import HashingEmbeddings
+from app.services.ingestion_service import IngestionService, IngestManifest
+from app.services.vector_index import NumpyVectorIndex
+
+
+class CountingEmbeddings(HashingEmbeddings):
+    embedded = 0
+
+    def embed_documents(self, texts):
+        CountingEmbeddings.embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_BACKEND", "local")
+    monkeypatch.setattr(settings, "INGEST_WORKERS", 0)
+    monkeypatch.setattr(ingestion, "get_embeddings", lambda backend: CountingEmbeddings(dim=256))
+    CountingEmbeddings.embedded = 0
+    service = IngestionService()
+    service.data_dir = str(tmp_path / "data")
+    service.store_kind = "numpy"
+    service.db_dir = str(tmp_path / "index")
+    service.manifest_path = str(tmp_path / "index" / "ingest_manifest.json")
+    (tmp_path / "data").mkdir()
+    return service
+
+
+def write(service, name, paragraphs):
+    with open(f"{service.data_dir}/{name}", "w", encoding="utf-8") as f:
+        f.write("\n\n".join(paragraphs))
+
+
+def paragraph(topic, i):
+    return f"{topic} section {i}: " + " ".join(f"{topic}-detail-{i}-{n}" for n in range(60))
+
+
+def test_unchanged_files_and_chunks_are_not_embedded_again(service):
+    write(service, "fees.txt", [paragraph("fees", i) for i in range(4)])
+    write(service, "hostel.txt", [paragraph("hostel", i) for i in range(2)])
+    first = service.ingest_documents()
+    assert first["status"] == "success" and first["removed"] == 0
+    total = first["added"]
+    assert total == CountingEmbeddings.embedded > 0
+
+    again = service.ingest_documents()
+    assert again["message"] == "Vector DB already up to date." and CountingEmbeddings.embedded == total
+
+    # Editing one section of one file re-embeds only the chunks that changed
+    write(service, "fees.txt", [paragraph("fees", i) for i in range(3)] + [paragraph("fees", 9)])
+    edited = service.ingest_documents()
+    assert edited["skipped_files"] == ["hostel.txt"]
+    assert 0 < edited["added"] < total and edited["removed"] == edited["added"]
+    assert edited["progress"]["chunks_unchanged"] == total - edited["added"]
+    assert NumpyVectorIndex(service.db_dir).count() == total
+
+
+def test_deleted_files_have_their_chunks_removed(service, tmp_path):
+    write(service, "fees.txt", [paragraph("fees", i) for i in range(2)])
+    write(service, "hostel.txt", [paragraph("hostel", i) for i in range(2)])
+    service.ingest_documents()
+    hostel_chunks = IngestManifest(service.manifest_path).files["hostel.txt"]["chunks"]
+
+    (tmp_path / "data" / "hostel.txt").unlink()
+    result = service.ingest_documents()
+    assert result["added"] == 0 and result["removed"] == len(hostel_chunks)
+    assert "hostel.txt" not in IngestManifest(service.manifest_path).files
+    index = NumpyVectorIndex(service.db_dir)
+    assert not set(hostel_chunks) & set(index.id_to_row)
+
+
+def test_parsing_in_worker_processes_with_small_batches(service, monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_WORKERS", 2)
+    monkeypatch.setattr(settings, "INGEST_EMBED_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "INGEST_QUEUE_SIZE", 1)
+    for name in ("a.txt", "b.txt", "c.txt"):
+        write(service, name, [paragraph(name, i) for i in range(3)])
+    progress = []
+    result = service.ingest_documents(on_progress=progress.append)
+    assert result["status"] == "success" and result["added"] == CountingEmbeddings.embedded
+    assert progress[-1]["files_done"] == 3 and progress[-1]["chunks_embedded"] == result["added"]
+    assert NumpyVectorIndex(service.db_dir).count() == result["added"]
+
+
+def test_failed_or_cancelled_runs_leave_the_manifest_alone(service, monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_EMBED_RETRIES", 1)
+    write(service, "fees.txt", [paragraph("fees", i) for i in range(2)])
+
+    def fail(texts):
+        raise RuntimeError("429 quota exceeded")
+
+    embeddings = CountingEmbeddings(dim=256)
+    embeddings.embed_documents = fail
+    monkeypatch.setattr(ingestion, "get_embeddings", lambda backend: embeddings)
+    result = service.ingest_documents()
+    assert result["status"] == "error" and "quota" in result["message"]
+    assert not IngestManifest(service.manifest_path).exists
+
+    assert service.ingest_documents(should_cancel=lambda: True)["status"] == "cancelled"
+    assert not IngestManifest(service.manifest_path).exists
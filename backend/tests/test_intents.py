@@ -0,0 +1,48 @@
+from app.services.intents import AhoCorasick, IntentMatcher, normalize_text
+from app.services.language import HINDI
+
+CONFIG = {
+    "ignore_words": ["what", "is", "the", "please"],
+    "intents": [
+        {"patterns": ["hi", "hello"], "responses": {"en": "Hello!", "hi": "नमस्ते!"}},
+        {"patterns": ["thank you", "thanks", "dhanyawad"], "match": "contains", "max_length": 30,
+         "responses": {"en": "You're welcome!"}},
+        {"patterns": ["helpline number"], "faq": True,
+         "responses": {"en": "Call {fact:Toll-Free}."}},
+        {"patterns": ["hostel rules"], "faq": True,
+         "responses": {"en": "{section:Hostel}"}},
+    ],
+}
+SECTIONS = [
+    ("Contact", "- **Toll-Free**: 1800 123 456\n- **Email**: info@example.edu"),
+    ("Hostel Rules", "## Hostel Rules\nCurfew is at 10 pm."),
+]
+
+
+def test_normalize_squeezes_repeats_and_punctuation():
+    assert normalize_text("Hiiii!!  THERE?") == "hi there"
+    assert normalize_text("नमस्ते!") == "नमस्ते"
+
+
+def test_automaton_prefers_the_earliest_registered_pattern():
+    automaton = AhoCorasick([("she", 1), ("he", 2), ("hers", 3)])
+    assert automaton.best("ushers") == 1
+    assert automaton.best("ahers") == 2  # found through a failure link
+    assert automaton.best("xyz") is None
+
+
+def test_exact_contains_and_faq_matches():
+    matcher = IntentMatcher(CONFIG, SECTIONS)
+    assert matcher.match("Hellooo!", "English")[0] == "Hello!"
+    assert matcher.match("hi", HINDI)[:2] == ("नमस्ते!", "hi")
+    assert matcher.match("ok thanks a lot", "English")[0] == "You're welcome!"
+    assert matcher.match("what is the helpline number please", "English") == (
+        "Call 1800 123 456.", "en", ["Contact"])
+    assert matcher.match("hostel rules?", "English")[0] == "Curfew is at 10 pm."
+
+
+def test_longer_questions_are_left_to_retrieval():
+    matcher = IntentMatcher(CONFIG, SECTIONS)
+    assert matcher.match("hi, what are the hostel fees for B.Tech CSE?", "English") is None
+    assert matcher.match("thanks, but can you also tell me the MBA placement record", "English") is None
+    assert matcher.match("???", "English") is None
@@ -0,0 +1,32 @@
+from app.services.kb_snapshot import MappedKB, dataset_path, prune, publish, read_pointer, snapshot_version
+from app.services.retrieval import BM25Index, split_sections
+
+
+def dataset() -> str:
+    with open(dataset_path(), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def test_mapped_index_matches_the_in_memory_index(tmp_path):
+    text = dataset()
+    version = publish(text, str(tmp_path))
+    assert version == snapshot_version(text) == read_pointer(str(tmp_path))
+
+    kb = MappedKB.open_current(str(tmp_path))
+    sections = split_sections(text)
+    assert kb.text == text
+    assert list(kb.sections) == sections
+    index = BM25Index(sections)
+    for query in ("B.Tech CSE fees", "hostel mess charges", "MBA placements", "scholarship"):
+        mapped, expected = kb.index.search(query), index.search(query)
+        assert [i for i, _ in mapped] == [i for i, _ in expected]
+        assert all(abs(a - b) < 1e-3 for (_, a), (_, b) in zip(mapped, expected))
+
+
+def test_publish_swaps_the_pointer_and_prune_keeps_the_current_snapshot(tmp_path):
+    directory = str(tmp_path)
+    versions = [publish(f"== Section {i} ==\nbody {i}\n", directory) for i in range(4)]
+    assert read_pointer(directory) == versions[-1]
+    prune(directory, keep=2)
+    left = sorted(p.name for p in tmp_path.glob("kb-*.snap"))
+    assert len(left) == 2 and f"kb-{versions[-1]}.snap" in left
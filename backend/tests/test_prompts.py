@@ -0,0 +1,36 @@
+from app.services.prompts import TokenBudget, TokenCounter
+
+
+def budget():
+    return TokenBudget(TokenCounter("estimate"), {"Groq": 200, "Gemini": 1000}, default=500, history_share=0.5)
+
+
+def test_limit_by_provider_prefix():
+    assert budget().limit("Gemini-2") == 1000
+    assert budget().limit("Groq") == 200
+    assert budget().limit("Other") == 500
+
+
+def test_everything_fits_in_document_order():
+    sections = [(5, "Fees: 1,20,000 per year."), (1, "B.Tech CSE is a 4 year programme.")]
+    context, history, usage = budget().fit(1000, 50, sections, [{"role": "user", "content": "hi"}])
+    assert context.index("B.Tech CSE") < context.index("Fees")
+    assert "User: hi" in history
+    assert not usage["trimmed"] and usage["sections_sent"] == 2
+    assert usage["total"] == 50 + usage["context"] + usage["history"]
+
+
+def test_context_is_cut_at_a_line_boundary_within_the_limit():
+    long_section = "\n".join(f"Line {i}: " + "word " * 10 for i in range(40))
+    sections = [(0, long_section), (1, "never reached")]
+    context, _, usage = budget().fit(200, 40, sections)
+    assert usage["trimmed"] and usage["total"] <= 200
+    assert context.startswith("Line 0:") and "never reached" not in context
+    assert all(line.rstrip() in (l.rstrip() for l in long_section.split("\n")) for line in context.split("\n"))
+
+
+def test_history_keeps_the_newest_turns_within_its_share():
+    history = [{"role": "user", "content": f"question {i} " + "word " * 20} for i in range(10)]
+    _, block, usage = budget().fit(200, 0, [], history)
+    assert usage["history"] <= 100 and usage["trimmed"]
+    assert "question 9" in block and "question 0" not in block
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from app.services.providers import LatencyTracker, ProviderHealth, ProviderRegistry, ProviderUnavailable, classify_error
+
+
+class Status(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def registry_with_open_circuit():
+    registry = ProviderRegistry("", [])
+    registry._providers = [("Groq", object()), ("Gemini-1", object())]
+    for name, _ in registry._providers:
+        registry.health[name] = ProviderHealth(failure_threshold=1, open_seconds=0)
+        registry.latency[name] = LatencyTracker()
+    registry.health["Groq"].record_failure(Status(503), 0)  # open, and already past open_seconds
+    return registry
+
+
+def test_classify_error():
+    assert classify_error(Status(429)) == "rate_limit"
+    assert classify_error(Status(502)) == "server"
+    assert classify_error(TimeoutError("read timed out")) == "timeout"
+    assert classify_error(ValueError("bad")) == "other"
+
+
+def test_listing_providers_does_not_use_up_the_half_open_probe():
+    registry = registry_with_open_circuit()
+    for _ in range(3):
+        assert [name for name, _ in registry.available()] == ["Groq", "Gemini-1"]
+    assert registry.status()["Groq"]["state"] == "half-open"
+
+
+def test_only_one_call_gets_the_probe():
+    registry = registry_with_open_circuit()
+    asyncio.run(registry.acquire("Groq", 100))
+    with pytest.raises(ProviderUnavailable):
+        asyncio.run(registry.acquire("Groq", 100))
+    assert [name for name, _ in registry.available()] == ["Gemini-1"]
+    registry.record_success("Groq", 0.5)
+    assert registry.status()["Groq"]["state"] == "closed"
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+
+from app.core.config import Settings
+from app.services.rate_limiter import RateLimiter, RateLimitWait, TokenBucket
+
+
+def test_token_bucket_refills_at_its_rate():
+    bucket = TokenBucket(rate=2, capacity=4)
+    bucket.consume(4, bucket.updated)
+    now = bucket.updated
+    assert bucket.wait_time(2, now) == 1.0
+    assert bucket.wait_time(2, now + 1) == 0.0
+    assert bucket.wait_time(10, now + 5) == 0.0  # capped at capacity, never refills past it
+
+
+def test_calls_within_capacity_are_admitted_at_once():
+    limiter = RateLimiter({"Groq": (2, 10000)}, max_wait=0, queue_max=4)
+
+    async def main():
+        await limiter.acquire("Groq", 100)
+        await limiter.acquire("Groq", 100)
+        with pytest.raises(RateLimitWait):
+            await limiter.acquire("Groq", 100)
+
+    asyncio.run(main())
+    snapshot = limiter.snapshot("Groq")
+    assert snapshot["admitted"] == 2 and snapshot["rejected"] == 1 and snapshot["in_flight"] == 2
+
+
+def test_over_limit_call_waits_for_the_bucket():
+    limiter = RateLimiter({"Groq": (600, 100000)}, max_wait=1, queue_max=4)
+    limiter.keys["Groq"].requests.level = 0  # 10 requests/s: next one has room in 0.1 s
+
+    async def main():
+        await limiter.acquire("Groq", 10)
+
+    asyncio.run(main())
+    assert limiter.snapshot("Groq")["waited"] == 1
+
+
+def test_penalize_empties_the_buckets():
+    limiter = RateLimiter({"Gemini-1": (60, 100000)}, max_wait=0, queue_max=4)
+    limiter.penalize("Gemini-1")
+    with pytest.raises(RateLimitWait):
+        asyncio.run(limiter.acquire("Gemini-1", 10))
+
+
+def test_least_loaded_key_comes_first():
+    limiter = RateLimiter({"Gemini-1": (10, 100000), "Gemini-2": (10, 100000)}, max_wait=0, queue_max=4)
+    assert limiter.order(["Gemini-1", "Gemini-2"]) == ["Gemini-1", "Gemini-2"]
+    asyncio.run(limiter.acquire("Gemini-1", 10))
+    assert limiter.order(["Gemini-1", "Gemini-2"]) == ["Gemini-2", "Gemini-1"]
+    assert limiter.order(["Unknown", "Gemini-1"])[0] == "Unknown"
+
+
+def test_zero_rate_means_unlimited():
+    limiter = RateLimiter({"Groq": (0, 0)}, max_wait=0, queue_max=4)
+
+    async def main():
+        for _ in range(100):
+            await limiter.acquire("Groq", 10000)
+
+    asyncio.run(main())
+    limiter.penalize("Groq")
+    assert limiter.snapshot("Groq")["utilization"] == 0.0
+
+
+def test_negative_or_unknown_rate_limits_are_rejected():
+    with pytest.raises(ValidationError):
+        Settings(PROVIDER_RATE_LIMITS={"Gemini-2": {"rpm": -1}})
+    with pytest.raises(ValidationError):
+        Settings(PROVIDER_RATE_LIMITS={"Gemini-2": {"requests": 10}})
+    with pytest.raises(ValidationError):
+        Settings(GROQ_TPM=-5)
@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+from app.services.response_cache import ResponseCache, SharedResponseCache, normalize_query
+
+
+def test_equivalent_questions_share_a_key():
+    assert normalize_query("B.Tech CSE fees?") == normalize_query("fees for btech cse please")
+    assert normalize_query("tell me the hostel fees") == normalize_query("hostel fees")
+
+
+def test_branch_codes_that_are_stopwords_stay_in_the_key():
+    it, me = normalize_query("B.Tech IT fees?"), normalize_query("B.Tech ME fees?")
+    assert it != me
+    assert "it" in it and "me" in me
+    assert normalize_query("btech it fees") == it
+    assert normalize_query("B.E. admission") != normalize_query("admission")
+
+
+def test_pronouns_are_not_codes():
+    assert "me" not in normalize_query("tell me about the library")
+    assert "it" not in normalize_query("is it open on sunday")
+
+
+def test_it_and_me_questions_do_not_share_answers():
+    cache = ResponseCache()
+    cache.set("B.Tech IT fees?", "English", "IT fees")
+    assert cache.get("B.Tech ME fees?", "English") is None
+    assert cache.get("what are the btech it fees", "English") == "IT fees"
+
+
+def test_fuzzy_hit_and_language_separation():
+    cache = ResponseCache(fuzzy_threshold=0.6)
+    cache.set("hostel fees and mess charges", "English", "answer")
+    assert cache.get("hostel fee mess charges details", "English") == "answer"
+    assert cache.stats()["hits_fuzzy"] == 1
+    assert cache.get("hostel fees and mess charges", "Hindi") is None
+
+
+def test_ttl_and_lru_eviction():
+    cache = ResponseCache(max_entries=2, ttl_seconds=60)
+    cache.set("library timings", "English", 1)
+    cache.set("hostel fees", "English", 2)
+    cache.get("library timings", "English")
+    cache.set("bus routes", "English", 3)
+    assert cache.get("hostel fees", "English") is None
+    assert cache.get("library timings", "English") == 1
+    assert cache.stats()["evictions"] == 1
+
+    cache.ttl_seconds = 0
+    time.sleep(0.01)
+    assert cache.get("bus routes", "English") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_shared_cache_is_seen_by_other_workers_for_the_same_kb_version(tmp_path):
+    db = str(tmp_path / "cache.db")
+    worker_a = SharedResponseCache(db, dumps=str, loads=str, version="v1")
+    worker_b = SharedResponseCache(db, dumps=str, loads=str, version="v1")
+    worker_c = SharedResponseCache(db, dumps=str, loads=str, version="v2")
+    worker_a.set("hostel fees", "English", "answer")
+    worker_a.close()  # flush the write-behind queue
+
+    assert asyncio.run(worker_b.aget("fees for the hostel", "English")) == "answer"
+    assert worker_b.stats()["hits_shared"] == 1 and worker_b.stats()["misses"] == 0
+    assert worker_b.get("hostel fees", "English") == "answer"  # now in the local tier
+    assert asyncio.run(worker_c.aget("hostel fees", "English")) is None
+    for cache in (worker_b, worker_c):
+        cache.close()
@@ -0,0 +1,44 @@
+from app.services.retrieval import BM25Index, split_sections, tokenize
+
+DATASET = """Welcome to the university.
+
+### 1. FEES
+#### Engineering
+B.Tech CSE fees are 1,20,000 per year.
+#### Management
+MBA fees are 72,000 per year.
+
+### 2. HOSTEL
+Separate hostels for boys and girls. Mess charges are extra.
+
+### 3. EMPTY GROUP
+#### Placements
+Top recruiters visit every year.
+"""
+
+
+def test_tokenize_folds_course_codes_plurals_and_synonyms():
+    assert tokenize("What are the B.Tech fees?") == ["btech", "fee"]
+    assert tokenize("हॉस्टल फीस") == ["hostel", "fee"]
+    assert tokenize("class") == ["class"]
+
+
+def test_split_sections_nests_subsections_and_skips_empty_groups():
+    sections = split_sections(DATASET)
+    titles = [title for title, _ in sections]
+    assert titles == ["Overview", "1. FEES > Engineering", "1. FEES > Management", "2. HOSTEL",
+                      "3. EMPTY GROUP > Placements"]
+    # A subsection keeps its parent heading so the LLM sees the context
+    assert sections[1][1].startswith("### 1. FEES\n#### Engineering")
+
+
+def test_bm25_ranks_the_matching_section_first():
+    sections = split_sections(DATASET)
+    index = BM25Index(sections)
+    assert index.search("MBA fees")[0][0] == 2
+    assert index.search("hostel mess charges")[0][0] == 3
+    ranked = index.search("fees", k=4)
+    assert {i for i, _ in ranked} == {1, 2}
+    assert all(a >= b for (_, a), (_, b) in zip(ranked, ranked[1:]))
+    assert index.search("scuba diving") == []
+    assert index.ranked_sections("recruiters", k=1)[0][1] == "3. EMPTY GROUP > Placements"
@@ -0,0 +1,79 @@
+import asyncio
+
+from app.schemas.chat import ChatRequest
+from app.services.rag_service import rag_service
+from app.services.session_memory import SessionStore, is_followup
+from app.services.telemetry import start_trace
+
+
+def test_followups_are_recognised_by_their_cues():
+    assert is_followup("and for MBA?")
+    assert is_followup("What about hostel?")
+    assert is_followup("what are its fees")
+    assert is_followup("अच्छा, और MBA?")
+
+
+def test_short_standalone_questions_are_not_followups():
+    assert not is_followup("MBA placements")
+    assert not is_followup("hostel")
+    assert not is_followup("B.Tech IT fees")
+
+
+def test_followup_is_not_answered_from_the_previous_questions_cache_entry():
+    first = "What are the B.Tech CSE hostel fees and mess details?"
+    rag_service.cache.clear()
+    rag_service.cache.set(first, "English", "CSE hostel answer")
+    rag_service.sessions.append("followup-test", first, "The hostel costs 80,000 per year.")
+    trace = start_trace("test")
+    try:
+        request = ChatRequest(query="and for MBA?", session_id="followup-test")
+        response = asyncio.run(rag_service._prepare(request, "followup-test"))
+    finally:
+        trace.finish()
+        asyncio.run(rag_service.sessions.clear("followup-test"))
+    assert getattr(response, "response", None) != "CSE hostel answer"
+    assert rag_service.cache.stats()["hits_fuzzy"] == 0
+
+
+def test_window_folds_old_turns_into_the_summary():
+    store = SessionStore(window=2, summary_chars=200)
+    for i in range(3):
+        store.append("s", f"question {i}", f"Answer {i}. More detail.")
+    history = store.history("s")
+    assert history[0] == {"role": "summary", "content": "Q: question 0 -> A: Answer 0."}
+    assert [m["content"] for m in history[1:] if m["role"] == "user"] == ["question 1", "question 2"]
+    assert store.last_question("s") == "question 2"
+    assert asyncio.run(store.clear("s")) and store.history("s") == []
+
+
+def test_sessions_are_evicted_past_the_limit():
+    store = SessionStore(max_sessions=2)
+    for session_id in ("a", "b", "c"):
+        store.append(session_id, "q", "a")
+    assert store.history("a") == [] and store.stats()["evictions"] == 1
+
+
+def test_evicted_sessions_are_spilled_and_loaded_back(tmp_path):
+    store = SessionStore(max_sessions=1, spill_path=str(tmp_path / "sessions.db"))
+    store.append("a", "BPT fees", "The fee is 1,00,000.")
+    store.append("b", "MBA fees", "The fee is 72,000.")
+    assert store.history("a") == []  # evicted; only load() reads the spill
+
+    asyncio.run(store.load("a"))  # still queued or already written: both come back
+    assert store.last_question("a") == "BPT fees"
+    store.close()
+
+    reopened = SessionStore(spill_path=str(tmp_path / "sessions.db"))
+    asyncio.run(reopened.load("b"))  # spilled on shutdown
+    assert reopened.last_question("b") == "MBA fees"
+    assert asyncio.run(reopened.clear("b")) and not asyncio.run(reopened.clear("b"))
+    reopened.close()
+
+
+def test_requests_without_a_session_id_create_no_session(monkeypatch):
+    monkeypatch.setattr(rag_service, "sessions", SessionStore())
+    response = asyncio.run(rag_service.generate_response(ChatRequest(query="hi")))
+    assert response.session_id is None
+    assert rag_service.sessions.stats()["sessions"] == 0
+    response = asyncio.run(rag_service.generate_response(ChatRequest(query="hi", session_id="kiosk-1")))
+    assert response.session_id == "kiosk-1" and rag_service.sessions.stats()["sessions"] == 1
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from app.schemas.chat import ChatRequest
+from app.services.admission import AdmissionController, AdmissionGate, AdmissionRejected, SlidingWindowLimiter
+from app.services.rag_service import PreparedQuery, rag_service
+from app.services.single_flight import SingleFlight, coalesce_key
+
+
+def test_coalesce_key_modes():
+    assert coalesce_key("CSE  fees", "exact") == "CSE fees"
+    assert coalesce_key("Fees??", "text") == coalesce_key("fees", "text")
+    assert coalesce_key("fees of CSE please", "tokens") == coalesce_key("cse fees", "tokens")
+
+
+def test_identical_calls_share_one_run():
+    flight = SingleFlight()
+    calls = []
+
+    async def answer():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def follow():
+        future = flight.join("key")
+        return await asyncio.shield(future)
+
+    async def main():
+        leader = asyncio.ensure_future(flight.run("key", answer))
+        await asyncio.sleep(0)
+        return await asyncio.gather(leader, follow(), follow())
+
+    assert asyncio.run(main()) == ["answer"] * 3
+    assert len(calls) == 1
+    assert flight.stats()["coalesced"] == 2 and flight.stats()["in_flight"] == 0
+
+
+def test_leader_disconnecting_does_not_cancel_the_call():
+    flight = SingleFlight()
+
+    async def main():
+        leader = asyncio.ensure_future(flight.run("key", lambda: asyncio.sleep(0.01, result="answer")))
+        await asyncio.sleep(0)
+        future = flight.join("key")
+        leader.cancel()
+        return await future
+
+    assert asyncio.run(main()) == "answer"
+
+
+def test_followers_do_not_share_the_leaders_rejection(monkeypatch):
+    """A leader shed for its own client's concurrency must not turn its followers away."""
+    gate = AdmissionGate(limit=4, max_queue=4, max_wait=5, per_client=1)
+    admission = AdmissionController(gate, SlidingWindowLimiter(0, 60), SlidingWindowLimiter(0, 60))
+    monkeypatch.setattr(rag_service, "admission", admission)
+    monkeypatch.setattr(rag_service, "inflight", SingleFlight())
+    monkeypatch.setattr(rag_service, "cache", None)
+
+    async def call_providers(plan):
+        await asyncio.sleep(0.01)
+        return "The hostel fee is 80,000."
+
+    monkeypatch.setattr(rag_service, "_call_providers", call_providers)
+    plan = PreparedQuery("hostel fees", "hostel fees", "English", None, [("Stub", None)], [], [], [], 0,
+                         rag_service.knowledge.current.version, False)
+    request = ChatRequest(query="hostel fees")
+
+    async def main():
+        release = asyncio.Event()
+
+        async def hold():
+            async with admission.slot("10.0.0.1"):
+                await release.wait()
+
+        # The leader passes its client check, then that client fills its share before the call takes a slot
+        leader = asyncio.ensure_future(rag_service._answer(request, plan, "10.0.0.1"))
+        holder = asyncio.ensure_future(hold())
+        follower = asyncio.ensure_future(rag_service._answer(request, plan, "10.0.0.2"))
+        results = await asyncio.gather(leader, follower, return_exceptions=True)
+        release.set()
+        await holder
+        return results
+
+    leader, follower = asyncio.run(main())
+    assert isinstance(leader, AdmissionRejected) and leader.reason == "client_concurrency"
+    assert follower.response == "The hostel fee is 80,000."
+
+
+def test_client_over_its_share_is_rejected_before_joining(monkeypatch):
+    gate = AdmissionGate(limit=4, max_queue=4, max_wait=5, per_client=1)
+    monkeypatch.setattr(rag_service, "admission",
+                        AdmissionController(gate, SlidingWindowLimiter(0, 60), SlidingWindowLimiter(0, 60)))
+    gate._take("10.0.0.1")
+    with pytest.raises(AdmissionRejected) as e:
+        rag_service._check_rate(ChatRequest(query="hostel fees"), "10.0.0.1")
+    assert e.value.status_code == 429 and e.value.reason == "client_concurrency"
+
+
+def test_followers_answer_on_their_own_when_a_streaming_leader_disconnects(monkeypatch):
+    monkeypatch.setattr(rag_service, "admission", None)
+    monkeypatch.setattr(rag_service, "inflight", SingleFlight())
+    monkeypatch.setattr(rag_service, "cache", None)
+    plan = PreparedQuery("hostel fees", "hostel fees", "English", None, [("Stub", None)], [], [], [], 0,
+                         rag_service.knowledge.current.version, False)
+
+    async def prepare(request, session_id):
+        return plan
+
+    async def stream_providers(plan):
+        yield {"type": "token", "content": "The hostel"}
+        await asyncio.sleep(10)
+
+    async def call_providers(plan):
+        return "The hostel fee is 80,000."
+
+    monkeypatch.setattr(rag_service, "_prepare", prepare)
+    monkeypatch.setattr(rag_service, "_stream_providers", stream_providers)
+    monkeypatch.setattr(rag_service, "_call_providers", call_providers)
+    request = ChatRequest(query="hostel fees")
+
+    async def main():
+        leader = rag_service._stream(request, "s1", "10.0.0.1")
+        assert (await leader.__anext__())["content"] == "The hostel"
+        follower = asyncio.ensure_future(rag_service._answer(request, plan, "10.0.0.2"))
+        streamer = rag_service._stream(request, "s2", "10.0.0.3")
+        streamed = asyncio.ensure_future(streamer.__anext__())
+        await asyncio.sleep(0)
+        await leader.aclose()  # the leader's client went away mid-answer
+        return await follower, await streamed
+
+    response, event = asyncio.run(main())
+    assert response.response == "The hostel fee is 80,000."
+    assert event["content"] == "The hostel"  # the streaming follower streams its own answer
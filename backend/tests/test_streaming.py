@@ -0,0 +1,47 @@
+import asyncio
+
+from app.services.rag_service import PreparedQuery, rag_service
+
+
+class FakeChain:
+    """Stands in for prompt | llm | parser: streams `tokens`, failing after `fail_after` of them."""
+
+    def __init__(self, tokens, fail_after=None):
+        self.tokens = tokens
+        self.fail_after = fail_after
+
+    async def astream(self, inputs):
+        for i, token in enumerate(self.tokens):
+            if i == self.fail_after:
+                raise RuntimeError("503 UNAVAILABLE")
+            await asyncio.sleep(0)
+            yield token
+
+
+def stream(monkeypatch, providers):
+    monkeypatch.setattr(rag_service, "cache", None)
+    monkeypatch.setattr(rag_service, "_chain", lambda prompt, llm: llm)
+    plan = PreparedQuery("hostel fees", "hostel fees", "English", None, providers, [(0, "Hostel: 80,000.")], [], [], 50,
+                         rag_service.knowledge.current.version, False)
+
+    async def collect():
+        return [event async for event in rag_service._stream_providers(plan)]
+
+    return asyncio.run(collect())
+
+
+def test_fails_over_when_a_provider_fails_before_its_first_token(monkeypatch):
+    events = stream(monkeypatch, [("A", FakeChain(["never"], fail_after=0)), ("B", FakeChain(["The fee ", "is 80,000."]))])
+    assert [e["content"] for e in events if e["type"] == "token"] == ["The fee ", "is 80,000."]
+    assert events[-1]["type"] == "done" and events[-1]["answer"] == "The fee is 80,000."
+
+
+def test_no_failover_once_tokens_were_sent(monkeypatch):
+    events = stream(monkeypatch, [("A", FakeChain(["The fee ", "lost"], fail_after=1)), ("B", FakeChain(["unused"]))])
+    assert [e["type"] for e in events] == ["token", "error"]
+    assert events[0]["content"] == "The fee "
+
+
+def test_busy_message_when_every_provider_fails(monkeypatch):
+    events = stream(monkeypatch, [("A", FakeChain(["x"], fail_after=0))])
+    assert events[0]["content"].startswith("⚠️") and events[-1]["type"] == "done"
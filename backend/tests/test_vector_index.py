@@ -0,0 +1,50 @@
+import numpy as np
+
+from app.services.vector_index import NumpyVectorIndex
+
+
+def unit(*values):
+    return np.asarray(values, dtype=np.float32)
+
+
+def test_search_ranks_by_cosine(tmp_path):
+    index = NumpyVectorIndex(str(tmp_path))
+    index.upsert(["a", "b", "c"], [unit(1, 0, 0), unit(0, 1, 0), unit(1, 1, 0)], ["A", "B", "C"])
+    hits = index.search(unit(1, 0.1, 0), k=2)
+    assert [row["id"] for row, _ in hits] == ["a", "c"]
+    assert hits[0][1] > hits[1][1]
+
+
+def test_upsert_replaces_and_delete_hides_rows(tmp_path):
+    index = NumpyVectorIndex(str(tmp_path))
+    index.upsert(["a", "b"], [unit(1, 0, 0), unit(0, 1, 0)], ["A", "B"])
+    index.upsert(["a"], [unit(0, 0, 1)], ["A2"])
+    index.delete(["b"])
+    assert index.count() == 1
+    hits = index.search(unit(0, 1, 0), k=5)
+    assert [(row["id"], row["text"]) for row, _ in hits] == [("a", "A2")]
+
+
+def test_compact_and_reopen(tmp_path):
+    index = NumpyVectorIndex(str(tmp_path))
+    index.upsert(["a", "b", "c"], [unit(1, 0, 0), unit(0, 1, 0), unit(0, 0, 1)], ["A", "B", "C"],
+                 [{"source": "x"}, {"source": "y"}, {"source": "z"}])
+    index.delete(["a"])
+    index.compact()
+    assert len(index.rows) == 2
+
+    reopened = NumpyVectorIndex(str(tmp_path))
+    row, score = reopened.search(unit(0, 0, 1), k=1)[0]
+    assert row["id"] == "c" and row["metadata"] == {"source": "z"}
+    assert abs(score - 1.0) < 1e-3
+
+
+def test_rows_appended_after_last_save_are_dropped(tmp_path):
+    index = NumpyVectorIndex(str(tmp_path))
+    index.upsert(["a"], [unit(1, 0, 0)], ["A"])
+    index.save()
+    index.upsert(["b"], [unit(0, 1, 0)], ["B"])  # crash before save()
+
+    reopened = NumpyVectorIndex(str(tmp_path))
+    assert reopened.count() == 1
+    assert [row["id"] for row, _ in reopened.search(unit(0, 1, 0), k=5)] == ["a"]
@@ -50,6 +50,8 @@ function ChatInterface() {
     const [input, setInput] = useState("");
     const [isLoading, setIsLoading] = useState(false);
     const messagesEndRef = useRef(null);
+    // Server keeps the conversation under an id we pick once per page load
+    const sessionIdRef = useRef(crypto.randomUUID().replace(/-/g, ""));
 
     const scrollToBottom = () => {
         messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
@@ -73,10 +75,20 @@ function ChatInterface() {
             const response = await fetch("http://127.0.0.1:8000/api/v1/chat", {
                 method: "POST",
                 headers: { "Content-Type": "application/json" },
-                body: JSON.stringify({ query: input }),
+                body: JSON.stringify({ query: input, session_id: sessionIdRef.current }),
             });
             const data = await response.json();
-
+            if (!response.ok) {
+                // 429 / 503 from admission control: show its message instead of an empty answer
+                const retry = response.headers.get("Retry-After");
+                const message = data.detail?.message || "The assistant is busy right now. Please try again.";
+                setMessages((prev) => [
+                    ...prev,
+                    { text: `⚠️ ${message}${retry ? ` (retry in ${retry}s)` : ""}`, sender: "bot" },
+                ]);
+                setIsLoading(false);
+                return;
+            }
             const botMessage = {
                 text: data.response,
                 sender: "bot",